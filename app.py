@@ -17,6 +17,15 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
     
+    from utils.jobs import job_queue
+    job_queue.init_app(app)
+    
+    from utils.cache import response_cache
+    response_cache.init_app(app)
+    
+    from utils.model_registry import model_registry
+    model_registry.init_app(app)
+    
     # Importar e registrar blueprints DENTRO da função para evitar circular imports
     with app.app_context():
         from routes.auth import auth_bp
@@ -25,6 +34,7 @@ def create_app():
         from routes.analysis import analysis_bp
         from routes.admin import admin_bp
         from routes.main import main_bp  # Novo blueprint principal
+        from routes.jobs import jobs_bp
         
         app.register_blueprint(main_bp)
         app.register_blueprint(auth_bp)
@@ -32,5 +42,6 @@ def create_app():
         app.register_blueprint(data_bp)
         app.register_blueprint(analysis_bp)
         app.register_blueprint(admin_bp)
+        app.register_blueprint(jobs_bp)
     
     return app
\ No newline at end of file
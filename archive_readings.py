@@ -0,0 +1,35 @@
+"""
+Move leituras antigas de air_quality_data para o arquivo Parquet (ml/data/readings,
+particionado por fonte e mês). Os relatórios continuam usando os agregados por
+hora/dia; exportações (tier=archive|all) e treinamento leem o arquivo diretamente.
+
+Uso: python archive_readings.py [--older-than-days 365] [--batch-size 50000]
+"""
+import argparse
+import time
+from app import create_app, db
+from models.air_quality import AirQualityData
+from utils.archive import archive_readings, archive_root
+
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--older-than-days', type=int, default=None,
+                        help='idade mínima das leituras arquivadas (padrão ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--batch-size', type=int, default=None, help='leituras movidas por lote')
+    args = parser.parse_args()
+
+    def report(archived, last_id):
+        print(f"   … {archived} leituras arquivadas (até o id {last_id})")
+
+    with app.app_context():
+        db.create_all()
+        print(f"📦 Arquivando leituras antigas em {archive_root()} ({AirQualityData.query.count()} no banco)...")
+        started = time.monotonic()
+        archived = archive_readings(args.older_than_days, args.batch_size, progress=report)
+        print(f"✅ {archived} leituras movidas para o arquivo em {time.monotonic() - started:.1f}s "
+              f"({AirQualityData.query.count()} continuam no banco)")
+
+if __name__ == '__main__':
+    main()
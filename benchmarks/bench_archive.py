@@ -0,0 +1,129 @@
+"""
+Arquivo Parquet de leituras antigas (utils/archive.py).
+
+Gera uma tabela SQLite sintética com leituras horárias de 50 estações (1M
+linhas por padrão, ≈2 anos), move para o arquivo Parquet tudo que tem mais de
+30 dias e compara:
+- leitura das colunas de treino pelo ORM (como o treinamento fazia) x scan_readings
+  no arquivo (só as colunas pedidas)
+- consulta de uma localização em um trimestre: tabela SQLite x arquivo (partições
+  por mês e estatísticas dos grupos de linhas)
+- tamanho em disco: banco antes do arquivamento x arquivos Parquet
+
+Uso: python benchmarks/bench_archive.py [--rows 1000000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from config import Config
+
+WORK_DIR = tempfile.mkdtemp(prefix='ecopredict-bench-')
+DB_PATH = os.path.join(WORK_DIR, 'bench.db')
+Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
+Config.ARCHIVE_DIR = os.path.join(WORK_DIR, 'readings')
+
+from app import create_app, db
+from models.air_quality import AirQualityData
+from utils.archive import archive_readings, read_readings
+from utils.migrations import run_migrations
+from utils.ml_models import FEATURE_COLUMNS
+
+NOW = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+STATIONS = 50
+TRAIN_COLUMNS = FEATURE_COLUMNS + ['aqi']
+
+
+def populate(rows, batch_size=200000):
+    """Insere leituras horárias sintéticas direto pelo sqlite3 (≈2 anos por estação para 1M linhas)"""
+    rng = np.random.default_rng(42)
+    conn = sqlite3.connect(DB_PATH)
+    sql = ("INSERT INTO air_quality_data (location, latitude, longitude, pm25, pm10, no2, temperature, "
+           "humidity, aqi, timestamp, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    sources = np.array(['openaq', 'inmet', 'manual'])
+
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        index = np.arange(start, start + n)
+        stations = index % STATIONS
+        hours = rows // STATIONS - index // STATIONS
+        timestamps = [(NOW - timedelta(hours=int(h))).strftime('%Y-%m-%d %H:%M:%S.%f') for h in hours]
+        source = sources[rng.choice(3, n, p=[0.7, 0.25, 0.05])]
+        pm25 = rng.gamma(2.0, 10.0, n)
+        records = zip(
+            (f'Estação {s}' for s in stations.tolist()),
+            (-3.0 - s / 100 for s in stations.tolist()),
+            (-60.0 + s / 100 for s in stations.tolist()),
+            pm25.tolist(), (pm25 * 1.8).tolist(), rng.gamma(2.0, 0.01, n).tolist(),
+            rng.normal(28, 3, n).tolist(), rng.uniform(40, 95, n).tolist(), (pm25 * 3).tolist(),
+            timestamps, source.tolist()
+        )
+        conn.executemany(sql, records)
+        conn.commit()
+    conn.close()
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def orm_training_rows():
+    """Como o treinamento lia antes: objetos ORM de todas as leituras"""
+    return [{col: getattr(record, col) or 0 for col in TRAIN_COLUMNS} for record in AirQualityData.query.all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+
+    print(f"📦 Gerando {args.rows} leituras em {DB_PATH}...")
+    populate(args.rows)
+
+    start = (NOW - timedelta(days=180)).isoformat()
+    end = (NOW - timedelta(days=90)).isoformat()
+    location_filter = dict(location='Estação 42', start=start, end=end)
+
+    with app.app_context():
+        db_size = os.path.getsize(DB_PATH)
+        orm_rows, orm_time = timed(orm_training_rows)
+        hot_slice, hot_time = timed(read_readings, TRAIN_COLUMNS + ['timestamp'], tier='hot', **location_filter)
+        db.session.remove()
+
+        archived, archive_time = timed(archive_readings, older_than_days=30)
+        print(f"🗄️  {archived} leituras arquivadas em {archive_time:.1f}s\n")
+
+        frame, scan_time = timed(read_readings, TRAIN_COLUMNS, tier='archive')
+        cold_slice, cold_time = timed(read_readings, TRAIN_COLUMNS + ['timestamp'], tier='archive', **location_filter)
+
+    print(f"{'operação':<44}{'linhas':>10}{'tempo (s)':>12}")
+    print(f"{'colunas de treino via ORM (banco)':<44}{len(orm_rows):>10}{orm_time:>12.2f}")
+    print(f"{'colunas de treino via scan_readings (arquivo)':<44}{len(frame):>10}{scan_time:>12.2f}")
+    print(f"{'localização + trimestre (banco)':<44}{len(hot_slice):>10}{hot_time:>12.3f}")
+    print(f"{'localização + trimestre (arquivo)':<44}{len(cold_slice):>10}{cold_time:>12.3f}")
+    print(f"\nBanco antes do arquivamento: {db_size / 1e6:.1f} MB; "
+          f"arquivos Parquet: {directory_size(Config.ARCHIVE_DIR) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Análise de clusters (utils/clustering.py).
+
+Compara, para lotes de leituras sintéticas de tamanhos crescentes:
+- antes: KMeans(n_clusters=4).fit_predict a cada requisição (como
+  /analysis/cluster-analysis fazia, lá limitado a 500 linhas)
+- depois: ClusterModel.assign (centróide mais próximo, NumPy vetorizado) com
+  centróides ajustados uma vez por MiniBatchKMeans
+
+O ajuste único é medido à parte, sobre --history linhas.
+
+Uso: python benchmarks/bench_clustering.py [--history 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from utils.clustering import ClusterModel
+
+SIZES = [500, 10000, 100000, 1000000]
+
+
+def synthetic_readings(rows, seed=42):
+    """PM2.5 e PM10 sintéticos (colunas de CLUSTER_FEATURES)"""
+    rng = np.random.default_rng(seed)
+    pm25 = rng.gamma(2.0, 10.0, rows)
+    return np.column_stack([pm25, pm25 * 1.8 + rng.normal(0, 5, rows)])
+
+
+def fit_model(X, n_clusters=4, chunk_size=50000):
+    """Mesmo ajuste de fit_cluster_model, sobre um array em memória"""
+    scaler = StandardScaler()
+    for start in range(0, len(X), chunk_size):
+        scaler.partial_fit(X[start:start + chunk_size])
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=4096, n_init=3, random_state=42)
+    for start in range(0, len(X), chunk_size):
+        kmeans.partial_fit(scaler.transform(X[start:start + chunk_size]))
+    return ClusterModel(scaler.mean_, scaler.scale_, kmeans.cluster_centers_)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=1000000)
+    args = parser.parse_args()
+
+    model, fit_time = timed(fit_model, synthetic_readings(args.history))
+    print(f"📦 Ajuste único (MiniBatchKMeans, {args.history} linhas): {fit_time:.2f}s")
+    print(f"   AQI dos centróides: {', '.join(f'{aqi:.0f}' for aqi in model.severity)} ({', '.join(model.labels)})\n")
+
+    print(f"{'leituras':>10}{'KMeans.fit_predict (s)':>25}{'assign (s)':>13}")
+    for size in SIZES:
+        X = synthetic_readings(size, seed=size)
+        _, before = timed(KMeans(n_clusters=4, random_state=42, n_init=10).fit_predict, X)
+        _, after = timed(model.assign, X)
+        print(f"{size:>10}{before:>25.3f}{after:>13.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Coleta OpenAQ/INMET contra o servidor local (benchmarks/stub_api_server.py):
+laço serial página a página (como antes) versus DataCollector.collect_*,
+que distribui localizações e páginas por um pool de conexões.
+
+O servidor simula latência por requisição e, opcionalmente, uma fração de
+respostas 503 para mostrar as novas tentativas com backoff.
+
+Uso: python benchmarks/bench_collector.py [--locations 20] [--per-location 1000]
+     [--limit 100] [--latency 0.05] [--workers 8] [--fail-rate 0.0]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import requests
+
+from stub_api_server import start_stub_server
+from utils.data_collector import DataCollector
+
+
+def serial_openaq(base_url, locations, limit):
+    """Uma requisição bloqueante por vez, sem sessão compartilhada"""
+    results = []
+    for location in locations:
+        page = 1
+        while True:
+            response = requests.get(f'{base_url}v2/measurements',
+                                    params={'location': location, 'limit': limit, 'page': page})
+            batch = response.json()['results']
+            results.extend(batch)
+            if len(batch) < limit:
+                break
+            page += 1
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=20)
+    parser.add_argument('--per-location', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    locations = [f'Estação {i}' for i in range(args.locations)]
+    server, state, base_url = start_stub_server(latency=args.latency, per_location=args.per_location)
+    collector = DataCollector(openaq_url=f'{base_url}v2/', inmet_url=base_url,
+                              max_workers=args.workers, backoff=0.05)
+
+    start = time.perf_counter()
+    serial = serial_openaq(base_url, locations, args.limit)
+    serial_time = time.perf_counter() - start
+
+    state.fail_rate = args.fail_rate
+    for label, unknown_total in [('meta.found conhecido', False), ('meta.found desconhecido', True)]:
+        state.unknown_total = unknown_total
+        state.requests = state.failures = state.max_concurrent = 0
+        start = time.perf_counter()
+        data = collector.collect_openaq(locations, limit=args.limit)
+        elapsed = time.perf_counter() - start
+        # Só faltam medições se alguma página esgotou as novas tentativas
+        assert len(data['results']) == len(serial) or data['errors'], (len(data['results']), len(serial))
+        print(f"   {label:<24} {elapsed:6.2f}s   {state.requests} requisições, "
+              f"{state.failures} falhas 503, {len(data['errors'])} localizações com erro, "
+              f"até {state.max_concurrent} simultâneas")
+
+    print(f"\nOpenAQ: {len(serial)} medições, {args.locations} localizações, latência {args.latency * 1000:.0f} ms")
+    print(f"   serial (antes)           {serial_time:6.2f}s")
+
+    stations = [f'A{i:03d}' for i in range(1, args.locations + 1)]
+    start = time.perf_counter()
+    for code in stations:
+        requests.get(f'{base_url}estacao/{code}').json()
+    inmet_serial = time.perf_counter() - start
+    start = time.perf_counter()
+    data = collector.collect_inmet(stations)
+    inmet_parallel = time.perf_counter() - start
+    print(f"\nINMET: {len(stations)} estações, {len(data['observations'])} observações")
+    print(f"   serial {inmet_serial:6.2f}s   paralelo {inmet_parallel:6.2f}s   "
+          f"speedup {inmet_serial / inmet_parallel:.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Exportação em streaming de leituras (/api/export/readings).
+
+Gera uma tabela SQLite sintética (2M linhas por padrão) e mede, para alguns
+filtros, o tempo até o primeiro byte, o tempo total, as linhas exportadas e o
+crescimento do pico de memória do processo. Para comparação, monta a resposta
+do jeito antigo (lista de to_dict() + jsonify) para --legacy-rows leituras.
+
+Uso: python benchmarks/bench_export.py [--rows 2000000] [--legacy-rows 200000]
+"""
+import argparse
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from config import Config
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='ecopredict-bench-'), 'bench.db')
+Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
+Config.JOB_WORKERS = 0
+
+from flask import jsonify
+from app import create_app, db
+from models.air_quality import AirQualityData
+from models.user import User
+from utils.migrations import run_migrations
+
+NOW = datetime(2024, 6, 1)
+STATIONS = 500
+
+SCENARIOS = {
+    'tudo (ndjson)': 'format=ndjson',
+    'tudo (csv)': 'format=csv',
+    'uma localização (ndjson)': 'format=ndjson&location=Estação 42',
+    'fonte + 30 dias (csv)': 'format=csv&source=inmet&start=2024-05-01T00:00:00&end=2024-05-31T00:00:00',
+}
+
+
+def populate(rows, batch_size=200000):
+    """Insere leituras sintéticas direto pelo sqlite3, com chaves naturais distintas"""
+    rng = np.random.default_rng(42)
+    conn = sqlite3.connect(DB_PATH)
+    sql = ("INSERT INTO air_quality_data (location, latitude, longitude, pm25, pm10, aqi, timestamp, source) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+    sources = np.array(['openaq', 'inmet', 'manual'])
+
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        index = np.arange(start, start + n)
+        stations = index % STATIONS
+        # Uma leitura por estação a cada 5 minutos, da mais antiga para a mais nova
+        minutes = (rows // STATIONS - index // STATIONS) * 5
+        timestamps = [(NOW - timedelta(minutes=int(m))).strftime('%Y-%m-%d %H:%M:%S.%f') for m in minutes]
+        source = sources[rng.choice(3, n, p=[0.7, 0.25, 0.05])]
+        pm25 = rng.gamma(2.0, 10.0, n)
+        records = zip(
+            (f'Estação {s}' for s in stations.tolist()),
+            (-3.0 - s / 100 for s in stations.tolist()),
+            (-60.0 + s / 100 for s in stations.tolist()),
+            pm25.tolist(), (pm25 * 1.8).tolist(), (pm25 * 3).tolist(),
+            timestamps, source.tolist()
+        )
+        conn.executemany(sql, records)
+        conn.commit()
+    conn.close()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stream(client, query):
+    """Consome a resposta em streaming; retorna (primeiro byte, total, linhas, bytes)"""
+    start = time.perf_counter()
+    response = client.get(f'/api/export/readings?{query}', buffered=False)
+    first_byte = None
+    lines = size = 0
+    for chunk in response.response:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        lines += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+        size += len(chunk)
+    response.close()
+    return first_byte, time.perf_counter() - start, lines, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--legacy-rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        user = User(username='bench', email='bench@example.com', is_admin=True)
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+    print(f"📦 Gerando {args.rows} leituras em {DB_PATH}...")
+    populate(args.rows)
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+
+    print(f"\n{'cenário':<28}{'1º byte (ms)':>14}{'total (s)':>11}{'linhas':>10}{'MB':>8}")
+    rss_before = peak_rss_mb()
+    for name, query in SCENARIOS.items():
+        first_byte, total, lines, size = stream(client, query)
+        print(f"{name:<28}{first_byte * 1000:>14.1f}{total:>11.2f}{lines:>10}{size / 1e6:>8.1f}")
+    print(f"\nCrescimento do pico de memória com streaming: {peak_rss_mb() - rss_before:.1f} MB")
+
+    # Caminho antigo: lista de objetos ORM + to_dict() + jsonify em uma resposta
+    rss_before = peak_rss_mb()
+    with app.test_request_context():
+        start = time.perf_counter()
+        records = AirQualityData.query.order_by(AirQualityData.id).limit(args.legacy_rows).all()
+        body = jsonify({'records': [record.to_dict() for record in records]}).get_data()
+        elapsed = time.perf_counter() - start
+    print(f"Lista + jsonify de {args.legacy_rows} leituras: {elapsed:.2f}s (primeiro byte só no fim), "
+          f"{len(body) / 1e6:.1f} MB, pico de memória +{peak_rss_mb() - rss_before:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
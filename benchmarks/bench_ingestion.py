@@ -0,0 +1,153 @@
+"""
+Benchmark de ingestão: caminho antigo (iterrows + um objeto ORM por linha)
+contra o DataIngestor colunar com inserts em lote.
+
+Os arquivos de exemplo em static/data são replicados até o número de linhas
+pedido e gravados em um banco SQLite em memória.
+
+Uso: python benchmarks/bench_ingestion.py [--rows 200000] [--legacy-rows 20000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+import pandas as pd
+
+from config import Config
+
+Config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+from app import create_app, db
+from models.air_quality import AirQualityData
+from utils.data_collector import DataCollector
+from utils.ingestion import DataIngestor, STATION_LOCATIONS
+
+FILES = {
+    'inmet': 'static/data/inmet_example.csv',
+    'openaq': 'static/data/openaq_example.csv',
+    'manual': 'static/data/sample_data.csv'
+}
+
+
+def scale_up(df, rows, file_type):
+    """Replica o arquivo de exemplo até ter o número de linhas pedido"""
+    repeats = rows // len(df) + 1
+    big = pd.concat([df] * repeats, ignore_index=True).iloc[:rows].copy()
+    if file_type == 'openaq':
+        # Localizações distintas para que o agrupamento não colapse as linhas
+        big['location'] = big['location'] + '-' + (big.index // 3).astype(str)
+    else:
+        # Um segundo por linha: a chave natural (localização, horário, fonte) não colapsa as réplicas
+        column = 'datetime' if file_type == 'inmet' else 'timestamp'
+        big[column] = pd.Timestamp('2024-01-01') + pd.to_timedelta(big.index, unit='s')
+    return big
+
+
+def unique_now(offset):
+    """Horário de ingestão distinto por linha: o caminho antigo gravava a mesma
+    (localização, horário, fonte) várias vezes, o que o índice único agora impede"""
+    return datetime.utcnow() + timedelta(microseconds=offset)
+
+
+def legacy_ingest(df, file_type, collector):
+    """Caminho por linha original de routes/data.py"""
+    records_saved = 0
+    if file_type == 'openaq':
+        for (location, parameter), group in df.groupby(['location', 'parameter']):
+            latest = group.iloc[0]
+            aq_data = AirQualityData(
+                location=location,
+                latitude=float(latest.get('latitude', 0)),
+                longitude=float(latest.get('longitude', 0)),
+                timestamp=unique_now(records_saved),
+                source='openaq'
+            )
+            value = float(latest.get('value', 0)) if pd.notnull(latest.get('value')) else None
+            if parameter in ('pm25', 'pm10', 'no2', 'o3', 'so2'):
+                setattr(aq_data, parameter, value)
+            aq_data.aqi = collector.calculate_aqi(aq_data.pm25, aq_data.pm10, aq_data.no2, aq_data.o3, aq_data.co2)
+            db.session.add(aq_data)
+            records_saved += 1
+        return records_saved
+
+    for _, row in df.iterrows():
+        if file_type == 'inmet':
+            info = STATION_LOCATIONS.get(row.get('station', 'A001'), STATION_LOCATIONS['A001'])
+            aq_data = AirQualityData(
+                location=f"{info['name']} - Estação {row.get('station')}",
+                latitude=info['lat'],
+                longitude=info['lng'],
+                temperature=float(row.get('temperature', 0)) if pd.notnull(row.get('temperature')) else None,
+                humidity=float(row.get('humidity', 0)) if pd.notnull(row.get('humidity')) else None,
+                pressure=float(row.get('pressure', 0)) if pd.notnull(row.get('pressure')) else None,
+                timestamp=unique_now(records_saved),
+                source='inmet'
+            )
+        else:
+            values = {}
+            for col in ['pm25', 'pm10', 'co2', 'no2', 'o3', 'so2', 'temperature', 'humidity', 'pressure']:
+                values[col] = float(row.get(col, 0)) if pd.notnull(row.get(col)) else None
+            aq_data = AirQualityData(
+                location=row['location'],
+                latitude=float(row['latitude']),
+                longitude=float(row['longitude']),
+                timestamp=unique_now(records_saved),
+                source='manual',
+                **values
+            )
+        aq_data.aqi = collector.calculate_aqi(
+            aq_data.pm25, aq_data.pm10, aq_data.no2, aq_data.o3, aq_data.co2,
+            aq_data.temperature, aq_data.humidity, aq_data.pressure
+        )
+        db.session.add(aq_data)
+        records_saved += 1
+    return records_saved
+
+
+def timed(func, *args):
+    db.session.query(AirQualityData).delete()
+    db.session.commit()
+    start = time.perf_counter()
+    saved = func(*args)
+    db.session.commit()
+    elapsed = time.perf_counter() - start
+    return saved, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='linhas por arquivo no caminho colunar')
+    parser.add_argument('--legacy-rows', type=int, default=20000,
+                        help='linhas por arquivo no caminho antigo (mais lento)')
+    args = parser.parse_args()
+
+    app = create_app()
+    collector = DataCollector()
+    ingestor = DataIngestor()
+
+    with app.app_context():
+        db.create_all()
+        print(f"{'tipo':<8}{'caminho':<12}{'linhas':>10}{'gravadas':>10}{'segundos':>10}{'linhas/s':>12}")
+        for file_type, path in FILES.items():
+            sample = pd.read_csv(path)
+
+            legacy_df = scale_up(sample, args.legacy_rows, file_type)
+            saved, elapsed = timed(legacy_ingest, legacy_df, file_type, collector)
+            legacy_rate = len(legacy_df) / elapsed
+            print(f"{file_type:<8}{'por linha':<12}{len(legacy_df):>10}{saved:>10}{elapsed:>10.2f}{legacy_rate:>12.0f}")
+
+            bulk_df = scale_up(sample, args.rows, file_type)
+            saved, elapsed = timed(ingestor.ingest, bulk_df, file_type)
+            bulk_rate = len(bulk_df) / elapsed
+            print(f"{file_type:<8}{'colunar':<12}{len(bulk_df):>10}{saved:>10}{elapsed:>10.2f}{bulk_rate:>12.0f}"
+                  f"   ({bulk_rate / legacy_rate:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
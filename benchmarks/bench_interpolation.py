@@ -0,0 +1,81 @@
+"""
+Interpolação IDW das estações em grade (utils/interpolation.py).
+
+Gera --stations estações sintéticas na Amazônia Legal (5k por padrão) e uma
+grade de --resolution graus sobre a região, e compara:
+- IDW com todas as estações por célula (matriz de distâncias, em blocos)
+- IdwGrid.fit: k vizinhos mais próximos por KD-tree
+- IdwGrid.update: 20 estações com valor novo e 5 estações novas
+
+Uso: python benchmarks/bench_interpolation.py [--stations 5000] [--resolution 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from utils.interpolation import IdwGrid, unit_vectors, chord_to_km
+
+BBOX = (-18.0, -74.0, 5.0, -44.0)
+
+
+def brute_force(grid, lats, lngs, values, power=2.0, block=2000):
+    """IDW com todas as estações, em blocos de células para limitar a memória"""
+    points = unit_vectors(lats, lngs)
+    result = np.empty(len(grid.cell_points))
+    for start in range(0, len(result), block):
+        cells = grid.cell_points[start:start + block]
+        chord = np.sqrt(((cells[:, None, :] - points[None]) ** 2).sum(axis=2))
+        weights = 1.0 / np.maximum(chord_to_km(chord), 1e-6) ** power
+        result[start:start + block] = weights @ values / weights.sum(axis=1)
+    return result
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stations', type=int, default=5000)
+    parser.add_argument('--resolution', type=float, default=0.1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    n = args.stations
+    keys = np.array([f'Estação {i}' for i in range(n)], dtype=object)
+    lats = rng.uniform(BBOX[0], BBOX[2], n)
+    lngs = rng.uniform(BBOX[1], BBOX[3], n)
+    values = rng.gamma(2.0, 30.0, n)
+
+    grid = IdwGrid(*BBOX, args.resolution, k=8)
+    print(f"📍 {n} estações, grade {grid.rows} x {grid.cols} ({grid.rows * grid.cols} células)\n")
+
+    _, brute_time = timed(brute_force, grid, lats, lngs, values)
+    cells, fit_time = timed(grid.fit, keys, lats, lngs, values)
+
+    changed = rng.choice(n, 20, replace=False)
+    values = values.copy()
+    values[changed] = rng.gamma(2.0, 30.0, 20)
+    keys = np.concatenate([keys, [f'Nova {i}' for i in range(5)]])
+    lats = np.concatenate([lats, rng.uniform(BBOX[0], BBOX[2], 5)])
+    lngs = np.concatenate([lngs, rng.uniform(BBOX[1], BBOX[3], 5)])
+    values = np.concatenate([values, rng.gamma(2.0, 30.0, 5)])
+    updated, update_time = timed(grid.update, keys, lats, lngs, values)
+
+    print(f"{'etapa':<42}{'células':>10}{'tempo (s)':>11}")
+    print(f"{'IDW com todas as estações':<42}{cells:>10}{brute_time:>11.2f}")
+    print(f"{'IdwGrid.fit (KD-tree, k=8)':<42}{cells:>10}{fit_time:>11.2f}")
+    print(f"{'IdwGrid.update (20 valores + 5 estações)':<42}{updated:>10}{update_time:>11.3f}")
+    print(f"\nGrade binária (float32): {grid.values.nbytes / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
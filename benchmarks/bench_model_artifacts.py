@@ -0,0 +1,82 @@
+"""
+Formato dos artefatos de modelos (utils/model_registry.py).
+
+Treina um Random Forest em dados sintéticos (50k linhas, 100 árvores por padrão)
+e compara, para o modelo salvo sem compressão e com compressão zlib:
+- tamanho do arquivo
+- tempo do primeiro model_registry.get (versão + desserialização) e o
+  crescimento do pico de memória (RSS) do processo que carrega
+- carregamento antigo: hash SHA-256 do arquivo inteiro + joblib.load sem mmap
+
+Cada carregamento roda em um processo novo, como um worker do gunicorn ao
+iniciar. O arquivo já está no cache de páginas do sistema (leitura "quente").
+
+Uso: python benchmarks/bench_model_artifacts.py [--rows 50000] [--trees 100]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import joblib
+import numpy as np
+
+from utils.ml_models import AirQualityPredictor, FEATURE_COLUMNS
+from utils.model_registry import ModelRegistry, file_hash
+
+
+def load_step(name, model_path, compress, queue):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if name == 'antigo':
+        path = os.path.join(model_path, 'random_forest.pkl')
+        file_hash(path)
+        joblib.load(path)
+    else:
+        registry = ModelRegistry(model_path)
+        registry.mmap_mode = 'r' if name == 'mmap' else None
+        registry.get('random_forest')
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    X = rng.gamma(2.0, 10.0, (args.rows, len(FEATURE_COLUMNS))).astype(np.float32)
+    y = X[:, 0] * 3 + rng.normal(0, 3, args.rows)
+
+    context = multiprocessing.get_context('fork')
+    print(f"{'artefato':<16}{'carregamento':<28}{'MB':>8}{'tempo (s)':>11}{'pico +MB':>10}")
+    for compress in (0, 3):
+        predictor = AirQualityPredictor()
+        predictor.model_path = tempfile.mkdtemp(prefix='ecopredict-bench-')
+        predictor.registry = ModelRegistry(predictor.model_path)
+        predictor.registry.compress = compress
+        predictor.train_random_forest(X, y, n_estimators=args.trees)
+        size = os.path.getsize(os.path.join(predictor.model_path, 'random_forest.pkl')) / 1e6
+
+        steps = {'antigo': 'hash + joblib.load', 'registro': 'registro (metadados)'}
+        if compress == 0:
+            steps['mmap'] = 'registro + mmap_mode'
+        for name, label in steps.items():
+            queue = context.Queue()
+            process = context.Process(target=load_step, args=(name, predictor.model_path, compress, queue))
+            process.start()
+            elapsed, growth = queue.get()
+            process.join()
+            print(f"{f'compress={compress}':<16}{label:<28}{size:>8.1f}{elapsed:>11.2f}{growth:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Treinamento paralelo de modelos e busca de hiperparâmetros (utils/ml_models.py).
+
+Gera dados sintéticos em float32 (200k linhas por padrão) e compara:
+- antes: Random Forest, Regressão Linear e K-Means treinados um após o outro,
+  com o Random Forest em um só núcleo (como train_models_job fazia)
+- depois: train_models (os três modelos em threads, Random Forest com n_jobs)
+- busca de hiperparâmetros com sweep, em 1 processo e com --jobs processos
+
+Mostra o tempo de cada modelo e o tempo total. Os ganhos dependem do número de
+núcleos da máquina (os_cpu_count é mostrado no início); com 1 núcleo as duas
+versões ficam equivalentes.
+
+Uso: python benchmarks/bench_parallel_training.py [--rows 200000] [--jobs -1]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from utils.ml_models import AirQualityPredictor, FEATURE_COLUMNS
+
+SWEEP_GRID = {'n_estimators': [20, 50], 'max_depth': [None, 10]}
+
+
+def synthetic_arrays(rows, seed=42):
+    """Features e AQI sintéticos, no formato de load_training_arrays"""
+    rng = np.random.default_rng(seed)
+    X = rng.gamma(2.0, 10.0, (rows, len(FEATURE_COLUMNS))).astype(np.float32)
+    y = (np.maximum(X[:, 0] * 3, X[:, 1]) + rng.normal(0, 3, rows)).astype(np.float32)
+    return X, y
+
+
+def sequential(predictor, X, y):
+    """Caminho anterior: um modelo após o outro, Random Forest com n_jobs=1"""
+    timings = {}
+    split = predictor.split_data(X, y)
+    start = time.perf_counter()
+    predictor.train_random_forest(X, y, split=split, n_jobs=1)
+    timings['random_forest'] = time.perf_counter() - start
+    start = time.perf_counter()
+    predictor.train_linear_regression(X, y, split=split)
+    timings['linear_regression'] = time.perf_counter() - start
+    start = time.perf_counter()
+    predictor.train_kmeans(X, n_clusters=3)
+    timings['kmeans'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    predictor = AirQualityPredictor()
+    predictor.model_path = tempfile.mkdtemp(prefix='ecopredict-bench-')
+    X, y = synthetic_arrays(args.rows)
+    print(f"📦 {args.rows} linhas sintéticas; os.cpu_count() = {os.cpu_count()}\n")
+
+    start = time.perf_counter()
+    before = sequential(predictor, X, y)
+    before_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = {name: result['seconds'] for name, result in predictor.train_models(X, y, n_jobs=args.jobs).items()}
+    after_total = time.perf_counter() - start
+
+    print(f"{'modelo':<22}{'sequencial (s)':>16}{'paralelo (s)':>15}")
+    for name in before:
+        print(f"{name:<22}{before[name]:>16.2f}{after[name]:>15.2f}")
+    print(f"{'total (parede)':<22}{before_total:>16.2f}{after_total:>15.2f}")
+
+    sample = slice(0, min(args.rows, 50000))
+    print(f"\n🔍 Busca com {len(SWEEP_GRID['n_estimators']) * len(SWEEP_GRID['max_depth'])} combinações "
+          f"({sample.stop} linhas)")
+    for jobs in (1, args.jobs):
+        start = time.perf_counter()
+        results = predictor.sweep(X[sample], y[sample], SWEEP_GRID, n_jobs=jobs, save_best=False)
+        print(f"n_jobs={jobs:<4} {time.perf_counter() - start:>8.2f}s  melhor: {results[0]['params']} "
+              f"(MSE {results[0]['mse']:.2f})")
+
+
+if __name__ == '__main__':
+    main()
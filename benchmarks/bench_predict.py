@@ -0,0 +1,85 @@
+"""
+Latência de /analysis/predict (p50/p99) antes e depois do registro de modelos.
+
+"Antes" esvazia o registro a cada requisição, reproduzindo o joblib.load do
+disco que era feito em toda previsão; "depois" usa o modelo mantido em memória.
+O modelo é treinado em dados sintéticos dentro de um diretório temporário.
+
+Uso: python benchmarks/bench_predict.py [--requests 200] [--train-rows 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+Config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+from app import create_app, db
+from models.user import User
+from utils.ml_models import AirQualityPredictor, FEATURE_COLUMNS
+from utils.model_registry import model_registry
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def measure(client, payload, requests, cold):
+    samples = []
+    for _ in range(requests):
+        if cold:
+            model_registry.clear()
+        start = time.perf_counter()
+        response = client.post('/analysis/predict', json=payload)
+        samples.append(time.perf_counter() - start)
+        assert response.get_json()['success'], response.get_json()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--train-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    # Modelos gravados em ml/models/ relativo ao diretório temporário
+    os.chdir(tempfile.mkdtemp(prefix='ecopredict-bench-'))
+
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame(rng.random((args.train_rows, len(FEATURE_COLUMNS))) * 100, columns=FEATURE_COLUMNS)
+    y = X['pm25'] * 2 + X['pm10'] * 0.5 + rng.normal(0, 5, args.train_rows)
+    AirQualityPredictor().train_random_forest(X, y)
+    size_mb = os.path.getsize('ml/models/random_forest.pkl') / (1024 * 1024)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@ecopredict.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@ecopredict.com', 'password': 'bench'})
+    payload = {col: 10.0 for col in FEATURE_COLUMNS}
+    payload['model_type'] = 'random_forest'
+
+    print(f"modelo random_forest: {size_mb:.1f} MB, {args.requests} requisições")
+    for label, cold in [('antes (load por requisição)', True), ('depois (registro em memória)', False)]:
+        measure(client, payload, 5, cold)  # aquecimento
+        p50, p99 = percentiles(measure(client, payload, args.requests, cold))
+        print(f"{label:<30} p50 = {p50:8.2f} ms   p99 = {p99:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
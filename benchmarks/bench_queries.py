@@ -0,0 +1,134 @@
+"""
+Benchmark das consultas mais frequentes em air_quality_data, sem e com os
+índices criados por utils.migrations.run_migrations().
+
+Gera uma tabela SQLite sintética (5M linhas por padrão), mostra o EXPLAIN
+QUERY PLAN e a latência mediana de cada consulta antes e depois dos índices.
+
+Uso: python benchmarks/bench_queries.py [--rows 5000000] [--repeat 5]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from config import Config
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='ecopredict-bench-'), 'bench.db')
+Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
+
+from app import create_app, db
+from models.air_quality import AirQualityData
+from utils.migrations import run_migrations
+
+NOW = datetime(2024, 6, 1)
+WEEK_AGO = (NOW - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S.%f')
+NOW_STR = NOW.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+# Mesmas consultas feitas pelas rotas (escritas em SQL para o EXPLAIN)
+QUERIES = {
+    '/api/air-quality-data (últimas 100)':
+        ("SELECT * FROM air_quality_data ORDER BY timestamp DESC LIMIT 100", ()),
+    'generate_report (intervalo de 7 dias)':
+        ("SELECT * FROM air_quality_data WHERE timestamp BETWEEN ? AND ?", (WEEK_AGO, NOW_STR)),
+    'get_dataset_data (source = manual)':
+        ("SELECT * FROM air_quality_data WHERE source = 'manual'", ()),
+    'system_stats (group by source)':
+        ("SELECT source, count(id) FROM air_quality_data GROUP BY source", ()),
+    'localização + intervalo':
+        ("SELECT * FROM air_quality_data WHERE location = 'Estação 42' AND timestamp BETWEEN ? AND ?",
+         (WEEK_AGO, NOW_STR)),
+}
+
+
+def populate(rows, batch_size=200000):
+    """Insere leituras sintéticas direto pelo sqlite3 (bem mais rápido que o ORM)"""
+    rng = np.random.default_rng(42)
+    conn = sqlite3.connect(DB_PATH)
+    sql = ("INSERT INTO air_quality_data (location, latitude, longitude, pm25, pm10, aqi, timestamp, source) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+    two_years = 2 * 365 * 24 * 3600
+    sources = np.array(['openaq', 'inmet', 'manual'])
+
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        stations = rng.integers(0, 500, n)
+        seconds = rng.integers(0, two_years, n)
+        timestamps = [(NOW - timedelta(seconds=int(s))).strftime('%Y-%m-%d %H:%M:%S.%f') for s in seconds]
+        source = sources[rng.choice(3, n, p=[0.7, 0.25, 0.05])]
+        pm25 = rng.gamma(2.0, 10.0, n)
+        records = zip(
+            (f'Estação {s}' for s in stations),
+            (-3.0 - s / 100 for s in stations.tolist()),
+            (-60.0 + s / 100 for s in stations.tolist()),
+            pm25.tolist(), (pm25 * 1.8).tolist(), (pm25 * 3).tolist(),
+            timestamps, source.tolist()
+        )
+        conn.executemany(sql, records)
+        conn.commit()
+    conn.close()
+
+
+def run_queries(repeat):
+    results = {}
+    with db.engine.connect() as conn:
+        for label, (sql, params) in QUERIES.items():
+            plan = [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                count = len(conn.exec_driver_sql(sql, params).fetchall())
+                timings.append(time.perf_counter() - start)
+            results[label] = (plan, statistics.median(timings) * 1000, count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        # Estado "antes": tabela sem os índices novos
+        for index in AirQualityData.__table__.indexes:
+            index.drop(bind=db.engine)
+
+        start = time.perf_counter()
+        populate(args.rows)
+        print(f"📦 {args.rows} linhas geradas em {time.perf_counter() - start:.1f}s ({DB_PATH})\n")
+
+        before = run_queries(args.repeat)
+
+        start = time.perf_counter()
+        run_migrations()
+        print(f"⏱️  Migração (criação dos índices) em {time.perf_counter() - start:.1f}s\n")
+        # Conexões novas: o cache de statements da conexão antiga guardaria os planos sem índice
+        db.engine.dispose()
+
+        after = run_queries(args.repeat)
+
+    for label in QUERIES:
+        plan_before, ms_before, count = before[label]
+        plan_after, ms_after, _ = after[label]
+        print(f"▶ {label}  ({count} linhas)")
+        print(f"   antes:  {ms_before:10.1f} ms   {' | '.join(plan_before)}")
+        print(f"   depois: {ms_after:10.1f} ms   {' | '.join(plan_after)}")
+        print(f"   speedup: {ms_before / ms_after:.1f}x\n")
+
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
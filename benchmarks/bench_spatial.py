@@ -0,0 +1,106 @@
+"""
+Consultas geográficas das estações (utils/spatial.py e /api/stations/*).
+
+Gera --stations estações sintéticas na Amazônia Legal (20k por padrão) em
+latest_reading e compara, pelo cliente de teste do Flask (sem cache de respostas):
+- antes: /api/air-quality-data, que devolve todas as estações ao mapa
+- depois: /api/stations/bbox de uma janela de mapa típica (zoom 6 e zoom 10),
+  com as estações agrupadas pelo servidor por zoom
+- proximidade: StationIndex.nearest x distância a todas as estações (NumPy)
+
+Mostra tempo médio por requisição, tamanho da resposta e marcadores desenhados.
+
+Uso: python benchmarks/bench_spatial.py [--stations 20000] [--requests 50]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from config import Config
+
+Config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+Config.CACHE_BACKEND = 'none'
+
+from app import create_app, db
+from models.air_quality import LatestReading
+from models.user import User
+from utils.spatial import station_index, haversine_km
+
+# Janelas do mapa: (zoom, south, west, north, east)
+WINDOWS = [
+    (6, -12.0, -72.0, 0.0, -50.0),
+    (10, -3.4, -60.3, -2.9, -59.6),
+]
+
+
+def populate(stations):
+    rng = np.random.default_rng(42)
+    lat = rng.uniform(-18, 5, stations)
+    lng = rng.uniform(-74, -44, stations)
+    db.session.execute(LatestReading.__table__.insert(), [
+        {'location': f'Estação {i}', 'latitude': lat[i], 'longitude': lng[i], 'aqi': float(aqi),
+         'pm25': float(aqi) / 3, 'timestamp': datetime(2024, 6, 1), 'source': 'openaq'}
+        for i, aqi in enumerate(rng.gamma(2.0, 30.0, stations))
+    ])
+    db.session.commit()
+
+
+def measure(client, url, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url)
+    elapsed = (time.perf_counter() - start) / requests * 1000
+    return elapsed, len(response.get_data()), response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stations', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@ecopredict.com')
+        user.set_password('bench')
+        db.session.add(user)
+        populate(args.stations)
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@ecopredict.com', 'password': 'bench'})
+
+    print(f"📍 {args.stations} estações\n")
+    print(f"{'consulta':<36}{'ms/req':>9}{'KB':>9}{'marcadores':>12}")
+    elapsed, size, data = measure(client, '/api/air-quality-data', args.requests)
+    print(f"{'antes: /api/air-quality-data':<36}{elapsed:>9.1f}{size / 1024:>9.0f}{len(data):>12}")
+    for zoom, south, west, north, east in WINDOWS:
+        url = f'/api/stations/bbox?south={south}&west={west}&north={north}&east={east}&zoom={zoom}'
+        elapsed, size, data = measure(client, url, args.requests)
+        markers = len(data['stations']) + len(data['clusters'])
+        label = f"bbox zoom {zoom} ({data['total']} estações)"
+        print(f"{label:<36}{elapsed:>9.1f}{size / 1024:>9.0f}{markers:>12}")
+
+    with app.app_context():
+        index = station_index.get()
+        points = np.random.default_rng(7).uniform([-18, -74], [5, -44], (1000, 2))
+        start = time.perf_counter()
+        for lat, lng in points:
+            index.nearest(lat, lng, n=10)
+        indexed = (time.perf_counter() - start) / len(points) * 1000
+        start = time.perf_counter()
+        for lat, lng in points:
+            np.argsort(haversine_km(lat, lng, index.lats, index.lngs))[:10]
+        brute = (time.perf_counter() - start) / len(points) * 1000
+    print(f"\n10 mais próximas: índice {indexed:.3f} ms x todas as estações {brute:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
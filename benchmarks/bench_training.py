@@ -0,0 +1,150 @@
+"""
+Carregamento de dados de treino e treinamento incremental.
+
+Gera uma tabela SQLite sintética (500k linhas por padrão) e compara:
+- antes: objetos ORM -> lista de dicts -> DataFrame (como train_models_job fazia)
+- depois: load_training_arrays (blocos float32 direto das colunas), completo e
+  com amostragem por reservatório
+- SGDRegressor/MiniBatchKMeans com partial_fit, bloco a bloco (modo incremental)
+
+Mostra tempo e crescimento do pico de memória (RSS) de cada etapa. As etapas
+rodam em processos separados para que o pico de uma não esconda o da outra.
+
+Uso: python benchmarks/bench_training.py [--rows 500000] [--sample 100000]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+WORK_DIR = tempfile.mkdtemp(prefix='ecopredict-bench-')
+DB_PATH = os.path.join(WORK_DIR, 'bench.db')
+Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
+Config.ARCHIVE_DIR = os.path.join(WORK_DIR, 'readings')
+
+from app import create_app, db
+from models.air_quality import AirQualityData
+from utils.migrations import run_migrations
+from utils.ml_models import AirQualityPredictor, FEATURE_COLUMNS
+from utils.training_data import load_training_arrays, iter_training_chunks
+
+NOW = datetime(2024, 6, 1)
+STATIONS = 100
+
+
+def populate(rows, batch_size=200000):
+    """Insere leituras sintéticas direto pelo sqlite3, com chaves naturais distintas"""
+    rng = np.random.default_rng(42)
+    conn = sqlite3.connect(DB_PATH)
+    sql = ("INSERT INTO air_quality_data (location, latitude, longitude, pm25, pm10, no2, o3, temperature, "
+           "humidity, pressure, aqi, timestamp, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        index = np.arange(start, start + n)
+        stations = index % STATIONS
+        timestamps = [(NOW - timedelta(hours=int(h))).strftime('%Y-%m-%d %H:%M:%S.%f')
+                      for h in rows // STATIONS - index // STATIONS]
+        pm25 = rng.gamma(2.0, 10.0, n)
+        pm10 = pm25 * 1.8 + rng.normal(0, 5, n)
+        records = zip(
+            (f'Estação {s}' for s in stations.tolist()),
+            (-3.0 - s / 100 for s in stations.tolist()),
+            (-60.0 + s / 100 for s in stations.tolist()),
+            pm25.tolist(), pm10.tolist(), rng.gamma(2.0, 0.01, n).tolist(), rng.gamma(2.0, 0.02, n).tolist(),
+            rng.normal(28, 3, n).tolist(), rng.uniform(40, 95, n).tolist(), rng.normal(1010, 4, n).tolist(),
+            (np.maximum(pm25 * 3, pm10) + rng.normal(0, 3, n)).tolist(),
+            timestamps, ['openaq'] * n
+        )
+        conn.executemany(sql, records)
+        conn.commit()
+    conn.close()
+
+
+def orm_frame():
+    """Caminho anterior: objetos ORM, dicts e DataFrame"""
+    rows = [{col: getattr(record, col) or 0 for col in FEATURE_COLUMNS + ['aqi']}
+            for record in AirQualityData.query.all()]
+    df = pd.DataFrame(rows)
+    return df[FEATURE_COLUMNS], df['aqi']
+
+
+def incremental(predictor):
+    model, mse, r2 = predictor.train_sgd_regressor(lambda: iter_training_chunks())
+    predictor.train_minibatch_kmeans(lambda: iter_training_chunks(), n_clusters=3)
+    return int(model.named_steps['scaler'].n_samples_seen_), r2
+
+
+def run_step(name, sample, queue):
+    app = create_app()
+    with app.app_context():
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        extra = ''
+        if name == 'orm':
+            X, _ = orm_frame()
+            rows = len(X)
+        elif name == 'float32':
+            X, _ = load_training_arrays()
+            rows = len(X)
+        elif name == 'reservoir':
+            X, _ = load_training_arrays(sample_size=sample)
+            rows = len(X)
+        else:
+            predictor = AirQualityPredictor()
+            predictor.model_path = os.path.join(WORK_DIR, 'models')
+            os.makedirs(predictor.model_path, exist_ok=True)
+            rows, r2 = incremental(predictor)
+            extra = f'R² {r2:.3f}'
+        elapsed = time.perf_counter() - start
+        growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        queue.put((rows, elapsed, growth, extra))
+
+
+STEPS = {
+    'orm': 'ORM -> dicts -> DataFrame',
+    'float32': 'load_training_arrays (float32)',
+    'reservoir': 'load_training_arrays (reservatório)',
+    'incremental': 'SGD + MiniBatchKMeans (partial_fit)',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--sample', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+    print(f"📦 Gerando {args.rows} leituras em {DB_PATH}...")
+    populate(args.rows)
+
+    print(f"\n{'etapa':<40}{'linhas':>10}{'tempo (s)':>11}{'pico +MB':>10}")
+    context = multiprocessing.get_context('fork')
+    for name, label in STEPS.items():
+        queue = context.Queue()
+        process = context.Process(target=run_step, args=(name, args.sample, queue))
+        process.start()
+        rows, elapsed, growth, extra = queue.get()
+        process.join()
+        print(f"{label:<40}{rows:>10}{elapsed:>11.2f}{growth:>10.1f}  {extra}")
+
+
+if __name__ == '__main__':
+    main()
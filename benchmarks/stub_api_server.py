@@ -0,0 +1,176 @@
+"""
+Servidor HTTP local que reproduz respostas gravadas das APIs OpenAQ e INMET
+(benchmarks/fixtures/), para exercitar o DataCollector sem acesso à internet.
+
+- GET /v2/measurements?location=X&limit=N&page=P[&date_from=ISO]  pagina as
+  medições gravadas, replicadas em uma série horária de --per-location registros
+  (a mais nova na hora atual) com o nome da localização pedida
+- GET /estacao/<código> e /estacao/<início>/<fim>/<código>  observações horárias
+  da estação (do dia atual ou do intervalo), com os valores gravados
+
+Opções para simular a API real: latência por requisição, uma fração de respostas
+503 (testa as novas tentativas) e meta.found desconhecido ('>N').
+
+Uso: python benchmarks/stub_api_server.py [--port 8765] [--latency 0.05] [--fail-rate 0.0]
+     OPENAQ_API_URL=http://127.0.0.1:8765/v2/ INMET_API_URL=http://127.0.0.1:8765/ python run.py
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StubState:
+    def __init__(self, latency=0.0, fail_rate=0.0, per_location=250, unknown_total=False):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.per_location = per_location
+        self.unknown_total = unknown_total
+        self.openaq = load_fixture('openaq_measurements.json')['results']
+        self.inmet = load_fixture('inmet_station.json')
+        self.requests = 0
+        self.failures = 0
+        self.max_concurrent = 0
+        self._active = 0
+        self.clock_offset = timedelta(0)  # avança o "relógio" do servidor nos testes
+        self._random = random.Random(42)
+        self._lock = threading.Lock()
+
+    def now(self):
+        return (datetime.utcnow() + self.clock_offset).replace(minute=0, second=0, microsecond=0)
+
+    def measurements(self, location, date_from=None):
+        """Série horária (mais nova primeiro), como a ordenação padrão de /measurements"""
+        anchor = self.now()
+        per_hour = len(self.openaq)
+        records = []
+        for i in range(self.per_location):
+            date = anchor - timedelta(hours=i // per_hour)
+            if date_from is not None and date < date_from:
+                break
+            record = dict(self.openaq[i % per_hour], location=location)
+            record['date'] = {'utc': date.strftime('%Y-%m-%dT%H:%M:%S+00:00')}
+            records.append(record)
+        return records
+
+    def observations(self, code, start=None, end=None):
+        anchor = self.now()
+        start = start or anchor.replace(hour=0)
+        end = min(anchor, (end or anchor).replace(hour=23))
+        hours = int((end - start).total_seconds() // 3600) + 1
+        observations = []
+        for i in range(max(0, hours)):
+            date = start + timedelta(hours=i)
+            obs = dict(self.inmet[i % len(self.inmet)], CD_ESTACAO=code, DC_NOME=f'ESTAÇÃO {code}')
+            obs.update(DT_MEDICAO=date.strftime('%Y-%m-%d'), HR_MEDICAO=date.strftime('%H00'))
+            observations.append(obs)
+        return observations
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # mantém a conexão aberta (keep-alive)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with state._lock:
+                state.requests += 1
+                state._active += 1
+                state.max_concurrent = max(state.max_concurrent, state._active)
+                fail = state._random.random() < state.fail_rate
+            try:
+                if state.latency:
+                    time.sleep(state.latency)
+                if fail:
+                    with state._lock:
+                        state.failures += 1
+                    self._send_json(503, {'detail': 'Serviço indisponível'})
+                    return
+                self._route()
+            finally:
+                with state._lock:
+                    state._active -= 1
+
+        def _route(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if url.path.rstrip('/').endswith('/measurements'):
+                location = query.get('location', ['Manaus'])[0]
+                limit = int(query.get('limit', [100])[0])
+                page = int(query.get('page', [1])[0])
+                date_from = query.get('date_from', [None])[0]
+                if date_from:
+                    date_from = datetime.strptime(date_from[:19], '%Y-%m-%dT%H:%M:%S')
+                records = state.measurements(location, date_from)
+                found = f'>{limit}' if state.unknown_total else len(records)
+                self._send_json(200, {
+                    'meta': {'name': 'openaq-api', 'page': page, 'limit': limit, 'found': found},
+                    'results': records[(page - 1) * limit:page * limit]
+                })
+            elif url.path.startswith('/estacao/'):
+                parts = url.path.strip('/').split('/')[1:]
+                if len(parts) == 3:
+                    start, end = (datetime.strptime(part, '%Y-%m-%d') for part in parts[:2])
+                    self._send_json(200, state.observations(parts[2], start, end))
+                else:
+                    self._send_json(200, state.observations(parts[0]))
+            else:
+                self._send_json(404, {'detail': 'Not found'})
+
+    return StubHandler
+
+
+def start_stub_server(port=0, **options):
+    """Inicia o servidor em uma thread; retorna (servidor, estado, url base)"""
+    state = StubState(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--per-location', type=int, default=250)
+    parser.add_argument('--unknown-total', action='store_true')
+    args = parser.parse_args()
+
+    server, _, base_url = start_stub_server(
+        args.port, latency=args.latency, fail_rate=args.fail_rate,
+        per_location=args.per_location, unknown_total=args.unknown_total
+    )
+    print(f"🧪 Servidor de testes em {base_url} (OpenAQ: {base_url}v2/, INMET: {base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
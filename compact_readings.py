@@ -0,0 +1,48 @@
+"""
+Compactação única de air_quality_data: mescla leituras duplicadas (mesma
+localização, horário e fonte) em lotes, sem carregar a tabela na memória, e
+cria o índice único usado pelo upsert da ingestão.
+
+A migração da inicialização (run.py) faz o mesmo automaticamente; este comando
+permite rodar a compactação antes, em bancos grandes.
+
+Uso: python compact_readings.py [--batch-size 500]
+"""
+import argparse
+import time
+from app import create_app, db
+from models.air_quality import AirQualityData
+from utils.migrations import (compact_readings, create_missing_indexes, drop_obsolete_indexes,
+                              rebuild_latest_readings)
+from utils.rollups import rebuild_rollups
+
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=500, help='chaves duplicadas mescladas por lote')
+    args = parser.parse_args()
+
+    def report(merged_groups, removed_rows):
+        print(f"   … {merged_groups} grupos mesclados, {removed_rows} linhas removidas")
+
+    with app.app_context():
+        db.create_all()
+        print(f"🧹 Compactando air_quality_data ({AirQualityData.query.count()} leituras)...")
+        started = time.monotonic()
+        merged_groups, removed_rows = compact_readings(args.batch_size, progress=report)
+        print(f"✅ {removed_rows} leituras duplicadas removidas ({merged_groups} grupos) "
+              f"em {time.monotonic() - started:.1f}s")
+
+        if removed_rows:
+            print("🔄 Recalculando latest_reading e agregados por hora/dia...")
+            rebuild_latest_readings()
+            rebuild_rollups()
+
+        for name in create_missing_indexes([AirQualityData.__table__]):
+            print(f"✅ Índice criado: {name}")
+        for name in drop_obsolete_indexes():
+            print(f"🗑️  Índice removido: {name}")
+
+if __name__ == '__main__':
+    main()
@@ -12,8 +12,74 @@ class Config:
     # Configurações de upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'static/uploads'
+    INGEST_CHUNK_SIZE = 5000  # Linhas por insert em lote
+    UPLOAD_CHUNK_SIZE = 50000  # Linhas lidas (e commitadas) por bloco do arquivo
+    DATASET_PAGE_SIZE = 500  # Leituras por página em /api/dataset/<id>
+    DATASET_PAGE_MAX = 5000
+    EXPORT_PAGE_SIZE = 50000  # Leituras por consulta da exportação em streaming
+    EXPORT_BATCH_SIZE = 1000  # Leituras buscadas do cursor (e enviadas) por vez
     
-    # APIs externas
-    OPENAQ_API_URL = 'https://api.openaq.org/v2/'
+    # Arquivo Parquet de leituras antigas (particionado por fonte e mês)
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'ml/data/readings')
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = 50000
+    
+    # Treinamento
+    TRAIN_CHUNK_SIZE = 50000  # Leituras convertidas para float32 por bloco
+    TRAIN_SAMPLE_SIZE = int(os.environ.get('TRAIN_SAMPLE_SIZE', 500000))  # Amostra máxima no modo full (0 = todas)
+    TRAIN_SGD_EPOCHS = 3
+    TRAIN_N_JOBS = int(os.environ.get('TRAIN_N_JOBS', -1))  # Núcleos por treinamento (-1 = todos)
+    TRAIN_SWEEP_MAX_CANDIDATES = 50
+    TRAIN_SWEEP_GRID = {'n_estimators': [50, 100, 200], 'max_depth': [None, 10, 20]}
+    
+    # Artefatos de modelos (ml/models/<modelo>.pkl + <modelo>.json)
+    MODEL_COMPRESS = int(os.environ.get('MODEL_COMPRESS', 0))  # Nível zlib (0 = sem compressão, permite mmap)
+    MODEL_MMAP = os.environ.get('MODEL_MMAP', '1') != '0'  # Carregar arrays por memória mapeada
+    CLUSTER_N_CLUSTERS = 4  # Grupos do agrupamento por padrão de poluição (/analysis/cluster-analysis)
+    
+    # Índice espacial das estações (consultas do mapa por área, proximidade e zoom)
+    SPATIAL_CELL_DEGREES = 0.5  # Lado das células da grade
+    SPATIAL_NEAREST_MAX = 500  # Máximo de estações por consulta de proximidade
+    
+    # Interpolação IDW das estações em grade (/api/interpolation/grid)
+    INTERPOLATION_RESOLUTION = 0.25  # Graus por célula
+    INTERPOLATION_NEIGHBORS = 8  # Estações mais próximas usadas por célula
+    INTERPOLATION_MAX_DISTANCE_KM = 300  # Células mais longe que isso da estação mais próxima ficam sem valor
+    INTERPOLATION_MAX_CELLS = 250000
+    
+    # Tarefas em segundo plano (0 = executar de forma síncrona)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    
+    # Previsões em lote acima deste número de linhas são enviadas em NDJSON
+    PREDICT_BATCH_STREAM_THRESHOLD = 5000
+    
+    # Cache de respostas das APIs de leitura ('memory', 'disk' ou 'none').
+    # Com vários workers do gunicorn use 'disk' para compartilhar cache e versão dos dados.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DIR = os.environ.get('CACHE_DIR', 'instance/cache')
+    CACHE_DEFAULT_TTL = 300  # segundos
+    CACHE_MAX_ENTRIES = 256
+    # Intervalo (s) entre consultas ao banco para os caches em memória (índice das estações,
+    # grades, previsões) perceberem ingestões de outros processos (scheduler, outros workers)
+    DATA_STAMP_INTERVAL = 5
+    
+    # APIs externas (as URLs podem apontar para um servidor local de testes)
+    OPENAQ_API_URL = os.environ.get('OPENAQ_API_URL', 'https://api.openaq.org/v2/')
     IQAIR_API_KEY = os.environ.get('IQAIR_API_KEY', '')
-    INMET_API_URL = 'https://apitempo.inmet.gov.br/'
\ No newline at end of file
+    INMET_API_URL = os.environ.get('INMET_API_URL', 'https://apitempo.inmet.gov.br/')
+    
+    # Coleta nas APIs externas
+    COLLECTOR_MAX_WORKERS = int(os.environ.get('COLLECTOR_MAX_WORKERS', 8))  # requisições simultâneas
+    COLLECTOR_TIMEOUT = 10  # segundos por requisição
+    COLLECTOR_RETRIES = 3
+    COLLECTOR_BACKOFF = 0.5  # espera 0.5s, 1s, 2s... entre tentativas
+    OPENAQ_MAX_PAGES = 20  # por localização
+    
+    # Coleta agendada (scheduler.py)
+    SCHEDULER_INTERVAL = int(os.environ.get('SCHEDULER_INTERVAL', 900))  # segundos entre rodadas
+    SCHEDULER_OPENAQ_LOCATIONS = [loc.strip() for loc in os.environ.get(
+        'SCHEDULER_OPENAQ_LOCATIONS', 'Manaus,Belem,Porto Velho,Rio Branco').split(',') if loc.strip()]
+    SCHEDULER_INMET_STATIONS = [code.strip() for code in os.environ.get(
+        'SCHEDULER_INMET_STATIONS', 'A001,A734,A930,A520').split(',') if code.strip()]
+    SCHEDULER_OPENAQ_PAGE_SIZE = 1000
+    SCHEDULER_INITIAL_LOOKBACK_HOURS = 24  # primeira coleta de uma estação sem marca d'água
\ No newline at end of file
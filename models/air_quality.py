@@ -1,7 +1,24 @@
 from app import db
 from datetime import datetime
 
+def parse_datetime(value):
+    """Converte datetime ou string ISO 8601 (com ou sem 'Z') em datetime"""
+    if isinstance(value, datetime):
+        return value
+    value = str(value).strip()
+    if value.endswith('Z'):
+        value = value[:-1]
+    return datetime.fromisoformat(value)
+
 class AirQualityData(db.Model):
+    __table_args__ = (
+        # Chave natural de uma leitura (alvo do upsert da ingestão). A ordem das colunas
+        # também cobre filtros por localização e por localização + intervalo de tempo
+        db.Index('uq_air_quality_data_reading', 'location', 'timestamp', 'source', unique=True),
+    )
+    
+    NATURAL_KEY = ['location', 'timestamp', 'source']
+    
     id = db.Column(db.Integer, primary_key=True)
     location = db.Column(db.String(100), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
@@ -16,8 +33,23 @@ class AirQualityData(db.Model):
     humidity = db.Column(db.Float)
     pressure = db.Column(db.Float)
     aqi = db.Column(db.Float)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    source = db.Column(db.String(50))
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    source = db.Column(db.String(50), index=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), index=True)  # upload de origem (NULL para coletas das APIs)
+    
+    @classmethod
+    def filtered_query(cls, location=None, source=None, start=None, end=None):
+        """Consulta de leituras filtrada por localização, fonte e intervalo de tempo (datas ISO)"""
+        query = cls.query
+        if location:
+            query = query.filter(cls.location == location)
+        if source:
+            query = query.filter(cls.source == source)
+        if start:
+            query = query.filter(cls.timestamp >= parse_datetime(start))
+        if end:
+            query = query.filter(cls.timestamp <= parse_datetime(end))
+        return query
     
     def to_dict(self):
         return {
@@ -36,9 +68,54 @@ class AirQualityData(db.Model):
             'pressure': self.pressure,
             'aqi': self.aqi,
             'timestamp': self.timestamp.isoformat(),
+            'source': self.source,
+            'dataset_id': self.dataset_id
+        }
+
+class LatestReading(db.Model):
+    """Leitura mais recente de cada localização, mantida pela ingestão (usada pelo mapa do dashboard)"""
+    __tablename__ = 'latest_reading'
+    
+    location = db.Column(db.String(100), primary_key=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    pm25 = db.Column(db.Float)
+    pm10 = db.Column(db.Float)
+    aqi = db.Column(db.Float)
+    timestamp = db.Column(db.DateTime)
+    source = db.Column(db.String(50))
+    
+    def to_dict(self):
+        return {
+            'location': self.location,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'pm25': self.pm25,
+            'pm10': self.pm10,
+            'aqi': self.aqi,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'source': self.source
         }
 
+class ReadingRollup(db.Model):
+    """Agregados de leituras por localização e período (hora ou dia), mantidos pela ingestão"""
+    __tablename__ = 'reading_rollup'
+    
+    granularity = db.Column(db.String(10), primary_key=True)  # 'hour' ou 'day'
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    location = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    aqi_count = db.Column(db.Integer, nullable=False, default=0)
+    aqi_sum = db.Column(db.Float, nullable=False, default=0)
+    aqi_min = db.Column(db.Float)
+    aqi_max = db.Column(db.Float)
+    pm25_count = db.Column(db.Integer, nullable=False, default=0)
+    pm25_sum = db.Column(db.Float, nullable=False, default=0)
+    pm25_min = db.Column(db.Float)
+    pm25_max = db.Column(db.Float)
+    aqi_exceedances = db.Column(db.Integer, nullable=False, default=0)  # AQI > 100
+    pm25_exceedances = db.Column(db.Integer, nullable=False, default=0)  # PM2.5 > 35 µg/m³
+
 class Dataset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -47,6 +124,10 @@ class Dataset(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_public = db.Column(db.Boolean, default=False)
+    # Preenchidos ao fim da gravação: leituras recebidas do arquivo e as que ficaram
+    # ligadas ao dataset (as que já pertenciam a outro upload continuam nele)
+    records_received = db.Column(db.Integer)
+    records_linked = db.Column(db.Integer)
     
     def __repr__(self):
         return f'<Dataset {self.name}>'
\ No newline at end of file
@@ -0,0 +1,27 @@
+from app import db
+from datetime import datetime
+
+class IngestCursor(db.Model):
+    """Marca d'água da coleta agendada: horário da medição mais nova já gravada, por fonte e estação"""
+    __tablename__ = 'ingest_cursor'
+
+    source = db.Column(db.String(50), primary_key=True)  # openaq, inmet
+    key = db.Column(db.String(100), primary_key=True)  # localização OpenAQ ou código da estação INMET
+    high_water = db.Column(db.DateTime)
+    last_run_at = db.Column(db.DateTime)
+    last_new_records = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'key': self.key,
+            'high_water': self.high_water.isoformat() if self.high_water else None,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_new_records': self.last_new_records,
+            'last_error': self.last_error
+        }
+
+    def __repr__(self):
+        return f'<IngestCursor {self.source}/{self.key} {self.high_water}>'
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from models.user import User
 from models.air_quality import AirQualityData, Dataset
 from app import db
+from utils.cache import response_cache
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -73,6 +74,7 @@ def manage_user(user_id):
 
 @admin_bp.route('/admin/system-stats')
 @login_required
+@response_cache.cached(ttl=60)  # novos usuários não passam pela ingestão
 def system_stats():
     # Estatísticas do sistema
     from datetime import datetime, timedelta
@@ -1,9 +1,20 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import (Blueprint, render_template, request, jsonify, url_for, flash, redirect,
+                   current_app, Response, stream_with_context)
 from flask_login import login_required, current_user
 import pandas as pd
+import io
 from models.air_quality import AirQualityData, Dataset  # ✅ Adicionar Dataset aqui
 from app import db
-from utils.ml_models import AirQualityPredictor
+from utils.training_data import iter_training_chunks, load_training_arrays, has_training_rows
+from utils.ml_models import AirQualityPredictor, FEATURE_COLUMNS, FEATURE_DEFAULTS, MODEL_TYPES, build_estimator
+from sklearn.model_selection import ParameterGrid
+from utils.jobs import job_queue
+from utils.clustering import fit_cluster_model, load_cluster_model, latest_station_frame, assign_frame
+from utils.forecasting import (FORECAST_HORIZONS, load_hourly_series, train_forecast_models,
+                               forecast_model_name, forecast_cache)
+from models.job import Job
+from utils.cache import response_cache
+from utils.rollups import summarize_window, exceedances_by_location, PM25_LIMIT, AQI_LIMIT
 import json
 from datetime import datetime, timedelta
 
@@ -28,50 +39,145 @@ def analyze_dataset(dataset_id):
     
     return render_template('analyze_dataset.html', dataset=dataset)
 
+TRAINING_MODES = ('full', 'incremental')
+
+def train_models_job(progress, dataset_id=None, mode='full', sample_size=None):
+    """
+    Treina os modelos em segundo plano, com os dados gerais ou de um dataset.
+    
+    mode='full': Random Forest, Regressão Linear e K-Means em arrays float32 na memória
+    (com sample_size, amostra aleatória por reservatório das leituras).
+    mode='incremental': SGDRegressor e MiniBatchKMeans com partial_fit, bloco a bloco,
+    em todas as leituras (a memória não depende do volume de dados).
+    """
+    dataset = Dataset.query.get(dataset_id) if dataset_id is not None else None
+    config = current_app.config
+    chunk_size = config.get('TRAIN_CHUNK_SIZE', 50000)
+    
+    if mode == 'incremental':
+        def chunks():
+            return iter_training_chunks(dataset_id, chunk_size=chunk_size)
+        
+        sgd_model, sgd_mse, sgd_r2 = ml_predictor.train_sgd_regressor(
+            chunks, epochs=config.get('TRAIN_SGD_EPOCHS', 3), progress=progress.update
+        )
+        records_used = int(sgd_model.named_steps['scaler'].n_samples_seen_)
+        progress.update(stage='minibatch_kmeans', rows_loaded=records_used)
+        ml_predictor.train_minibatch_kmeans(chunks, n_clusters=3)
+        metrics = {'sgd_regressor': {'mse': sgd_mse, 'r2': sgd_r2}}
+    else:
+        # Buscar dados para treinamento: só as leituras do dataset, quando informado
+        X, y = load_training_arrays(dataset_id=dataset_id, sample_size=sample_size,
+                                    chunk_size=chunk_size, progress=progress.update)
+        records_used = len(X)
+        
+        # Treinar os modelos em paralelo sobre a mesma divisão (AQI como target)
+        trained = ml_predictor.train_models(X, y, n_jobs=config.get('TRAIN_N_JOBS'), progress=progress.update)
+        metrics = {
+            model_type: {'mse': result['mse'], 'r2': result['r2']}
+            for model_type, result in trained.items() if result['mse'] is not None
+        }
+        timings = {model_type: result['seconds'] for model_type, result in trained.items()}
+    progress.update(stage='done')
+    
+    result = {
+        'message': 'Modelos treinados com sucesso!',
+        'mode': mode,
+        'records_used': records_used,
+        'metrics': metrics
+    }
+    if mode == 'full':
+        result['timings'] = timings  # segundos de treino por modelo
+    
+    if dataset is not None:
+        result['message'] = f'Modelos treinados com sucesso usando {records_used} registros do dataset {dataset.name}'
+        result['dataset_info'] = {
+            'name': dataset.name,
+            'records_used': records_used,
+            'features_used': list(FEATURE_COLUMNS)
+        }
+    
+    return result
+
+def training_options():
+    """Modo de treinamento e tamanho da amostra enviados no corpo JSON (ou formulário) da requisição"""
+    data = request.get_json(silent=True) or request.form
+    mode = data.get('mode') or 'full'
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Modo de treinamento inválido: use {' ou '.join(TRAINING_MODES)}")
+    sample_size = data.get('sample_size') or current_app.config.get('TRAIN_SAMPLE_SIZE')
+    return mode, int(sample_size) if sample_size else None
+
+def job_started_response(job_id, message):
+    return jsonify({
+        'success': True,
+        'message': message,
+        'job_id': job_id,
+        'status_url': url_for('jobs.job_status', job_id=job_id)
+    }), 202
+
 @analysis_bp.route('/analysis/train-models', methods=['POST'])
 @login_required
 def train_models():
     try:
-        # Buscar dados para treinamento
-        aq_data = AirQualityData.query.limit(1000).all()
-        
-        if not aq_data:
+        if not has_training_rows():
             return jsonify({'success': False, 'message': 'Dados insuficientes para treinamento'})
         
-        # Converter para DataFrame
-        data_list = []
-        for record in aq_data:
-            data_list.append({
-                'pm25': record.pm25 or 0,
-                'pm10': record.pm10 or 0,
-                'no2': record.no2 or 0,
-                'o3': record.o3 or 0,
-                'co2': record.co2 or 0,
-                'temperature': record.temperature or 0,
-                'humidity': record.humidity or 0,
-                'pressure': record.pressure or 0,
-                'aqi': record.aqi or 0
-            })
+        mode, sample_size = training_options()
+        job_id = job_queue.enqueue('train', train_models_job, None, mode, sample_size, user_id=current_user.id)
+        return job_started_response(job_id, 'Treinamento iniciado em segundo plano')
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def train_sweep_job(progress, param_grid, model_type='random_forest', dataset_id=None, sample_size=None):
+    """Busca de hiperparâmetros em segundo plano; o melhor candidato é salvo como model_type"""
+    config = current_app.config
+    X, y = load_training_arrays(dataset_id=dataset_id, sample_size=sample_size,
+                                chunk_size=config.get('TRAIN_CHUNK_SIZE', 50000), progress=progress.update)
+    results = ml_predictor.sweep(X, y, param_grid, model_type=model_type,
+                                 n_jobs=config.get('TRAIN_N_JOBS'), progress=progress.update)
+    progress.update(stage='done')
+    return {
+        'message': f'Busca concluída: {len(results)} combinações avaliadas',
+        'model_type': model_type,
+        'records_used': len(X),
+        'best': results[0] if results else None,
+        'candidates': results
+    }
+
+@analysis_bp.route('/analysis/train-sweep', methods=['POST'])
+@login_required
+def train_sweep():
+    """
+    Busca de hiperparâmetros em um pool de processos.
+    JSON: model_type (random_forest ou sgd_regressor), param_grid ({parâmetro: [valores]}),
+    dataset_id e sample_size opcionais.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        model_type = data.get('model_type', 'random_forest')
+        param_grid = data.get('param_grid') or current_app.config.get('TRAIN_SWEEP_GRID', {})
+        dataset_id = data.get('dataset_id')
         
-        df = pd.DataFrame(data_list)
+        if dataset_id is not None:
+            dataset = Dataset.query.get_or_404(dataset_id)
+            if dataset.user_id != current_user.id and not current_user.is_admin:
+                return jsonify({'success': False, 'message': 'Acesso negado'})
         
-        # Usar AQI como target para previsão
-        X = df[['pm25', 'pm10', 'no2', 'o3', 'co2', 'temperature', 'humidity', 'pressure']]
-        y = df['aqi']
+        candidates = len(ParameterGrid(param_grid))
+        max_candidates = current_app.config.get('TRAIN_SWEEP_MAX_CANDIDATES', 50)
+        if candidates > max_candidates:
+            return jsonify({'success': False, 'message': f'Muitas combinações ({candidates}); máximo {max_candidates}'})
+        build_estimator(model_type)
         
-        # Treinar modelos
-        rf_model, rf_mse, rf_r2 = ml_predictor.train_random_forest(X, y)
-        lr_model, lr_mse, lr_r2 = ml_predictor.train_linear_regression(X, y)
-        kmeans = ml_predictor.train_kmeans(X, n_clusters=3)
+        if not has_training_rows(dataset_id, minimum=10):
+            return jsonify({'success': False, 'message': 'Dados insuficientes para treinamento (mínimo 10 registros)'})
         
-        return jsonify({
-            'success': True,
-            'message': 'Modelos treinados com sucesso!',
-            'metrics': {
-                'random_forest': {'mse': rf_mse, 'r2': rf_r2},
-                'linear_regression': {'mse': lr_mse, 'r2': lr_r2}
-            }
-        })
+        sample_size = data.get('sample_size') or current_app.config.get('TRAIN_SAMPLE_SIZE')
+        job_id = job_queue.enqueue('train', train_sweep_job, param_grid, model_type, dataset_id,
+                                   int(sample_size) if sample_size else None, user_id=current_user.id)
+        return job_started_response(job_id, f'Busca de hiperparâmetros iniciada ({candidates} combinações)')
     
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -87,136 +193,340 @@ def train_dataset_models(dataset_id):
         if dataset.user_id != current_user.id and not current_user.is_admin:
             return jsonify({'success': False, 'message': 'Acesso negado'})
         
-        # Buscar dados do dataset (todos os tipos)
-        air_data = AirQualityData.query.all()
-        
-        if len(air_data) < 10:
+        # Verificar se o dataset tem leituras suficientes (sem contar todas)
+        if not has_training_rows(dataset.id, minimum=10):
             return jsonify({'success': False, 'message': 'Dados insuficientes para treinamento (mínimo 10 registros)'})
         
-        # Converter para DataFrame
-        data_list = []
-        for record in air_data:
-            data_list.append({
-                'pm25': record.pm25 or 0,
-                'pm10': record.pm10 or 0,
-                'no2': record.no2 or 0,
-                'o3': record.o3 or 0,
-                'co2': record.co2 or 0,
-                'temperature': record.temperature or 0,
-                'humidity': record.humidity or 0,
-                'pressure': record.pressure or 0,
-                'aqi': record.aqi or 0
-            })
-        
-        df = pd.DataFrame(data_list)
-        
-        # Preparar dados para treinamento
-        from utils.ml_models import AirQualityPredictor
-        ml_predictor = AirQualityPredictor()
-        
-        # Usar AQI como target para previsão
-        X = df[['pm25', 'pm10', 'no2', 'o3', 'co2', 'temperature', 'humidity', 'pressure']]
-        y = df['aqi']
-        
-        # Treinar modelos
-        rf_model, rf_mse, rf_r2 = ml_predictor.train_random_forest(X, y)
-        lr_model, lr_mse, lr_r2 = ml_predictor.train_linear_regression(X, y)
-        kmeans = ml_predictor.train_kmeans(X, n_clusters=3)
-        
-        return jsonify({
-            'success': True,
-            'message': f'Modelos treinados com sucesso usando {len(air_data)} registros do dataset {dataset.name}',
-            'metrics': {
-                'random_forest': {'mse': rf_mse, 'r2': rf_r2},
-                'linear_regression': {'mse': lr_mse, 'r2': lr_r2}
-            },
-            'dataset_info': {
-                'name': dataset.name,
-                'records_used': len(air_data),
-                'features_used': list(X.columns)
-            }
-        })
+        mode, sample_size = training_options()
+        job_id = job_queue.enqueue('train', train_models_job, dataset.id, mode, sample_size, user_id=current_user.id)
+        return job_started_response(job_id, f'Treinamento com o dataset {dataset.name} iniciado em segundo plano')
     
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@analysis_bp.route('/api/models')
+@login_required
+def model_artifacts():
+    """Metadados dos modelos salvos (features, linhas de treino, métricas, versão e tamanho)"""
+    models = {}
+    forecast_models = [forecast_model_name(horizon) for horizon in FORECAST_HORIZONS]
+    for model_type in MODEL_TYPES + ['sgd_regressor', 'minibatch_kmeans'] + forecast_models:
+        try:
+            models[model_type] = ml_predictor.registry.metadata(model_type) or {}
+        except FileNotFoundError:
+            continue
+    return jsonify({'success': True, 'models': models, 'loaded': ml_predictor.registry.versions()})
+
 @analysis_bp.route('/analysis/predict', methods=['POST'])
 @login_required
 def predict():
     try:
         data = request.get_json()
-        features = [
-            data.get('pm25', 0),
-            data.get('pm10', 0),
-            data.get('no2', 0),
-            data.get('o3', 0),
-            data.get('co2', 0),
-            data.get('temperature', 0),
-            data.get('humidity', 0)
-        ]
+        # Mesmas features (e ordem) usadas no treinamento
+        features = [data.get(col, FEATURE_DEFAULTS.get(col, 0)) for col in FEATURE_COLUMNS]
         
         model_type = data.get('model_type', 'random_forest')
-        prediction = ml_predictor.predict_air_quality(features, model_type)
+        prediction, version = ml_predictor.predict_air_quality(features, model_type, return_version=True)
         
         return jsonify({
             'success': True,
-            'prediction': prediction,
-            'model_used': model_type
+            'prediction': float(prediction),
+            'model_used': model_type,
+            'model_version': version
         })
     
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@analysis_bp.route('/analysis/cluster-analysis')
+# Colunas que identificam as linhas na resposta (devolvidas como vieram, fora das features)
+BATCH_ID_COLUMNS = ('id', 'location', 'timestamp')
+
+def read_batch_csv(source):
+    """
+    Lê o CSV de uma previsão em lote com as colunas de identificação como texto
+    (um id ausente não converte os demais em float); ids inteiros voltam a ser inteiros
+    """
+    frame = pd.read_csv(source, dtype={col: str for col in BATCH_ID_COLUMNS})
+    if 'id' in frame.columns:
+        ids = frame['id']
+        numeric = pd.to_numeric(ids, errors='coerce')
+        if numeric.notna().equals(ids.notna()) and (numeric.dropna() % 1 == 0).all():
+            frame['id'] = numeric.astype('Int64')
+    return frame
+
+def load_batch_features():
+    """
+    Monta o DataFrame de uma previsão em lote a partir da requisição:
+    arquivo/corpo CSV, JSON com 'rows' (ou uma lista) ou JSON com 'filter' sobre as leituras.
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    
+    if 'file' in request.files:
+        return read_batch_csv(request.files['file'])
+    
+    if request.mimetype == 'text/csv':
+        return read_batch_csv(io.BytesIO(request.get_data()))
+    
+    if isinstance(data, dict) and 'filter' in data:
+        filters = data['filter'] or {}
+        query = AirQualityData.filtered_query(
+            location=filters.get('location'),
+            source=filters.get('source'),
+            start=filters.get('start'),
+            end=filters.get('end')
+        ).with_entities(
+            AirQualityData.id, AirQualityData.location, AirQualityData.timestamp,
+            *[getattr(AirQualityData, col) for col in FEATURE_COLUMNS]
+        ).order_by(AirQualityData.id)
+        frame = pd.read_sql(query.statement, db.engine)
+        # Mesma convenção do treinamento: valores ausentes viram 0
+        frame[FEATURE_COLUMNS] = frame[FEATURE_COLUMNS].fillna(0)
+        return frame
+    
+    rows = data.get('rows') if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValueError("Envie 'rows' (lista de features), 'filter' ou um arquivo CSV")
+    frame = pd.DataFrame(rows)
+    # O pandas converte em float uma coluna de inteiros com valores ausentes: copiar
+    # os identificadores das linhas recebidas, sem conversão
+    for col in BATCH_ID_COLUMNS:
+        if col in frame.columns:
+            frame[col] = pd.Series([row.get(col) for row in rows], index=frame.index, dtype=object)
+    return frame
+
+def ndjson_stream(output, batch_size=1000):
+    """Gera o resultado em NDJSON, um lote de linhas por vez"""
+    for start in range(0, len(output), batch_size):
+        yield output.iloc[start:start + batch_size].to_json(orient='records', lines=True, date_format='iso')
+
+@analysis_bp.route('/analysis/predict-batch', methods=['POST'])
 @login_required
-def cluster_analysis():
+def predict_batch():
+    """Previsões em lote para várias linhas de features ou para leituras armazenadas"""
     try:
-        # Buscar dados para análise de clusters
-        aq_data = AirQualityData.query.filter(
-            AirQualityData.pm25.isnot(None),
-            AirQualityData.pm10.isnot(None)
-        ).limit(500).all()
+        data = request.get_json(silent=True) if request.is_json else None
+        model_type = request.args.get('model_type') or (data.get('model_type') if isinstance(data, dict) else None)
+        model_type = model_type or 'random_forest'
         
-        if not aq_data:
-            return jsonify({'success': False, 'message': 'Dados insuficientes para análise'})
+        frame = load_batch_features()
+        if frame.empty:
+            return jsonify({'success': False, 'message': 'Nenhuma linha para prever'})
+        
+        # Features ausentes recebem o valor padrão
+        for col in FEATURE_COLUMNS:
+            if col not in frame.columns:
+                frame[col] = FEATURE_DEFAULTS.get(col, 0)
+        features = frame[FEATURE_COLUMNS].apply(pd.to_numeric, errors='coerce')
+        features = features.fillna(FEATURE_DEFAULTS).fillna(0)
         
-        # Preparar dados para clustering
-        data_for_clustering = []
-        locations = []
+        predictions, version = ml_predictor.predict_batch(features, model_type)
         
-        for record in aq_data:
-            data_for_clustering.append([
-                record.pm25 or 0,
-                record.pm10 or 0,
-                record.temperature or 0
-            ])
-            locations.append({
-                'location': record.location,
-                'lat': record.latitude,
-                'lng': record.longitude,
-                'aqi': record.aqi or 0
-            })
+        # Leituras armazenadas ('filter') são identificadas por id; linhas enviadas, pela
+        # posição, junto com as colunas de identificação que vierem nelas
+        if isinstance(data, dict) and 'filter' in data:
+            output = frame[list(BATCH_ID_COLUMNS)].copy()
+        else:
+            output = pd.DataFrame({'index': range(len(frame))})
+            for col in BATCH_ID_COLUMNS:
+                if col in frame.columns:
+                    output[col] = frame[col].array
+        output['prediction'] = predictions
         
-        # Aplicar K-Means
-        import numpy as np
-        from sklearn.cluster import KMeans
+        threshold = current_app.config.get('PREDICT_BATCH_STREAM_THRESHOLD', 5000)
+        wants_ndjson = (request.args.get('format') == 'ndjson' or
+                        request.accept_mimetypes.best == 'application/x-ndjson')
+        if wants_ndjson or len(output) > threshold:
+            return Response(
+                stream_with_context(ndjson_stream(output)),
+                mimetype='application/x-ndjson',
+                headers={'X-Model-Used': model_type, 'X-Model-Version': version}
+            )
         
-        kmeans = KMeans(n_clusters=4, random_state=42)
-        clusters = kmeans.fit_predict(data_for_clustering)
+        return jsonify({
+            'success': True,
+            'model_used': model_type,
+            'model_version': version,
+            'count': len(output),
+            'predictions': json.loads(output.to_json(orient='records', date_format='iso'))
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def fit_clusters_job(progress, n_clusters=4):
+    """Ajusta o agrupamento sobre todo o histórico e invalida as respostas em cache"""
+    config = current_app.config
+    model = fit_cluster_model(n_clusters=n_clusters, chunk_size=config.get('TRAIN_CHUNK_SIZE', 50000),
+                              progress=progress.update)
+    response_cache.bump_data_version()
+    progress.update(stage='done')
+    return {
+        'message': f'Agrupamento ajustado com {len(model.labels)} grupos',
+        'levels': model.labels,
+        'centroid_aqi': model.severity.tolist()
+    }
+
+def start_cluster_fit(n_clusters=4):
+    """Agenda o ajuste do agrupamento, reaproveitando um ajuste que ainda está na fila ou rodando"""
+    active = Job.query.filter(Job.kind == 'cluster', Job.status.in_(['queued', 'running'])) \
+        .order_by(Job.created_at.desc()).first()
+    if active is not None:
+        return active.id
+    return job_queue.enqueue('cluster', fit_clusters_job, n_clusters, user_id=current_user.id)
+
+@analysis_bp.route('/analysis/cluster-analysis')
+@login_required
+@response_cache.cached()
+def cluster_analysis():
+    """
+    Grupo da última leitura de cada localização, pelo centróide mais próximo do
+    agrupamento salvo. Sem agrupamento ajustado, agenda o ajuste e responde com o job.
+    """
+    try:
+        try:
+            model, version = load_cluster_model()
+        except FileNotFoundError:
+            n_clusters = current_app.config.get('CLUSTER_N_CLUSTERS', 4)
+            if not has_training_rows(minimum=n_clusters):
+                return jsonify({'success': False, 'message': 'Dados insuficientes para análise'})
+            job_id = start_cluster_fit(n_clusters)
+            return jsonify({
+                'success': False,
+                'pending': True,
+                'message': 'Agrupamento sendo ajustado em segundo plano',
+                'job_id': job_id,
+                'status_url': url_for('jobs.job_status', job_id=job_id)
+            }), 202
         
-        # Agrupar resultados
-        results = []
-        for i, location in enumerate(locations):
-            results.append({
-                **location,
-                'cluster': int(clusters[i]),
-                'pollution_level': ['Baixo', 'Moderado', 'Alto', 'Muito Alto'][clusters[i]]
-            })
+        frame = latest_station_frame()
+        if frame.empty:
+            return jsonify({'success': False, 'message': 'Dados insuficientes para análise'})
+        frame = assign_frame(model, frame)
+        frame['aqi'] = frame['aqi'].fillna(0)
+        results = frame.rename(columns={'latitude': 'lat', 'longitude': 'lng'})[
+            ['location', 'lat', 'lng', 'pm25', 'pm10', 'aqi', 'cluster', 'pollution_level']
+        ].to_dict('records')
         
         return jsonify({
             'success': True,
             'clusters': results,
-            'cluster_centers': kmeans.cluster_centers_.tolist()
+            'cluster_centers': model.cluster_centers.tolist(),
+            'levels': model.labels,
+            'model_version': version
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@analysis_bp.route('/analysis/cluster-analysis/fit', methods=['POST'])
+@login_required
+def cluster_fit():
+    """Reajusta o agrupamento sobre todo o histórico (em segundo plano)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        n_clusters = int(data.get('n_clusters') or current_app.config.get('CLUSTER_N_CLUSTERS', 4))
+        if not 2 <= n_clusters <= 10:
+            return jsonify({'success': False, 'message': 'n_clusters deve estar entre 2 e 10'})
+        if not has_training_rows(minimum=n_clusters):
+            return jsonify({'success': False, 'message': 'Dados insuficientes para análise'})
+        job_id = start_cluster_fit(n_clusters)
+        return job_started_response(job_id, 'Ajuste do agrupamento iniciado em segundo plano')
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@analysis_bp.route('/analysis/cluster-assign', methods=['POST'])
+@login_required
+def cluster_assign():
+    """
+    Grupo de cada leitura enviada, sem reajustar o agrupamento.
+    JSON: {"rows": [{"pm25": ..., "pm10": ...}, ...]}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        rows = data.get('rows')
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'success': False, 'message': 'Envie uma lista não vazia em "rows"'})
+        model, version = load_cluster_model()
+        frame = assign_frame(model, pd.DataFrame(rows))
+        return jsonify({
+            'success': True,
+            'clusters': frame['cluster'].tolist(),
+            'pollution_levels': frame['pollution_level'].tolist(),
+            'model_version': version
+        })
+    
+    except FileNotFoundError:
+        return jsonify({'success': False, 'message': 'Agrupamento ainda não ajustado'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def train_forecast_job(progress, test_fraction=0.2):
+    """Treina os modelos de previsão (um por horizonte) sobre a série horária de cada localização"""
+    progress.update(stage='loading')
+    series = load_hourly_series()
+    progress.update(stage='features', rows_total=len(series))
+    results = train_forecast_models(series, test_fraction=test_fraction, progress=progress.update,
+                                    save_model=ml_predictor.save_model)
+    progress.update(stage='done')
+    return {
+        'message': f'Previsão treinada para {len(results)} horizontes',
+        'hours_used': len(series),
+        'locations': int(series['location'].nunique()),
+        'horizons': {
+            forecast_model_name(horizon): {key: value for key, value in result.items() if key != 'model'}
+            for horizon, result in results.items()
+        }
+    }
+
+@analysis_bp.route('/analysis/train-forecast', methods=['POST'])
+@login_required
+def train_forecast():
+    """
+    Treina em segundo plano os modelos de previsão de AQI para 1h, 6h e 24h à frente,
+    a partir das médias horárias de cada localização (defasagens e médias móveis).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        test_fraction = float(data.get('test_fraction', 0.2))
+        if not 0 < test_fraction < 0.5:
+            return jsonify({'success': False, 'message': 'test_fraction deve estar entre 0 e 0.5'})
+        job_id = job_queue.enqueue('train', train_forecast_job, test_fraction, user_id=current_user.id)
+        return job_started_response(job_id, 'Treinamento da previsão iniciado em segundo plano')
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def forecast_records(frame):
+    frame = frame.copy()
+    frame['issued_at'] = frame['issued_at'].map(lambda value: value.isoformat())
+    for horizon in FORECAST_HORIZONS:
+        frame[f'forecast_{horizon}h'] = frame[f'forecast_{horizon}h'].round(1)
+    return frame.to_dict('records')
+
+@analysis_bp.route('/api/forecast')
+@analysis_bp.route('/api/forecast/<path:location>')
+@login_required
+def forecast(location=None):
+    """
+    Previsão de AQI de cada localização (ou de uma) a partir da hora mais recente
+    da série. As features e as previsões ficam em memória até os dados ou os
+    modelos mudarem (utils.forecasting.forecast_cache).
+    """
+    try:
+        try:
+            forecasts = forecast_cache.get()
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Modelos de previsão ainda não treinados'})
+        
+        if location is not None:
+            forecasts = forecasts[forecasts['location'] == location]
+            if forecasts.empty:
+                return jsonify({'success': False, 'message': f'Sem série horária para {location}'}), 404
+        return jsonify({
+            'success': True,
+            'horizons': FORECAST_HORIZONS,
+            'forecasts': forecast_records(forecasts)
         })
     
     except Exception as e:
@@ -229,6 +539,7 @@ def reports():
 
 @analysis_bp.route('/api/generate-report')
 @login_required
+@response_cache.cached()
 def generate_report():
     try:
         report_type = request.args.get('type', 'weekly')
@@ -242,36 +553,22 @@ def generate_report():
         else:  # monthly
             start_date = end_date - timedelta(days=30)
         
-        # Buscar dados do período
-        aq_data = AirQualityData.query.filter(
-            AirQualityData.timestamp.between(start_date, end_date)
-        ).all()
+        # Estatísticas do período a partir dos agregados por hora/dia
+        summary = summarize_window(start_date, end_date)
         
-        if not aq_data:
+        if not summary['total_records']:
             return jsonify({'success': False, 'message': 'Nenhum dado encontrado para o período'})
         
-        # Gerar estatísticas
-        aqi_values = [d.aqi for d in aq_data if d.aqi]
-        pm25_values = [d.pm25 for d in aq_data if d.pm25]
-        
         report = {
             'period': report_type,
             'start_date': start_date.isoformat(),
             'end_date': end_date.isoformat(),
-            'total_records': len(aq_data),
+            'total_records': summary['total_records'],
             'stats': {
-                'aqi': {
-                    'mean': sum(aqi_values) / len(aqi_values) if aqi_values else 0,
-                    'max': max(aqi_values) if aqi_values else 0,
-                    'min': min(aqi_values) if aqi_values else 0
-                },
-                'pm25': {
-                    'mean': sum(pm25_values) / len(pm25_values) if pm25_values else 0,
-                    'max': max(pm25_values) if pm25_values else 0,
-                    'min': min(pm25_values) if pm25_values else 0
-                }
+                'aqi': summary['aqi'],
+                'pm25': summary['pm25']
             },
-            'alerts': generate_alerts(aq_data)
+            'alerts': generate_alerts(start_date, end_date)
         }
         
         return jsonify({'success': True, 'report': report})
@@ -279,25 +576,26 @@ def generate_report():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-def generate_alerts(aq_data):
+def generate_alerts(start_date, end_date):
     alerts = []
     
     # Verificar níveis críticos
-    high_pm25 = [d for d in aq_data if d.pm25 and d.pm25 > 35]
-    high_aqi = [d for d in aq_data if d.aqi and d.aqi > 100]
+    exceedances = exceedances_by_location(start_date, end_date)
+    high_pm25 = {location: counts['pm25'] for location, counts in exceedances.items() if counts['pm25']}
+    high_aqi = {location: counts['aqi'] for location, counts in exceedances.items() if counts['aqi']}
     
     if high_pm25:
         alerts.append({
             'type': 'warning',
-            'message': f'{len(high_pm25)} registros com PM2.5 acima do limite seguro (35 µg/m³)',
-            'locations': list(set([d.location for d in high_pm25]))
+            'message': f'{sum(high_pm25.values())} registros com PM2.5 acima do limite seguro ({PM25_LIMIT} µg/m³)',
+            'locations': list(high_pm25)
         })
     
     if high_aqi:
         alerts.append({
             'type': 'danger',
-            'message': f'{len(high_aqi)} registros com AQI acima de 100 (insalubre)',
-            'locations': list(set([d.location for d in high_aqi]))
+            'message': f'{sum(high_aqi.values())} registros com AQI acima de {AQI_LIMIT} (insalubre)',
+            'locations': list(high_aqi)
         })
     
     return alerts
\ No newline at end of file
@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request, current_app, make_response
 from flask_login import login_required, current_user
-from models.air_quality import AirQualityData
+from models.air_quality import LatestReading
+from utils.cache import response_cache
+from utils.spatial import station_index
+from utils.interpolation import interpolation_cache, snap_bbox
 import json
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -12,29 +15,156 @@ def index():
 
 @dashboard_bp.route('/api/air-quality-data')
 @login_required
+@response_cache.cached()
 def air_quality_data():
-    # Busca os 100 registros mais recentes do banco de dados
-    latest_data = AirQualityData.query.order_by(AirQualityData.timestamp.desc()).limit(100).all()
+    # Uma linha por localização, mantida pela ingestão (todas as estações aparecem)
+    latest_data = LatestReading.query.all()
     
     data = []
-    locations_added = set()  # Usado para evitar locais duplicados no mapa
-
     for record in latest_data:
-        if record.location not in locations_added:
-            status = 'Boa'
-            if record.aqi and record.aqi > 100:
-                status = 'Insalubre'
-            elif record.aqi and record.aqi > 50:
-                status = 'Moderada'
+        status = 'Boa'
+        if record.aqi and record.aqi > 100:
+            status = 'Insalubre'
+        elif record.aqi and record.aqi > 50:
+            status = 'Moderada'
+        
+        data.append({
+            'location': record.location,
+            'latitude': record.latitude,
+            'longitude': record.longitude,
+            'aqi': record.aqi,
+            'pm25': record.pm25,
+            'status': status
+        })
             
-            data.append({
-                'location': record.location,
-                'latitude': record.latitude,
-                'longitude': record.longitude,
-                'aqi': record.aqi,
-                'pm25': record.pm25,
-                'status': status
+    return jsonify(data)
+
+def float_arg(name, low, high, default=None):
+    """Parâmetro numérico da query string, limitado a [low, high] (ValueError se inválido)"""
+    value = request.args.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise ValueError(f'Parâmetro {name} é obrigatório')
+        return default
+    try:
+        return min(max(float(value), low), high)
+    except ValueError:
+        raise ValueError(f'Parâmetro {name} inválido')
+
+@dashboard_bp.route('/api/stations/bbox')
+@login_required
+@response_cache.cached()
+def stations_bbox():
+    """
+    Estações dentro do retângulo south/west/north/east (graus).
+    Com zoom (0-20), estações próximas entre si voltam agrupadas em "clusters".
+    """
+    try:
+        south = float_arg('south', -90, 90)
+        north = float_arg('north', -90, 90)
+        west = float_arg('west', -180, 180)
+        east = float_arg('east', -180, 180)
+        if south > north or west > east:
+            return jsonify({'success': False, 'message': 'Retângulo inválido (south <= north e west <= east)'})
+        
+        index = station_index.get()
+        positions = index.bbox(south, west, north, east)
+        if request.args.get('zoom') not in (None, ''):
+            stations, clusters = index.clusters(positions, int(float_arg('zoom', 0, 20)))
+        else:
+            stations, clusters = index.records(positions), []
+        
+        return jsonify({'success': True, 'total': len(positions), 'stations': stations, 'clusters': clusters})
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@dashboard_bp.route('/api/stations/nearest')
+@login_required
+@response_cache.cached()
+def stations_nearest():
+    """
+    Estações mais próximas de lat/lng, com a distância em km: as n mais próximas
+    (padrão 10), as que estão a até radius_km, ou as n mais próximas dentro do raio.
+    """
+    try:
+        lat = float_arg('lat', -90, 90)
+        lng = float_arg('lng', -180, 180)
+        max_n = current_app.config.get('SPATIAL_NEAREST_MAX', 500)
+        radius_km = float_arg('radius_km', 0, 20040, default=-1)
+        radius_km = radius_km if radius_km >= 0 else None
+        n = int(float_arg('n', 1, max_n, default=10 if radius_km is None else max_n))
+        
+        index = station_index.get()
+        positions, distances = index.nearest(lat, lng, n=n, radius_km=radius_km)
+        return jsonify({'success': True, 'stations': index.records(positions, distances)})
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@dashboard_bp.route('/api/interpolation/grid')
+@login_required
+def interpolation_grid():
+    """
+    Grade interpolada (IDW) da última leitura das estações sobre o retângulo
+    south/west/north/east, na resolução em graus (variable: aqi, pm25 ou pm10).
+
+    Resposta binária: float32 little-endian, uma linha por latitude do norte para o
+    sul e NaN sem estação próxima. Os cabeçalhos X-Grid-* descrevem a grade (o
+    retângulo é alinhado à resolução). format=json devolve os mesmos dados em JSON.
+    """
+    try:
+        config = current_app.config
+        variable = request.args.get('variable', 'aqi')
+        resolution = float_arg('resolution', 0.01, 5, default=config.get('INTERPOLATION_RESOLUTION', 0.25))
+        south, west, north, east = snap_bbox(float_arg('south', -90, 90), float_arg('west', -180, 180),
+                                             float_arg('north', -90, 90), float_arg('east', -180, 180),
+                                             resolution)
+        if south >= north or west >= east:
+            return jsonify({'success': False, 'message': 'Retângulo inválido (south < north e west < east)'})
+        cells = round((north - south) / resolution) * round((east - west) / resolution)
+        max_cells = config.get('INTERPOLATION_MAX_CELLS', 250000)
+        if cells > max_cells:
+            return jsonify({'success': False, 'message': f'Grade muito grande ({cells} células); máximo {max_cells}'})
+        
+        grid, version, _ = interpolation_cache.get(
+            variable, south, west, north, east, resolution,
+            k=int(float_arg('k', 1, 32, default=config.get('INTERPOLATION_NEIGHBORS', 8))),
+            power=float_arg('power', 0.5, 5, default=2.0),
+            max_distance_km=config.get('INTERPOLATION_MAX_DISTANCE_KM')
+        )
+        values = grid.values
+        
+        if request.args.get('format') == 'json':
+            return jsonify({
+                'success': True,
+                'variable': variable,
+                'bbox': [south, west, north, east],
+                'resolution': resolution,
+                'rows': grid.rows,
+                'cols': grid.cols,
+                'values': [[None if v != v else round(float(v), 2) for v in row] for row in values]
             })
-            locations_added.add(record.location)
-            
-    return jsonify(data)
\ No newline at end of file
+        
+        etag = f'{version}-{variable}-{south}-{west}-{north}-{east}-{resolution}-{grid.k}-{grid.power}'
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(values.astype('<f4', copy=False).tobytes())
+            response.mimetype = 'application/octet-stream'
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers.update({
+            'X-Grid-Variable': variable,
+            'X-Grid-South': str(south),
+            'X-Grid-West': str(west),
+            'X-Grid-North': str(north),
+            'X-Grid-East': str(east),
+            'X-Grid-Resolution': str(resolution),
+            'X-Grid-Rows': str(grid.rows),
+            'X-Grid-Cols': str(grid.cols)
+        })
+        return response
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
@@ -1,17 +1,25 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import (Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app,
+                   Response, stream_with_context)
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import pandas as pd
 import os
+import itertools
 from datetime import datetime
 from models.air_quality import Dataset, AirQualityData
 from app import db
 from utils.data_collector import DataCollector
 from utils.data_processor import DataProcessor
+from utils.ingestion import DataIngestor, read_file_chunks, has_time_column, MISSING_TIME_MESSAGE
+from utils.jobs import job_queue
+from utils.cache import response_cache
+from utils.export import iter_reading_batches, ndjson_lines, csv_lines, EXPORT_FORMATS
+from utils.archive import iter_export_rows, READING_TIERS
 
 data_bp = Blueprint('data', __name__)
 data_collector = DataCollector()
 data_processor = DataProcessor()
+data_ingestor = DataIngestor()
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 
@@ -50,135 +58,59 @@ def detect_file_type(df):
     
     return 'unknown'
 
-def process_inmet_data(df, dataset_name):
+def process_inmet_data(df, dataset_id):
     """Processa dados do INMET"""
-    records_saved = 0
-    
-    for _, row in df.iterrows():
-        try:
-            # Determinar localização baseada na estação
-            station_locations = {
-                'A001': {'name': 'Manaus', 'lat': -3.1190, 'lng': -60.0217},
-                'A734': {'name': 'Belém', 'lat': -1.4558, 'lng': -48.4902},
-                'A930': {'name': 'Porto Velho', 'lat': -8.7612, 'lng': -63.9005},
-                'A520': {'name': 'Rio Branco', 'lat': -9.9754, 'lng': -67.8249}
-            }
-            
-            station = row.get('station', 'A001')
-            location_info = station_locations.get(station, station_locations['A001'])
-            
-            aq_data = AirQualityData(
-                location=f"{location_info['name']} - Estação {station}",
-                latitude=location_info['lat'],
-                longitude=location_info['lng'],
-                temperature=float(row.get('temperature', 0)) if pd.notnull(row.get('temperature')) else None,
-                humidity=float(row.get('humidity', 0)) if pd.notnull(row.get('humidity')) else None,
-                pressure=float(row.get('pressure', 0)) if pd.notnull(row.get('pressure')) else None,
-                source='inmet'
-            )
-            
-            # Calcular AQI baseado apenas em dados meteorológicos (aproximação)
-            aq_data.aqi = data_collector.calculate_aqi(
-                None, None, None, None, None,  # Sem dados de poluentes
-                aq_data.temperature, 
-                aq_data.humidity, 
-                aq_data.pressure
-            )
-            
-            db.session.add(aq_data)
-            records_saved += 1
-            
-        except (ValueError, TypeError) as e:
-            print(f"⚠️  Erro ao processar linha INMET: {e}")
-            continue
-    
-    return records_saved
+    return data_ingestor.ingest(df, 'inmet', dataset_id)
 
-def process_openaq_data(df, dataset_name):
+def process_openaq_data(df, dataset_id):
     """Processa dados do OpenAQ"""
-    records_saved = 0
-    
-    # Agrupar por localização e parâmetro para evitar duplicatas
-    grouped = df.groupby(['location', 'parameter'])
-    
-    for (location, parameter), group in grouped:
-        try:
-            # Pegar o registro mais recente de cada grupo
-            latest_record = group.iloc[0]
-            
-            aq_data = AirQualityData(
-                location=location,
-                latitude=float(latest_record.get('latitude', 0)),
-                longitude=float(latest_record.get('longitude', 0)),
-                source='openaq'
-            )
-            
-            # Mapear parâmetros do OpenAQ para nossas colunas
-            parameter_value = float(latest_record.get('value', 0)) if pd.notnull(latest_record.get('value')) else None
-            
-            if parameter == 'pm25':
-                aq_data.pm25 = parameter_value
-            elif parameter == 'pm10':
-                aq_data.pm10 = parameter_value
-            elif parameter == 'no2':
-                aq_data.no2 = parameter_value
-            elif parameter == 'o3':
-                aq_data.o3 = parameter_value
-            elif parameter == 'so2':
-                aq_data.so2 = parameter_value
-            elif parameter == 'co':
-                aq_data.co2 = parameter_value * 1000  # Converter de ppm para ppb se necessário
-            
-            # Calcular AQI
-            aq_data.aqi = data_collector.calculate_aqi(
-                aq_data.pm25, aq_data.pm10, aq_data.no2, aq_data.o3, aq_data.co2
-            )
-            
-            db.session.add(aq_data)
-            records_saved += 1
-            
-        except (ValueError, TypeError) as e:
-            print(f"⚠️  Erro ao processar linha OpenAQ: {e}")
-            continue
-    
-    return records_saved
+    return data_ingestor.ingest(df, 'openaq', dataset_id)
 
-def process_manual_data(df, dataset_name):
+def process_manual_data(df, dataset_id):
     """Processa dados no formato manual"""
-    records_saved = 0
+    return data_ingestor.ingest(df, 'manual', dataset_id)
+
+def ingest_upload_job(progress, filepath, file_type, chunk_size, dataset_id=None):
+    """Grava um arquivo de upload em segundo plano, bloco a bloco, ligado ao dataset criado"""
+    def chunk_committed(**values):
+        # Cada bloco gravado já fica visível: invalidar as respostas em cache
+        response_cache.bump_data_version()
+        progress.update(**values)
     
-    for _, row in df.iterrows():
-        try:
-            aq_data = AirQualityData(
-                location=row['location'],
-                latitude=float(row['latitude']),
-                longitude=float(row['longitude']),
-                pm25=float(row.get('pm25', 0)) if pd.notnull(row.get('pm25')) else None,
-                pm10=float(row.get('pm10', 0)) if pd.notnull(row.get('pm10')) else None,
-                co2=float(row.get('co2', 0)) if pd.notnull(row.get('co2')) else None,
-                no2=float(row.get('no2', 0)) if pd.notnull(row.get('no2')) else None,
-                o3=float(row.get('o3', 0)) if pd.notnull(row.get('o3')) else None,
-                so2=float(row.get('so2', 0)) if pd.notnull(row.get('so2')) else None,
-                temperature=float(row.get('temperature', 0)) if pd.notnull(row.get('temperature')) else None,
-                humidity=float(row.get('humidity', 0)) if pd.notnull(row.get('humidity')) else None,
-                pressure=float(row.get('pressure', 0)) if pd.notnull(row.get('pressure')) else None,
-                source='manual'
-            )
-            
-            # Calcular AQI
-            aq_data.aqi = data_collector.calculate_aqi(
-                aq_data.pm25, aq_data.pm10, aq_data.no2, aq_data.o3, aq_data.co2,
-                aq_data.temperature, aq_data.humidity, aq_data.pressure
-            )
-            
-            db.session.add(aq_data)
-            records_saved += 1
-            
-        except (ValueError, TypeError) as e:
-            print(f"⚠️  Erro ao processar linha manual: {e}")
-            continue
+    try:
+        records_saved = data_ingestor.ingest_chunks(
+            read_file_chunks(filepath, chunk_size), file_type, progress=chunk_committed, dataset_id=dataset_id
+        )
+    except Exception:
+        # Remover arquivo em caso de erro
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
     
-    return records_saved
+    result = {'file_type': file_type, 'records_saved': records_saved}
+    if dataset_id is None:
+        result['message'] = f'Dataset {file_type.upper()} carregado com sucesso! {records_saved} registros salvos.'
+        return result
+    
+    # Leituras que já pertenciam a outro upload continuam nele: contar as que ficaram neste
+    records_linked = AirQualityData.query.filter(AirQualityData.dataset_id == dataset_id).count()
+    dataset = Dataset.query.get(dataset_id)
+    if dataset is not None:
+        dataset.records_received = records_saved
+        dataset.records_linked = records_linked
+        db.session.commit()
+    
+    result['records_linked'] = records_linked
+    result['message'] = (f'Dataset {file_type.upper()} carregado com sucesso! {records_saved} registros recebidos, '
+                         f'{records_linked} ligados ao dataset.')
+    if records_linked < records_saved:
+        result['warning'] = dataset_overlap_warning(records_saved, records_linked)
+    return result
+
+def dataset_overlap_warning(records_received, records_linked):
+    """Aviso para quando parte das leituras do arquivo já pertencia a outro dataset"""
+    return (f'{records_received - records_linked} de {records_received} leituras já pertenciam a outro '
+            f'dataset e continuam nele (os valores novos foram mesclados às leituras existentes).')
 
 @data_bp.route('/data/upload', methods=['GET', 'POST'])
 @login_required
@@ -205,13 +137,14 @@ def upload():
                 
                 # Processar arquivo
                 try:
-                    if filename.endswith('.csv'):
-                        df = pd.read_csv(filepath)
-                    else:
-                        df = pd.read_excel(filepath)
+                    # Ler apenas o primeiro bloco para detectar o formato
+                    chunk_size = current_app.config.get('UPLOAD_CHUNK_SIZE', 50000)
+                    chunks = read_file_chunks(filepath, chunk_size)
+                    first_chunk = next(chunks, None)
+                    chunks.close()
                     
                     # Detectar tipo de arquivo automaticamente
-                    file_type = detect_file_type(df)
+                    file_type = detect_file_type(first_chunk) if first_chunk is not None else 'unknown'
                     print(f"📁 Tipo de arquivo detectado: {file_type}")
                     
                     if file_type == 'unknown':
@@ -219,6 +152,11 @@ def upload():
                         os.remove(filepath)
                         return redirect(request.url)
                     
+                    if not has_time_column(first_chunk):
+                        flash(MISSING_TIME_MESSAGE, 'danger')
+                        os.remove(filepath)
+                        return redirect(request.url)
+                    
                     # Salvar dataset
                     dataset = Dataset(
                         name=request.form.get('dataset_name', f"{file_type}_{filename}"),
@@ -229,17 +167,9 @@ def upload():
                     db.session.add(dataset)
                     db.session.commit()
                     
-                    # Processar de acordo com o tipo
-                    records_saved = 0
-                    if file_type == 'inmet':
-                        records_saved = process_inmet_data(df, dataset.name)
-                    elif file_type == 'openaq':
-                        records_saved = process_openaq_data(df, dataset.name)
-                    elif file_type == 'manual':
-                        records_saved = process_manual_data(df, dataset.name)
-                    
-                    db.session.commit()
-                    flash(f'✅ Dataset {file_type.upper()} carregado com sucesso! {records_saved} registros salvos.', 'success')
+                    # Gravar os registros em segundo plano, em streaming
+                    job_id = job_queue.enqueue('upload', ingest_upload_job, filepath, file_type, chunk_size,
+                                               dataset.id, user_id=current_user.id)
                     
                 except Exception as e:
                     flash(f'Erro ao processar arquivo: {str(e)}', 'danger')
@@ -252,7 +182,15 @@ def upload():
                 flash(f'Erro ao salvar arquivo: {str(e)}', 'danger')
                 return redirect(request.url)
             
-            return redirect(url_for('data.upload'))
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'success': True,
+                    'job_id': job_id,
+                    'status_url': url_for('jobs.job_status', job_id=job_id)
+                }), 202
+            
+            flash(f'📥 Dataset {file_type.upper()} recebido! Os registros estão sendo processados em segundo plano.', 'info')
+            return redirect(url_for('data.upload', job=job_id))
     
     # Carregar datasets do usuário
     datasets = Dataset.query.filter_by(user_id=current_user.id).all()
@@ -263,33 +201,33 @@ def upload():
 def sources():
     return render_template('data_sources.html')
 
+def request_list(name, default):
+    """Lê um parâmetro repetido ou separado por vírgulas (?location=A&location=B ou ?location=A,B)"""
+    values = [v.strip() for raw in request.args.getlist(name) for v in raw.split(',') if v.strip()]
+    return values or [default]
+
 @data_bp.route('/api/fetch-openaq-data')
 @login_required
 def fetch_openaq_data():
     try:
-        location = request.args.get('location', 'Manaus')
-        data = data_collector.get_openaq_data(location=location, limit=100)
+        locations = request_list('location', 'Manaus')
+        limit = request.args.get('limit', 100, type=int)
+        data = data_collector.collect_openaq(locations, limit=limit)
         
-        if data:
+        if data['results']:
             # Processar e salvar dados
-            for measurement in data.get('results', []):
-                aq_data = AirQualityData(
-                    location=measurement.get('location', ''),
-                    latitude=measurement.get('coordinates', {}).get('latitude', 0),
-                    longitude=measurement.get('coordinates', {}).get('longitude', 0),
-                    pm25=measurement.get('value') if measurement.get('parameter') == 'pm25' else None,
-                    pm10=measurement.get('value') if measurement.get('parameter') == 'pm10' else None,
-                    no2=measurement.get('value') if measurement.get('parameter') == 'no2' else None,
-                    o3=measurement.get('value') if measurement.get('parameter') == 'o3' else None,
-                    so2=measurement.get('value') if measurement.get('parameter') == 'so2' else None,
-                    source='openaq'
-                )
-                db.session.add(aq_data)
+            frame = data_ingestor.prepare_openaq_measurements(data['results'])
+            records_saved = data_ingestor.insert_frame(frame)
             
             db.session.commit()
-            return jsonify({'success': True, 'message': f'Dados de {location} carregados com sucesso!'})
+            response_cache.bump_data_version()
+            return jsonify({
+                'success': True,
+                'message': f'Dados de {", ".join(locations)} carregados com sucesso! {records_saved} registros salvos.',
+                'errors': data['errors']
+            })
         else:
-            return jsonify({'success': False, 'message': 'Erro ao buscar dados do OpenAQ'})
+            return jsonify({'success': False, 'message': 'Erro ao buscar dados do OpenAQ', 'errors': data['errors']})
     
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -298,26 +236,23 @@ def fetch_openaq_data():
 @login_required
 def fetch_inmet_data():
     try:
-        station_code = request.args.get('station', 'A001')
-        data = data_collector.get_inmet_data(station_code)
+        station_codes = request_list('station', 'A001')
+        data = data_collector.collect_inmet(station_codes)
         
-        if data:
+        if data['observations']:
             # Processar dados do INMET
-            aq_data = AirQualityData(
-                location=data.get('DC_NOME', 'Estação INMET'),
-                latitude=data.get('VL_LATITUDE', 0),
-                longitude=data.get('VL_LONGITUDE', 0),
-                temperature=data.get('TEM_INS', 0),
-                humidity=data.get('UMD_INS', 0),
-                pressure=data.get('PRE_INS', 0),
-                source='inmet'
-            )
-            db.session.add(aq_data)
+            frame = data_ingestor.prepare_inmet_observations(data['observations'])
+            records_saved = data_ingestor.insert_frame(frame)
             db.session.commit()
+            response_cache.bump_data_version()
             
-            return jsonify({'success': True, 'message': 'Dados do INMET carregados com sucesso!'})
+            return jsonify({
+                'success': True,
+                'message': f'Dados do INMET carregados com sucesso! {records_saved} registros salvos.',
+                'errors': data['errors']
+            })
         else:
-            return jsonify({'success': False, 'message': 'Erro ao buscar dados do INMET'})
+            return jsonify({'success': False, 'message': 'Erro ao buscar dados do INMET', 'errors': data['errors']})
     
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -334,28 +269,101 @@ def datasets_list():
 @data_bp.route('/api/dataset/<int:dataset_id>')
 @login_required
 def get_dataset_data(dataset_id):
-    """Retorna dados de um dataset específico"""
+    """
+    Retorna as leituras de um dataset, paginadas por chave (id crescente).
+    Parâmetros: after (id da última leitura da página anterior) e limit.
+    A próxima página é pedida com after=next_after enquanto has_more for verdadeiro.
+    """
     dataset = Dataset.query.get_or_404(dataset_id)
     
     # Verificar se o usuário tem permissão
     if dataset.user_id != current_user.id and not current_user.is_admin:
         return jsonify({'error': 'Acesso negado'}), 403
     
-    # Buscar dados de qualidade do ar relacionados
-    air_data = AirQualityData.query.filter_by(source='manual').all()
+    after = request.args.get('after', 0, type=int)
+    max_limit = current_app.config.get('DATASET_PAGE_MAX', 5000)
+    limit = max(1, min(request.args.get('limit', current_app.config.get('DATASET_PAGE_SIZE', 500), type=int), max_limit))
+    
+    # Leituras do dataset (índice em dataset_id), a partir do id informado
+    query = AirQualityData.query.filter(AirQualityData.dataset_id == dataset.id)
+    page = query.filter(AirQualityData.id > after).order_by(AirQualityData.id).limit(limit + 1).all()
+    has_more = len(page) > limit
+    page = page[:limit]
     
-    data = [item.to_dict() for item in air_data]
+    data = [item.to_dict() for item in page]
+    total_records = query.count()
+    warning = None
+    if dataset.records_received is not None and total_records < dataset.records_received:
+        warning = dataset_overlap_warning(dataset.records_received, total_records)
     return jsonify({
         'dataset': {
             'id': dataset.id,
             'name': dataset.name,
             'description': dataset.description,
-            'created_at': dataset.created_at.isoformat()
+            'created_at': dataset.created_at.isoformat(),
+            'records_received': dataset.records_received,
+            'records_linked': dataset.records_linked
         },
         'records': data,
-        'total_records': len(data)
+        'total_records': total_records,
+        'warning': warning,
+        'limit': limit,
+        'has_more': has_more,
+        'next_after': data[-1]['id'] if has_more else None
     })
 
+@data_bp.route('/api/export/readings')
+@login_required
+def export_readings():
+    """
+    Exporta leituras em streaming (NDJSON ou CSV), em ordem de id.
+    Filtros: location, source, start, end (ISO 8601) e dataset_id.
+    format=ndjson|csv; after=<id> retoma a partir da última leitura recebida; limit é opcional.
+    tier=hot|archive|all: banco (padrão), arquivo Parquet ou ambos (o arquivo primeiro;
+    after e limit valem para as leituras do banco).
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Formato inválido: use {' ou '.join(EXPORT_FORMATS)}"}), 400
+    tier = request.args.get('tier', 'hot')
+    if tier not in READING_TIERS:
+        return jsonify({'error': f"Camada inválida: use {', '.join(READING_TIERS)}"}), 400
+    
+    dataset_id = request.args.get('dataset_id', type=int)
+    if dataset_id is not None:
+        dataset = Dataset.query.get_or_404(dataset_id)
+        if dataset.user_id != current_user.id and not current_user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+    
+    filters = {key: request.args.get(key) for key in ['location', 'source', 'start', 'end']}
+    try:
+        query = AirQualityData.filtered_query(**filters)
+    except ValueError as e:
+        return jsonify({'error': f'Data inválida: {e}'}), 400
+    if dataset_id is not None:
+        query = query.filter(AirQualityData.dataset_id == dataset_id)
+    
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    batches = iter(())
+    if tier != 'archive':
+        batches = iter_reading_batches(
+            query,
+            after=request.args.get('after', 0, type=int),
+            limit=request.args.get('limit', type=int),
+            page_size=current_app.config.get('EXPORT_PAGE_SIZE', 50000),
+            batch_size=batch_size
+        )
+    if tier != 'hot':
+        archived = iter_export_rows(batch_size=batch_size, tier='archive', dataset_id=dataset_id, **filters)
+        batches = itertools.chain(archived, batches)
+    lines = ndjson_lines(batches) if export_format == 'ndjson' else csv_lines(batches)
+    filename = f"leituras_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(lines),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @data_bp.route('/data/dataset/<int:dataset_id>')
 @login_required
 def view_dataset(dataset_id):
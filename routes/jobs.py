@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from models.job import Job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """Retorna status, progresso e resultado de uma tarefa em segundo plano"""
+    job = Job.query.get_or_404(job_id)
+
+    # Verificar permissão
+    if job.user_id != current_user.id and not current_user.is_admin:
+        return jsonify({'error': 'Acesso negado'}), 403
+
+    return jsonify(job.to_dict())
@@ -1,6 +1,7 @@
 from app import create_app, db
 from models.user import User
 from models.air_quality import AirQualityData
+from utils.migrations import run_migrations
 import os
 
 def initialize_application():
@@ -17,6 +18,7 @@ def initialize_application():
     try:
         with app.app_context():
             db.create_all()
+            run_migrations()
             print("✅ Banco de dados inicializado com sucesso!")
             
             user_count = User.query.count()
@@ -0,0 +1,52 @@
+"""
+Coleta agendada das fontes externas (OpenAQ e INMET).
+
+Roda em um processo separado do servidor web e, a cada SCHEDULER_INTERVAL
+segundos, busca apenas as medições mais novas que a marca d'água de cada
+localização/estação (tabela ingest_cursor).
+
+Com o cache de respostas em memória, as respostas JSON em cache dos workers
+web só mostram os dados novos após o TTL (CACHE_DEFAULT_TTL); use
+CACHE_BACKEND=disk para invalidá-las na hora. O índice das estações, as grades
+interpoladas e as previsões consultam o banco e se atualizam em até
+DATA_STAMP_INTERVAL segundos com qualquer backend.
+
+Uso: python scheduler.py [--interval 900] [--once]
+"""
+import argparse
+import time
+from app import create_app, db
+from utils.migrations import run_migrations
+from utils.scheduler import IncrementalIngestor
+
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interval', type=int, default=app.config['SCHEDULER_INTERVAL'])
+    parser.add_argument('--once', action='store_true', help='executa uma única rodada e termina')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        ingestor = IncrementalIngestor()
+
+        print(f"⏰ Coleta agendada a cada {args.interval}s "
+              f"(OpenAQ: {', '.join(app.config['SCHEDULER_OPENAQ_LOCATIONS']) or '-'}; "
+              f"INMET: {', '.join(app.config['SCHEDULER_INMET_STATIONS']) or '-'})")
+        try:
+            while True:
+                started = time.monotonic()
+                summary = ingestor.run_once()
+                print(f"✅ Rodada concluída em {time.monotonic() - started:.1f}s: "
+                      + ', '.join(f'{source} = {count if count is not None else "erro"} registros novos'
+                                  for source, count in summary.items()))
+                if args.once:
+                    break
+                time.sleep(max(0, args.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print("👋 Coleta agendada encerrada")
+
+if __name__ == '__main__':
+    main()
@@ -47,4 +47,89 @@ function getAQIColor(aqi) {
     if (aqi <= 200) return '#ff0000';     // Insalubre - Vermelho
     if (aqi <= 300) return '#8f3f97';     // Muito Insalubre - Roxo
     return '#7e0023';                     // Perigosa - Vermelho Escuro
-}
\ No newline at end of file
+}
+// Acompanha uma tarefa em segundo plano (/api/jobs/<id>) até terminar
+function pollJob(jobId, onProgress, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        const check = () => {
+            fetch(`/api/jobs/${jobId}`)
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'finished') {
+                        resolve(job.result);
+                    } else if (job.status === 'failed') {
+                        reject(job.error);
+                    } else {
+                        if (onProgress) onProgress(job);
+                        setTimeout(check, interval);
+                    }
+                })
+                .catch(reject);
+        };
+        check();
+    });
+}
+
+// Cores dos níveis do agrupamento por poluição (grupos já vêm ordenados por severidade)
+const CLUSTER_COLORS = {
+    'Baixo': 'success',
+    'Moderado': 'warning',
+    'Alto': 'danger',
+    'Muito Alto': 'dark'
+};
+
+// Busca a análise de clusters; se o agrupamento ainda não foi ajustado, espera o job e tenta de novo
+function fetchClusterAnalysis(onProgress) {
+    return fetch('/analysis/cluster-analysis')
+        .then(response => response.json())
+        .then(data => {
+            if (data.pending && data.job_id) {
+                return pollJob(data.job_id, onProgress).then(() => fetchClusterAnalysis(onProgress));
+            }
+            return data;
+        });
+}
+
+// Nomes exibidos dos modelos
+const MODEL_NAMES = {
+    random_forest: 'Random Forest',
+    linear_regression: 'Regressão Linear',
+    sgd_regressor: 'SGD (incremental)'
+};
+
+function modelName(modelType) {
+    return MODEL_NAMES[modelType] || modelType;
+}
+
+// Texto de progresso de uma tarefa em segundo plano
+function describeJobProgress(job) {
+    const progress = job.progress || {};
+    if (progress.trees_fitted !== undefined && progress.stage === 'random_forest') {
+        return `Random Forest: ${progress.trees_fitted}/${progress.trees_total} árvores treinadas`;
+    }
+    if (progress.epochs_done !== undefined && progress.stage === 'sgd_regressor') {
+        return `SGD incremental: ${progress.epochs_done}/${progress.epochs_total} épocas`;
+    }
+    if (progress.stage === 'clustering' && progress.rows_fitted !== undefined) {
+        return `Agrupamento: ${progress.rows_fitted}/${progress.rows_total} leituras`;
+    }
+    if (progress.stage === 'sweep' && progress.candidates_done !== undefined) {
+        return `Busca de hiperparâmetros: ${progress.candidates_done}/${progress.candidates_total} combinações`;
+    }
+    if (progress.stage === 'forecast' && progress.horizons_done !== undefined) {
+        return `Previsão: ${progress.horizons_done}/${progress.horizons_total} horizontes treinados`;
+    }
+    if (progress.models_done !== undefined) {
+        return `${progress.models_done}/${progress.models_total} modelos treinados`;
+    }
+    if (progress.stage === 'loading' && progress.rows_loaded !== undefined) {
+        return `${progress.rows_loaded} registros carregados`;
+    }
+    if (progress.rows_ingested !== undefined) {
+        return `${progress.rows_ingested} registros gravados`;
+    }
+    if (progress.stage) {
+        return `Etapa: ${progress.stage}`;
+    }
+    return job.status === 'queued' ? 'Aguardando na fila...' : 'Processando...';
+}
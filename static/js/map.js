@@ -1,6 +1,12 @@
 // Mapa interativo da qualidade do ar
 let map;
 const markers = [];
+let stationsRequest = null;
+let heatmapLayer = null;
+let heatmapOverlay = null;
+let heatmapRequest = null;
+// Resoluções (graus) da grade interpolada; valores fixos para aproveitar o cache do servidor
+const HEATMAP_RESOLUTIONS = [0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 2];
 
 // Função para obter a cor baseada no AQI (Índice de Qualidade do Ar)
 function getAQIColor(aqi) {
@@ -26,46 +32,153 @@ function loadMap() {
         attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
     }).addTo(map);
 
-    // 3. Busca os dados das estações na nossa API.
-    fetch('/api/air-quality-data')
+    // 3. Busca só as estações visíveis (agrupadas pelo servidor conforme o zoom) a cada movimento.
+    map.on('moveend', loadVisibleStations);
+    loadVisibleStations();
+
+    // Camada opcional com o AQI interpolado entre as estações
+    heatmapLayer = L.layerGroup();
+    L.control.layers(null, { 'Mapa de calor (AQI interpolado)': heatmapLayer }).addTo(map);
+    map.on('overlayadd', event => { if (event.layer === heatmapLayer) loadHeatmap(); });
+    map.on('moveend', () => { if (map.hasLayer(heatmapLayer)) loadHeatmap(); });
+}
+
+// Estações e grupos dentro da área visível do mapa (/api/stations/bbox)
+function loadVisibleStations() {
+    const bounds = map.getBounds();
+    const clamp = (value, limit) => Math.max(-limit, Math.min(limit, value));
+    const params = new URLSearchParams({
+        south: clamp(bounds.getSouth(), 90).toFixed(4),
+        west: clamp(bounds.getWest(), 180).toFixed(4),
+        north: clamp(bounds.getNorth(), 90).toFixed(4),
+        east: clamp(bounds.getEast(), 180).toFixed(4),
+        zoom: map.getZoom()
+    });
+
+    // Cancela a consulta anterior se o mapa mudou antes da resposta
+    if (stationsRequest) stationsRequest.abort();
+    stationsRequest = new AbortController();
+
+    fetch(`/api/stations/bbox?${params}`, { signal: stationsRequest.signal })
         .then(response => response.json())
-        .then(stations => {
-            // Limpa marcadores antigos se a função for chamada novamente
+        .then(data => {
+            if (!data.success) {
+                console.error('Erro ao carregar dados do mapa:', data.message);
+                return;
+            }
+            // Limpa marcadores antigos
             markers.forEach(marker => marker.remove());
+            markers.length = 0;
+
+            // 4. Um círculo por grupo, maior conforme o número de estações; o clique aproxima o mapa.
+            data.clusters.forEach(cluster => {
+                const clusterMarker = L.circleMarker([cluster.latitude, cluster.longitude], {
+                    radius: Math.min(10 + Math.log2(cluster.count) * 3, 30),
+                    fillColor: getAQIColor(cluster.aqi_max),
+                    color: '#000',
+                    weight: 1,
+                    opacity: 1,
+                    fillOpacity: 0.6
+                }).addTo(map);
+
+                clusterMarker.bindTooltip(`${cluster.count} estações<br>AQI médio: ${cluster.aqi_mean ?? 'N/A'} | máximo: ${cluster.aqi_max ?? 'N/A'}`);
+                clusterMarker.on('click', () => map.setView([cluster.latitude, cluster.longitude], map.getZoom() + 2));
+                markers.push(clusterMarker);
+            });
+
+            // 5. Um marcador para cada estação isolada.
+            data.stations.forEach(station => addStationMarker(station));
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') console.error('Erro ao carregar dados do mapa:', error);
+        });
+}
+
+function addStationMarker(station) {
+    const circleMarker = L.circleMarker([station.latitude, station.longitude], {
+        radius: 8,
+        fillColor: getAQIColor(station.aqi),
+        color: '#000',
+        weight: 1,
+        opacity: 1,
+        fillOpacity: 0.8
+    }).addTo(map);
+
+    // Conteúdo que aparece no hover
+    const popupContent = `
+        <b>${station.location}</b><br>
+        Qualidade do Ar: <b>${station.status}</b><br>
+        AQI: ${station.aqi || 'N/A'}<br>
+        PM2.5: ${station.pm25 ? station.pm25.toFixed(2) + ' µg/m³' : 'N/A'}
+    `;
+
+    circleMarker.on('mouseover', function (e) {
+        this.bindPopup(popupContent).openPopup();
+    });
+
+    // Fecha o popup ao retirar o mouse
+    circleMarker.on('mouseout', function (e) {
+        this.closePopup();
+    });
+
+    markers.push(circleMarker);
+}
 
-            // 4. Adiciona um marcador para cada estação no mapa.
-            stations.forEach(station => {
-                if (station.latitude && station.longitude) {
-                    const circleMarker = L.circleMarker([station.latitude, station.longitude], {
-                        radius: 8,
-                        fillColor: getAQIColor(station.aqi),
-                        color: '#000',
-                        weight: 1,
-                        opacity: 1,
-                        fillOpacity: 0.8
-                    }).addTo(map);
-
-                    // 5. Define o conteúdo que aparecerá no hover.
-                    const popupContent = `
-                        <b>${station.location}</b><br>
-                        Qualidade do Ar: <b>${station.status}</b><br>
-                        AQI: ${station.aqi || 'N/A'}<br>
-                        PM2.5: ${station.pm25 ? station.pm25.toFixed(2) + ' µg/m³' : 'N/A'}
-                    `;
-
-                    // 6. Adiciona o evento de "mouseover" (passar o mouse).
-                    circleMarker.on('mouseover', function (e) {
-                        this.bindPopup(popupContent).openPopup();
-                    });
-
-                    // Opcional: Fecha o popup ao retirar o mouse.
-                    circleMarker.on('mouseout', function (e) {
-                        this.closePopup();
-                    });
-
-                    markers.push(circleMarker);
-                }
+// Grade de AQI interpolada (/api/interpolation/grid, float32 do norte para o sul) desenhada como imagem
+function loadHeatmap() {
+    const bounds = map.getBounds();
+    const clamp = (value, limit) => Math.max(-limit, Math.min(limit, value));
+    const span = clamp(bounds.getEast(), 180) - clamp(bounds.getWest(), 180);
+    // Cerca de 200 células na largura da tela
+    const resolution = HEATMAP_RESOLUTIONS.find(step => span / step <= 200) || HEATMAP_RESOLUTIONS[HEATMAP_RESOLUTIONS.length - 1];
+    const params = new URLSearchParams({
+        variable: 'aqi',
+        south: clamp(bounds.getSouth(), 90).toFixed(4),
+        west: clamp(bounds.getWest(), 180).toFixed(4),
+        north: clamp(bounds.getNorth(), 90).toFixed(4),
+        east: clamp(bounds.getEast(), 180).toFixed(4),
+        resolution: resolution
+    });
+
+    if (heatmapRequest) heatmapRequest.abort();
+    heatmapRequest = new AbortController();
+
+    fetch(`/api/interpolation/grid?${params}`, { signal: heatmapRequest.signal })
+        .then(response => {
+            if (!response.ok || response.headers.get('Content-Type') !== 'application/octet-stream') {
+                return response.json().then(data => { throw data.message; });
+            }
+            return response.arrayBuffer().then(buffer => ({ buffer, headers: response.headers }));
+        })
+        .then(({ buffer, headers }) => {
+            const rows = parseInt(headers.get('X-Grid-Rows'));
+            const cols = parseInt(headers.get('X-Grid-Cols'));
+            const values = new Float32Array(buffer);
+
+            const canvas = document.createElement('canvas');
+            canvas.width = cols;
+            canvas.height = rows;
+            const context = canvas.getContext('2d');
+            const image = context.createImageData(cols, rows);
+            values.forEach((value, i) => {
+                if (Number.isNaN(value)) return;  // sem estação próxima: transparente
+                const color = getAQIColor(value);
+                image.data[i * 4] = parseInt(color.slice(1, 3), 16);
+                image.data[i * 4 + 1] = parseInt(color.slice(3, 5), 16);
+                image.data[i * 4 + 2] = parseInt(color.slice(5, 7), 16);
+                image.data[i * 4 + 3] = 255;
             });
+            context.putImageData(image, 0, 0);
+
+            const imageBounds = [
+                [parseFloat(headers.get('X-Grid-South')), parseFloat(headers.get('X-Grid-West'))],
+                [parseFloat(headers.get('X-Grid-North')), parseFloat(headers.get('X-Grid-East'))]
+            ];
+            if (heatmapOverlay) heatmapLayer.removeLayer(heatmapOverlay);
+            heatmapOverlay = L.imageOverlay(canvas.toDataURL(), imageBounds, { opacity: 0.45 });
+            heatmapLayer.addLayer(heatmapOverlay);
         })
-        .catch(error => console.error('Erro ao carregar dados do mapa:', error));
-}
\ No newline at end of file
+        .catch(error => {
+            if (error && error.name !== 'AbortError') console.error('Erro ao carregar o mapa de calor:', error);
+        });
+}
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+POLLUTANTS = ['pm25', 'pm10', 'no2', 'o3']
+
+# Breakpoints do AQI: (conc. baixa, conc. alta, AQI baixo, AQI alto)
+BREAKPOINTS = {
+    'pm25': [
+        (0, 12.0, 0, 50),
+        (12.1, 35.4, 51, 100),
+        (35.5, 55.4, 101, 150),
+        (55.5, 150.4, 151, 200),
+        (150.5, 250.4, 201, 300),
+        (250.5, 500.4, 301, 500)
+    ],
+    'pm10': [
+        (0, 54, 0, 50),
+        (55, 154, 51, 100),
+        (155, 254, 101, 150),
+        (255, 354, 151, 200),
+        (355, 424, 201, 300),
+        (425, 604, 301, 500)
+    ],
+    'no2': [  # ppm
+        (0, 0.053, 0, 50),
+        (0.054, 0.100, 51, 100),
+        (0.101, 0.360, 101, 150),
+        (0.361, 0.649, 151, 200),
+        (0.650, 1.249, 201, 300),
+        (1.250, 2.049, 301, 500)
+    ],
+    'o3': [  # ppm
+        (0, 0.059, 0, 50),
+        (0.060, 0.075, 51, 100),
+        (0.076, 0.095, 101, 150),
+        (0.096, 0.115, 151, 200),
+        (0.116, 0.374, 201, 300),
+        (0.375, 0.604, 301, 500)
+    ]
+}
+
+MAX_AQI = 500  # Valor quando a concentração excede todos os breakpoints
+DEFAULT_AQI = 25  # Valor quando não há dados suficientes
+
+
+def _build_tables():
+    """Pré-calcula os arrays usados pelo np.searchsorted"""
+    tables = {}
+    for pollutant, breakpoints in BREAKPOINTS.items():
+        bp = np.array(breakpoints, dtype=float)
+        bp_low, bp_high, aqi_low, aqi_high = bp.T
+        slope = (aqi_high - aqi_low) / (bp_high - bp_low)
+        tables[pollutant] = (bp_low, bp_high[-1], slope, aqi_low)
+    return tables
+
+
+_TABLES = _build_tables()
+_DOMINANT_LABELS = np.array(POLLUTANTS + [None], dtype=object)
+
+
+def _as_array(values, length=None):
+    """Converte escalar, lista, Series ou None em array float (None vira NaN)"""
+    if values is None:
+        return np.full(length if length is not None else 1, np.nan)
+    if isinstance(values, pd.Series):
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'fiu':
+        return np.atleast_1d(values.astype(float, copy=False))
+    array = np.asarray(values, dtype=object if np.ndim(values) else float)
+    if array.dtype == object:
+        array = np.where(pd.isnull(array), np.nan, array).astype(float)
+    return np.atleast_1d(array)
+
+
+def aqi_component(pollutant, concentrations):
+    """
+    Converte concentrações de um poluente em sub-índices AQI.
+    Valores ausentes ou negativos resultam em NaN.
+    """
+    values = _as_array(concentrations)
+    if pollutant == 'no2':
+        # Converter de ppb para ppm se necessário
+        values = np.where(values > 1, values / 1000, values)
+
+    bp_low, bp_max, slope, aqi_low = _TABLES[pollutant]
+    idx = np.searchsorted(bp_low, values, side='right') - 1
+    negative = idx < 0
+    np.clip(idx, 0, len(bp_low) - 1, out=idx)
+
+    # NaN é ordenado no fim pelo searchsorted e propaga NaN no resultado
+    result = slope[idx] * (values - bp_low[idx]) + aqi_low[idx]
+    result[values > bp_max] = MAX_AQI
+    result[negative] = np.nan
+    return result
+
+
+def compute_aqi(pm25=None, pm10=None, no2=None, o3=None, temperature=None, humidity=None,
+                default=DEFAULT_AQI, weather_fallback=True):
+    """
+    Calcula o AQI por linha e o poluente dominante.
+
+    Aceita escalares, arrays ou colunas de DataFrame. Sem poluentes, usa uma
+    aproximação pelas condições meteorológicas (se weather_fallback) ou o default.
+    Retorna (aqi, dominante), onde dominante é None nas linhas sem poluentes.
+    """
+    inputs = {'pm25': pm25, 'pm10': pm10, 'no2': no2, 'o3': o3}
+    length = max((len(_as_array(v)) for v in list(inputs.values()) + [temperature, humidity]
+                  if v is not None), default=1)
+
+    components = np.vstack([
+        aqi_component(pollutant, values) if values is not None else np.full(length, np.nan)
+        for pollutant, values in inputs.items()
+    ])
+    missing = np.isnan(components)
+    has_pollutant = ~missing.all(axis=0)
+
+    filled = np.where(missing, -np.inf, components)
+    winner = filled.argmax(axis=0)
+    best = np.take_along_axis(filled, winner[np.newaxis], axis=0)[0]
+    aqi = np.where(has_pollutant, best, float(default))
+    dominant = _DOMINANT_LABELS[np.where(has_pollutant, winner, len(POLLUTANTS))]
+
+    if weather_fallback and (temperature is not None or humidity is not None):
+        temperature = _as_array(temperature, length)
+        humidity = _as_array(humidity, length)
+        weather = ~has_pollutant & (~np.isnan(temperature) | ~np.isnan(humidity))
+
+        base = np.full(length, 50.0)  # AQI base para condições normais
+        # Temperaturas altas podem indicar pior qualidade do ar
+        base += np.where(temperature > 30, (temperature - 30) * 2, 0)
+        # Umidade muito alta ou muito baixa pode piorar a qualidade
+        base += np.where(((humidity < 30) | (humidity > 80)) & (humidity != 0), 10, 0)
+        aqi[weather] = np.minimum(base[weather], 100)
+
+    return aqi, dominant
+
+
+def aqi_frame(df, default=DEFAULT_AQI, weather_fallback=True):
+    """Calcula AQI e poluente dominante para as colunas de um DataFrame"""
+    columns = {col: df[col] for col in POLLUTANTS + ['temperature', 'humidity'] if col in df.columns}
+    if not columns:
+        return pd.DataFrame({'aqi': float(default), 'dominant_pollutant': None}, index=df.index)
+
+    aqi, dominant = compute_aqi(default=default, weather_fallback=weather_fallback, **columns)
+    return pd.DataFrame({'aqi': aqi, 'dominant_pollutant': dominant}, index=df.index)
@@ -0,0 +1,206 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, delete
+from app import db
+from models.air_quality import AirQualityData, parse_datetime
+from utils.db_utils import frame_rows
+from utils.export import iter_reading_batches, EXPORT_COLUMNS
+
+# Colunas guardadas em cada arquivo Parquet (source e month ficam no caminho, em partições Hive)
+FILE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('location', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('pm25', pa.float64()),
+    ('pm10', pa.float64()),
+    ('co2', pa.float64()),
+    ('no2', pa.float64()),
+    ('o3', pa.float64()),
+    ('so2', pa.float64()),
+    ('temperature', pa.float64()),
+    ('humidity', pa.float64()),
+    ('pressure', pa.float64()),
+    ('aqi', pa.float64()),
+    ('timestamp', pa.timestamp('us')),
+    ('dataset_id', pa.int64())
+])
+PARTITION_SCHEMA = pa.schema([('source', pa.string()), ('month', pa.string())])
+# Leituras sem fonte vão para a partição padrão do Hive (lida de volta como NULL)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+READING_TIERS = ('hot', 'archive', 'all')
+
+
+def archive_root():
+    return current_app.config.get('ARCHIVE_DIR', 'ml/data/readings')
+
+
+def write_archive_batch(frame, root):
+    """
+    Grava um bloco de leituras em arquivos Parquet particionados por fonte e mês
+    (root/source=<fonte>/month=<AAAA-MM>/part-<primeiro id>-<último id>.parquet).
+    Cada arquivo é ordenado por localização e horário, para que as estatísticas
+    dos grupos de linhas permitam pular dados nos filtros por localização.
+    """
+    frame = frame.copy()
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    frame['dataset_id'] = frame['dataset_id'].astype('Int64')
+    sources = frame['source'].fillna(NULL_PARTITION)
+    months = frame['timestamp'].dt.strftime('%Y-%m')
+    written = []
+
+    for (source, month), part in frame.groupby([sources, months], sort=False):
+        directory = os.path.join(root, f'source={source}', f'month={month}')
+        os.makedirs(directory, exist_ok=True)
+        part = part.sort_values(['location', 'timestamp'], kind='stable')
+        table = pa.Table.from_pandas(part[FILE_SCHEMA.names], schema=FILE_SCHEMA, preserve_index=False)
+
+        filename = f"part-{part['id'].min()}-{part['id'].max()}.parquet"
+        # Arquivos iniciados por '.' são ignorados na leitura até a troca atômica
+        temp_path = os.path.join(directory, f'.{filename}.tmp')
+        pq.write_table(table, temp_path, compression='zstd', row_group_size=65536)
+        os.replace(temp_path, os.path.join(directory, filename))
+        written.append(os.path.join(directory, filename))
+
+    return written
+
+
+def archive_readings(older_than_days=None, batch_size=None, progress=None):
+    """
+    Move para o arquivo Parquet as leituras com horário anterior a older_than_days
+    dias (padrão ARCHIVE_AFTER_DAYS), em lotes por id: cada lote é gravado nos
+    arquivos e só então apagado de air_quality_data, no mesmo passo.
+
+    O corte é truncado para o início do dia, então uma nova execução no mesmo dia
+    (por exemplo após uma falha entre a gravação e o commit) seleciona os mesmos
+    lotes e sobrescreve os mesmos arquivos. Os agregados por hora/dia e
+    latest_reading não são alterados. Retorna o número de leituras arquivadas.
+    """
+    config = current_app.config
+    days = older_than_days if older_than_days is not None else config.get('ARCHIVE_AFTER_DAYS', 365)
+    batch_size = batch_size or config.get('ARCHIVE_BATCH_SIZE', 50000)
+    cutoff = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    root = archive_root()
+
+    table = AirQualityData.__table__
+    columns = FILE_SCHEMA.names + ['source']
+    archived = 0
+    last_id = 0
+
+    while True:
+        rows = db.session.execute(
+            select(*[table.c[col] for col in columns])
+            .where(table.c.id > last_id, table.c.timestamp < cutoff)
+            .order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        frame = pd.DataFrame(rows, columns=columns)
+        write_archive_batch(frame, root)
+        first_id, last_id = int(frame['id'].iloc[0]), int(frame['id'].iloc[-1])
+        # O intervalo de ids com o mesmo filtro é exatamente o lote lido
+        db.session.execute(delete(table).where(
+            table.c.id.between(first_id, last_id), table.c.timestamp < cutoff
+        ))
+        db.session.commit()
+        archived += len(frame)
+        if progress:
+            progress(archived=archived, last_id=last_id)
+
+    return archived
+
+
+def archive_dataset(root=None):
+    """Dataset pyarrow sobre os arquivos Parquet (None se ainda não há arquivo)"""
+    root = root or archive_root()
+    if not os.path.isdir(root):
+        return None
+    schema = pa.unify_schemas([FILE_SCHEMA, PARTITION_SCHEMA])
+    dataset = ds.dataset(root, format='parquet', schema=schema,
+                         partitioning=ds.HivePartitioning(PARTITION_SCHEMA, null_fallback=NULL_PARTITION))
+    return dataset if dataset.files else None
+
+
+def archive_filter(location=None, source=None, start=None, end=None, dataset_id=None):
+    """
+    Expressão de filtro do arquivo. Fonte e mês eliminam partições inteiras; os demais
+    predicados usam as estatísticas dos grupos de linhas de cada arquivo.
+    """
+    conditions = []
+    if location:
+        conditions.append(ds.field('location') == location)
+    if source:
+        conditions.append(ds.field('source') == source)
+    if start:
+        start = parse_datetime(start)
+        conditions.append(ds.field('month') >= start.strftime('%Y-%m'))
+        conditions.append(ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us')))
+    if end:
+        end = parse_datetime(end)
+        conditions.append(ds.field('month') <= end.strftime('%Y-%m'))
+        conditions.append(ds.field('timestamp') <= pa.scalar(end, pa.timestamp('us')))
+    if dataset_id is not None:
+        conditions.append(ds.field('dataset_id') == dataset_id)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def scan_readings(columns=None, location=None, source=None, start=None, end=None, dataset_id=None,
+                  tier='all', batch_size=50000):
+    """
+    Gera DataFrames com as leituras filtradas, lendo só as colunas pedidas.
+
+    tier: 'archive' (arquivos Parquet), 'hot' (air_quality_data, em páginas por id)
+    ou 'all' (o arquivo e depois o banco). Leituras arquivadas e reenviadas depois
+    à ingestão aparecem nas duas camadas.
+    """
+    if tier not in READING_TIERS:
+        raise ValueError(f"Camada inválida: {tier} (use {', '.join(READING_TIERS)})")
+    columns = list(columns or EXPORT_COLUMNS)
+
+    if tier in ('archive', 'all'):
+        dataset = archive_dataset()
+        if dataset is not None:
+            expression = archive_filter(location, source, start, end, dataset_id)
+            for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+                if batch.num_rows:
+                    frame = batch.to_pandas()
+                    if 'dataset_id' in frame.columns:
+                        frame['dataset_id'] = frame['dataset_id'].astype('Int64')
+                    yield frame
+
+    if tier in ('hot', 'all'):
+        query = AirQualityData.filtered_query(location=location, source=source, start=start, end=end)
+        if dataset_id is not None:
+            query = query.filter(AirQualityData.dataset_id == dataset_id)
+        selected = ['id'] + [col for col in columns if col != 'id']
+        for rows in iter_reading_batches(query, page_size=batch_size, batch_size=batch_size, columns=selected):
+            frame = pd.DataFrame(rows, columns=selected)
+            if 'timestamp' in frame.columns:
+                frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+            yield frame[columns]
+
+
+def read_readings(columns=None, **filters):
+    """Todas as leituras filtradas em um único DataFrame (ver scan_readings)"""
+    columns = list(columns or EXPORT_COLUMNS)
+    frames = list(scan_readings(columns, **filters))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_export_rows(batch_size=1000, **filters):
+    """Lotes de tuplas nas colunas EXPORT_COLUMNS, no formato usado por utils.export"""
+    for frame in scan_readings(EXPORT_COLUMNS, batch_size=batch_size, **filters):
+        yield frame_rows(frame)
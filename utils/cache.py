@@ -0,0 +1,256 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import request, make_response, current_app
+from flask_login import current_user
+
+
+class MemoryCacheBackend:
+    """Cache LRU com expiração (TTL), local ao processo"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+            # Entradas de versões anteriores nunca mais serão lidas
+            self._entries.clear()
+            return self._version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend:
+    """
+    Cache em arquivos, compartilhado entre processos (ex.: workers do gunicorn).
+    Cada entrada é gravada de forma atômica (arquivo temporário + os.replace) e a
+    versão dos dados fica em um arquivo próprio, lido por todos os workers.
+    """
+
+    VERSION_FILE = 'data_version'
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, stored_key, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key or expires_at < time.time():
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self._write_atomic(self._path(key), pickle.dumps((time.time() + ttl, key, value)))
+        self._prune()
+
+    def _entry_files(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.cache')]
+
+    def _prune(self):
+        """Remove as entradas mais antigas quando o limite é ultrapassado"""
+        entries = self._entry_files()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def get_version(self):
+        try:
+            with open(os.path.join(self.directory, self.VERSION_FILE)) as f:
+                return f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+
+    def bump_version(self):
+        # Um token único dispensa trava entre processos: basta ser diferente do anterior
+        version = f'{time.time_ns():x}{os.getpid():x}'
+        self._write_atomic(os.path.join(self.directory, self.VERSION_FILE), version.encode('utf-8'))
+        return version
+
+    def clear(self):
+        for entry in self._entry_files():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class ResponseCache:
+    """
+    Cache de respostas JSON das rotas de leitura.
+
+    A chave inclui a versão dos dados, incrementada a cada ingestão
+    (bump_data_version), então uma nova carga invalida todas as entradas.
+    As respostas levam ETag e requisições com If-None-Match recebem 304.
+    """
+
+    def __init__(self):
+        self.backend = MemoryCacheBackend()
+        self.default_ttl = 300
+        self.enabled = True
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        self.enabled = backend != 'none'
+        max_entries = app.config.get('CACHE_MAX_ENTRIES', 256)
+
+        if backend == 'disk':
+            self.backend = DiskCacheBackend(app.config.get('CACHE_DIR', 'instance/cache'), max_entries)
+        else:
+            self.backend = MemoryCacheBackend(max_entries)
+
+    def data_version(self):
+        return self.backend.get_version()
+
+    def bump_data_version(self):
+        """Invalida as respostas em cache após uma alteração nos dados"""
+        return self.backend.bump_version()
+
+    def clear(self):
+        self.backend.clear()
+
+    def _cache_key(self, per_user):
+        user_part = current_user.get_id() if per_user and current_user.is_authenticated else ''
+        args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+        return f'{self.data_version()}|{request.endpoint}|{args}|{user_part}'
+
+    @staticmethod
+    def _is_cacheable(response):
+        if response.status_code != 200 or not response.is_json:
+            return False
+        # Respostas de erro ({'success': False}) não são guardadas
+        payload = response.get_json(silent=True)
+        return not (isinstance(payload, dict) and payload.get('success') is False)
+
+    @staticmethod
+    def _conditional_response(body, etag, mimetype):
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(body)
+            response.mimetype = mimetype
+        response.set_etag(etag)
+        # O navegador guarda a resposta mas sempre revalida com If-None-Match
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def cached(self, ttl=None, per_user=False):
+        """Decorador para rotas GET que retornam JSON"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                timeout = ttl if ttl is not None else self.default_ttl
+                key = self._cache_key(per_user)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    body, etag, mimetype = entry
+                    response = self._conditional_response(body, etag, mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                if not self._is_cacheable(response):
+                    return response
+
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                self.backend.set(key, (body, etag, response.mimetype), timeout)
+                response = self._conditional_response(body, etag, response.mimetype)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+class SharedDataVersion:
+    """
+    Versão dos dados para caches em memória do processo (índice das estações, grades,
+    features de previsão) que precisa enxergar ingestões de outros processos.
+
+    data_version() só muda no processo que ingeriu (com o backend em memória), então
+    a versão combina ela com uma marca lida do banco por stamp() (ex.: contagem e
+    maior horário de uma tabela). A marca é consultada de novo no máximo a cada
+    DATA_STAMP_INTERVAL segundos, ou na hora quando a versão local muda.
+    """
+
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self._local = None
+        self._value = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        local = response_cache.data_version()
+        interval = current_app.config.get('DATA_STAMP_INTERVAL', 5)
+        with self._lock:
+            if local != self._local or time.monotonic() - self._checked_at >= interval:
+                stamp = self.stamp()
+                self._value = hashlib.sha1(repr((local, stamp)).encode()).hexdigest()[:12]
+                self._local = local
+                self._checked_at = time.monotonic()
+            return self._value
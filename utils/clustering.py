@@ -0,0 +1,141 @@
+import os
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+from app import db
+from models.air_quality import LatestReading
+from utils.aqi import compute_aqi
+from utils.archive import scan_readings
+from utils.model_registry import model_registry, dump_model
+
+# Features do agrupamento por padrão de poluição e rótulos do menos ao mais severo.
+# Só colunas que latest_reading também guarda: a análise das estações e
+# /analysis/cluster-assign atribuem os grupos a partir das mesmas features
+CLUSTER_FEATURES = ['pm25', 'pm10']
+CLUSTER_LEVELS = ['Baixo', 'Moderado', 'Alto', 'Muito Alto']
+CLUSTER_MODEL = 'pollution_clusters'
+
+
+def level_labels(n_clusters):
+    """Rótulos para n_clusters grupos ordenados por severidade (espalhados sobre CLUSTER_LEVELS)"""
+    positions = np.rint(np.linspace(0, len(CLUSTER_LEVELS) - 1, n_clusters)).astype(int)
+    return [CLUSTER_LEVELS[i] for i in positions]
+
+
+class ClusterModel:
+    """
+    Centróides do agrupamento, em unidades padronizadas e já ordenados por severidade
+    (AQI do centróide, do menor para o maior): o grupo 0 é sempre o menos poluído.
+    Guarda só arrays numpy, então o artefato é carregado por memória mapeada.
+    """
+
+    def __init__(self, mean, scale, centers):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+        original = centers * self.scale + self.mean
+        severity, _ = compute_aqi(pm25=original[:, 0], pm10=original[:, 1], weather_fallback=False)
+        order = np.lexsort((original[:, 0], severity))
+        self.centers = np.ascontiguousarray(centers[order], dtype=np.float64)
+        self.severity = severity[order]
+        self.center_norms = np.einsum('ij,ij->i', self.centers, self.centers)
+        self.labels = level_labels(len(self.centers))
+
+    @property
+    def cluster_centers(self):
+        """Centróides nas unidades originais das features"""
+        return self.centers * self.scale + self.mean
+
+    def transform(self, X):
+        Z = (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+        # Valores ausentes ficam na média do treino (0 depois da padronização)
+        return np.nan_to_num(Z, nan=0.0)
+
+    def assign(self, X):
+        """Grupo (índice do centróide mais próximo) de cada linha de X, nas colunas de CLUSTER_FEATURES"""
+        Z = self.transform(X)
+        # ||z - c||² = ||z||² - 2 z·c + ||c||²; ||z||² é igual para todos os centróides
+        return np.argmin(self.center_norms - 2 * Z @ self.centers.T, axis=1)
+
+
+def iter_cluster_chunks(chunk_size=50000):
+    """Blocos de leituras (arquivo Parquet e banco) com PM2.5 e PM10, nas colunas de CLUSTER_FEATURES"""
+    for frame in scan_readings(CLUSTER_FEATURES, batch_size=chunk_size):
+        frame = frame[frame['pm25'].notna() & frame['pm10'].notna()]
+        if len(frame):
+            yield frame.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def fit_cluster_model(n_clusters=4, chunk_size=50000, batch_size=4096, progress=None, seed=42):
+    """
+    Ajusta o agrupamento sobre todo o histórico em duas passadas em blocos: a primeira
+    ajusta a padronização (ignorando valores ausentes) e a segunda o MiniBatchKMeans.
+    Salva o ClusterModel como artefato CLUSTER_MODEL e o retorna.
+    """
+    scaler = StandardScaler()
+    rows = 0
+    for X in iter_cluster_chunks(chunk_size):
+        scaler.partial_fit(X)
+        rows += len(X)
+    if rows < n_clusters:
+        raise ValueError('Dados insuficientes para análise')
+
+    mean = np.nan_to_num(scaler.mean_)
+    scale = np.where(np.isfinite(scaler.scale_) & (scaler.scale_ > 0), scaler.scale_, 1.0)
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=3, random_state=seed)
+    pending = None
+    fitted = 0
+    for X in iter_cluster_chunks(chunk_size):
+        Z = np.nan_to_num((X - mean) / scale, nan=0.0)
+        # O primeiro partial_fit precisa de pelo menos n_clusters linhas
+        pending = Z if pending is None else np.concatenate([pending, Z])
+        if len(pending) >= n_clusters or hasattr(kmeans, 'cluster_centers_'):
+            kmeans.partial_fit(pending)
+            fitted += len(pending)
+            pending = None
+            if progress:
+                progress(stage='clustering', rows_fitted=fitted, rows_total=rows)
+
+    model = ClusterModel(mean, scale, kmeans.cluster_centers_)
+    path = os.path.join(model_registry.model_path, f'{CLUSTER_MODEL}.pkl')
+    dump_model(model, path, CLUSTER_MODEL, compress=model_registry.compress, metadata={
+        'features': CLUSTER_FEATURES,
+        'training_rows': rows,
+        'levels': model.labels,
+        'centroid_aqi': model.severity.tolist()
+    })
+    return model
+
+
+def latest_station_frame():
+    """Última leitura de cada localização (tabela latest_reading) com as colunas do agrupamento"""
+    table = LatestReading.__table__
+    columns = ['location', 'latitude', 'longitude', 'pm25', 'pm10', 'aqi']
+    rows = db.session.execute(
+        db.select(*[table.c[col] for col in columns]).where(table.c.pm25.isnot(None), table.c.pm10.isnot(None))
+    ).all()
+    return pd.DataFrame(rows, columns=columns)
+
+
+def load_cluster_model():
+    """
+    (modelo, versão) do agrupamento salvo. Um artefato ajustado com outras features
+    (de antes de CLUSTER_FEATURES mudar) conta como ausente: FileNotFoundError.
+    """
+    model, version = model_registry.get(CLUSTER_MODEL)
+    if len(model.mean) != len(CLUSTER_FEATURES):
+        raise FileNotFoundError(f"Modelo {CLUSTER_MODEL} ajustado com outras features")
+    return model, version
+
+
+def assign_frame(model, frame):
+    """Adiciona as colunas cluster e pollution_level a um DataFrame com as colunas de CLUSTER_FEATURES"""
+    frame = frame.copy()
+    columns = [frame[col] if col in frame.columns else pd.Series(np.nan, index=frame.index)
+               for col in CLUSTER_FEATURES]
+    X = np.column_stack([pd.to_numeric(col, errors='coerce').to_numpy(dtype=np.float64) for col in columns])
+    clusters = model.assign(X) if len(frame) else np.empty(0, dtype=int)
+    frame['cluster'] = clusters
+    frame['pollution_level'] = np.asarray(model.labels, dtype=object)[clusters]
+    return frame
@@ -1,145 +1,205 @@
+import math
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+from utils.aqi import compute_aqi, aqi_frame
 
 class DataCollector:
-    def __init__(self):
-        self.openaq_url = "https://api.openaq.org/v2/"
+    """
+    Cliente das APIs OpenAQ e INMET.
+
+    Usa uma única sessão HTTP com pool de conexões keep-alive, timeout e
+    novas tentativas com backoff exponencial (429/5xx e falhas de conexão).
+    Os métodos collect_* distribuem as requisições entre várias
+    localizações/estações e páginas com paralelismo limitado (max_workers).
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, openaq_url=None, inmet_url=None, max_workers=None, timeout=None,
+                 retries=None, backoff=None):
+        self.openaq_url = openaq_url or Config.OPENAQ_API_URL
+        self.inmet_url = inmet_url or Config.INMET_API_URL
+        self.max_workers = max_workers or Config.COLLECTOR_MAX_WORKERS
+        self.timeout = timeout or Config.COLLECTOR_TIMEOUT
+        retry = Retry(
+            total=Config.COLLECTOR_RETRIES if retries is None else retries,
+            backoff_factor=Config.COLLECTOR_BACKOFF if backoff is None else backoff,
+            status_forcelist=self.RETRY_STATUS,
+            allowed_methods=['GET'],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get_json(self, url, params=None):
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def get_openaq_page(self, location=None, parameters=None, limit=1000, page=1, date_from=None):
+        """Busca uma página de /measurements do OpenAQ (lança exceção em caso de erro)"""
+        params = {
+            'limit': limit,
+            'page': page
+        }
+        
+        if location:
+            params['location'] = location
+        if parameters:
+            params['parameter'] = parameters
+        if date_from:
+            params['date_from'] = date_from.strftime('%Y-%m-%dT%H:%M:%SZ')
         
-    def get_openaq_data(self, location=None, parameters=None, limit=1000):
+        return self._get_json(f"{self.openaq_url}measurements", params)
+        
+    def get_openaq_data(self, location=None, parameters=None, limit=1000, page=1):
         """Coleta dados do OpenAQ"""
         try:
-            url = f"{self.openaq_url}measurements"
-            params = {
-                'limit': limit,
-                'page': 1
-            }
-            
-            if location:
-                params['location'] = location
-            if parameters:
-                params['parameter'] = parameters
-            
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Erro na API OpenAQ: {response.status_code}")
-                return None
+            return self.get_openaq_page(location, parameters, limit, page)
         except Exception as e:
             print(f"Erro ao coletar dados OpenAQ: {e}")
             return None
     
-    def get_inmet_data(self, station_code):
+    def _inmet_url(self, station_code, start=None, end=None):
+        if start is None:
+            return f"{self.inmet_url}estacao/{station_code}"
+        # Intervalo de datas (dias inteiros): /estacao/<início>/<fim>/<código>
+        end = end or datetime.utcnow()
+        return f"{self.inmet_url}estacao/{start:%Y-%m-%d}/{end:%Y-%m-%d}/{station_code}"
+
+    def get_inmet_data(self, station_code, start=None, end=None):
         """Coleta dados do INMET"""
         try:
-            url = f"https://apitempo.inmet.gov.br/estacao/{station_code}"
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Erro na API INMET: {response.status_code}")
-                return None
+            return self._get_json(self._inmet_url(station_code, start, end))
         except Exception as e:
             print(f"Erro ao coletar dados INMET: {e}")
             return None
+
+    @staticmethod
+    def _openaq_page_count(payload, limit):
+        """Total de páginas informado em meta.found (None quando desconhecido, ex.: '>10000')"""
+        found = (payload.get('meta') or {}).get('found')
+        if isinstance(found, int):
+            return max(1, math.ceil(found / limit))
+        return None
+
+    def collect_openaq(self, locations, parameters=None, limit=1000, max_pages=None, date_from=None):
+        """
+        Coleta todas as páginas de /measurements para várias localizações em paralelo.
+
+        A primeira página de cada localização informa o total (meta.found) e as
+        demais são buscadas de uma vez. Quando o total não é conhecido, as
+        páginas seguintes são pedidas em janelas até aparecer uma página incompleta.
+        date_from ({localização: datetime}) limita a busca às medições a partir do horário.
+        Retorna {'results': [...], 'by_location': {localização: [...]}, 'errors': {localização: mensagem},
+        'truncated': [localizações com mais páginas além de max_pages]}. As páginas vêm da
+        medição mais nova para a mais antiga: numa localização truncada faltam as mais antigas.
+        """
+        max_pages = max_pages or Config.OPENAQ_MAX_PAGES
+        date_from = date_from or {}
+        pages = {location: {} for location in locations}
+        last_page = {}
+        scheduled = {}
+        errors = {}
+        # Páginas pedidas por vez quando o total é desconhecido: o paralelismo
+        # já vem das várias localizações, então a janela diminui com elas
+        window = max(1, self.max_workers // max(1, len(locations)))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {}
+
+            def schedule(location, first, last):
+                for page in range(first, min(last, max_pages) + 1):
+                    future = pool.submit(self.get_openaq_page, location, parameters, limit, page,
+                                         date_from.get(location))
+                    pending[future] = (location, page)
+                scheduled[location] = max(scheduled.get(location, 0), min(last, max_pages))
+
+            for location in locations:
+                schedule(location, 1, 1)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    location, page = pending.pop(future)
+                    try:
+                        payload = future.result()
+                    except Exception as e:
+                        errors[location] = str(e)
+                        continue
+
+                    results = payload.get('results', [])
+                    pages[location][page] = results
+
+                    if len(results) < limit:
+                        last_page[location] = min(last_page.get(location, page), page)
+                        continue
+
+                    total = self._openaq_page_count(payload, limit) if page == 1 else None
+                    if total is not None:
+                        last_page[location] = total
+                        schedule(location, 2, total)
+                    elif location not in last_page and page == scheduled[location]:
+                        schedule(location, page + 1, page + window)
+
+        by_location = {}
+        for location in locations:
+            stop = last_page.get(location, max_pages)
+            by_location[location] = [record for page in sorted(pages[location]) if page <= stop
+                                     for record in pages[location][page]]
+        results = [record for location in locations for record in by_location[location]]
+        # Sem página incompleta até max_pages (ou com total maior): ficaram páginas sem buscar
+        truncated = [location for location in locations
+                     if location not in errors and last_page.get(location, max_pages + 1) > max_pages]
+
+        print(f"🌐 OpenAQ: {len(results)} medições de {len(locations)} localizações"
+              + (f" ({len(errors)} com erro)" if errors else "")
+              + (f" ({len(truncated)} truncadas em {max_pages} páginas)" if truncated else ""))
+        return {'results': results, 'by_location': by_location, 'errors': errors, 'truncated': truncated}
+
+    def collect_inmet(self, station_codes, start=None):
+        """
+        Coleta as observações de várias estações do INMET em paralelo.
+        start ({estação: datetime}) pede apenas os dias a partir da data informada.
+        Retorna {'observations': [...], 'by_station': {estação: [...]}, 'errors': {estação: mensagem}}.
+        """
+        start = start or {}
+        by_station = {}
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._get_json, self._inmet_url(code, start.get(code))): code
+                       for code in station_codes}
+            for future, code in futures.items():
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    errors[code] = str(e)
+                    continue
+                by_station[code] = payload if isinstance(payload, list) else ([payload] if payload else [])
+
+        observations = [obs for code in station_codes for obs in by_station.get(code, [])]
+
+        print(f"🌐 INMET: {len(observations)} observações de {len(station_codes)} estações"
+              + (f" ({len(errors)} com erro)" if errors else ""))
+        return {'observations': observations, 'by_station': by_station, 'errors': errors}
     
     def calculate_aqi(self, pm25=None, pm10=None, no2=None, o3=None, co2=None, 
                      temperature=None, humidity=None, pressure=None):
         """
         Calcula o Índice de Qualidade do Ar (AQI) baseado nos poluentes e condições meteorológicas
         """
-        aqi_components = []
-        
-        # Componente PM2.5
-        if pm25 is not None:
-            aqi_components.append(self._pm25_to_aqi(pm25))
-        
-        # Componente PM10
-        if pm10 is not None:
-            aqi_components.append(self._pm10_to_aqi(pm10))
-        
-        # Componente NO2
-        if no2 is not None:
-            aqi_components.append(self._no2_to_aqi(no2))
-        
-        # Componente O3
-        if o3 is not None:
-            aqi_components.append(self._o3_to_aqi(o3))
-        
-        # Componente meteorológico (se não há dados de poluentes)
-        if not aqi_components and (temperature is not None or humidity is not None):
-            base_aqi = 50  # AQI base para condições normais
-            
-            # Ajustar baseado na temperatura (temperaturas altas podem indicar pior qualidade do ar)
-            if temperature and temperature > 30:
-                base_aqi += (temperature - 30) * 2
-            
-            # Ajustar baseado na umidade (umidade muito alta ou muito baixa pode piorar a qualidade)
-            if humidity:
-                if humidity < 30 or humidity > 80:
-                    base_aqi += 10
-            
-            aqi_components.append(min(base_aqi, 100))
-        
-        return max(aqi_components) if aqi_components else 25  # Default para dados insuficientes
-    
-    def _pm25_to_aqi(self, concentration):
-        """Converte concentração de PM2.5 para AQI"""
-        breakpoints = [
-            (0, 12.0, 0, 50),
-            (12.1, 35.4, 51, 100),
-            (35.5, 55.4, 101, 150),
-            (55.5, 150.4, 151, 200),
-            (150.5, 250.4, 201, 300),
-            (250.5, 500.4, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _pm10_to_aqi(self, concentration):
-        """Converte concentração de PM10 para AQI"""
-        breakpoints = [
-            (0, 54, 0, 50),
-            (55, 154, 51, 100),
-            (155, 254, 101, 150),
-            (255, 354, 151, 200),
-            (355, 424, 201, 300),
-            (425, 604, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _no2_to_aqi(self, concentration):
-        """Converte concentração de NO2 para AQI"""
-        # Converter de ppb para ppm se necessário
-        if concentration > 1:  # Provavelmente está em ppb
-            concentration = concentration / 1000
-        
-        breakpoints = [
-            (0, 0.053, 0, 50),
-            (0.054, 0.100, 51, 100),
-            (0.101, 0.360, 101, 150),
-            (0.361, 0.649, 151, 200),
-            (0.650, 1.249, 201, 300),
-            (1.250, 2.049, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _o3_to_aqi(self, concentration):
-        """Converte concentração de O3 para AQI"""
-        breakpoints = [
-            (0, 0.059, 0, 50),
-            (0.060, 0.075, 51, 100),
-            (0.076, 0.095, 101, 150),
-            (0.096, 0.115, 151, 200),
-            (0.116, 0.374, 201, 300),
-            (0.375, 0.604, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _calculate_aqi_component(self, concentration, breakpoints):
-        """Calcula componente AQI baseado nos breakpoints"""
-        for bp_low, bp_high, aqi_low, aqi_high in breakpoints:
-            if bp_low <= concentration <= bp_high:
-                return ((aqi_high - aqi_low) / (bp_high - bp_low)) * (concentration - bp_low) + aqi_low
-        return 500  # Valor máximo se exceder todos os breakpoints
\ No newline at end of file
+        aqi, _ = compute_aqi(pm25, pm10, no2, o3, temperature, humidity)
+        return float(aqi[0])
+
+    def calculate_aqi_frame(self, df):
+        """Calcula AQI e poluente dominante para todas as linhas de um DataFrame"""
+        return aqi_frame(df)
@@ -1,6 +1,114 @@
+import warnings
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from utils.aqi import POLLUTANTS, compute_aqi, aqi_frame
+
+# Colunas numéricas que não são imputadas nem filtradas por outliers
+COORDINATE_COLUMNS = ['latitude', 'longitude']
+# Limites de outlier: [Q1 - IQR_FACTOR * IQR, Q3 + IQR_FACTOR * IQR]
+IQR_FACTOR = 1.5
+
+
+def value_columns(df):
+    """Colunas numéricas limpas por clean_data (todas menos as coordenadas)"""
+    return [col for col in df.select_dtypes(include=[np.number]).columns if col not in COORDINATE_COLUMNS]
+
+
+def iqr_bounds(q1, q3, factor=IQR_FACTOR):
+    """Limites inferior e superior de cada coluna a partir dos quartis (arrays ou Series)"""
+    iqr = q3 - q1
+    return q1 - factor * iqr, q3 + factor * iqr
+
+
+def duplicated_rows(df):
+    """
+    Mesma máscara de df.duplicated() (primeira ocorrência mantida), mas comparando
+    primeiro um hash de 64 bits por linha: só as linhas com hash repetido passam
+    pela comparação exata, em vez de fatorar todas as colunas do DataFrame inteiro.
+    """
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for col in df.columns:
+        column = df[col]
+        if pd.api.types.is_float_dtype(column.dtype):
+            column_hash = pd.util.hash_array(column.to_numpy() + 0.0)  # -0.0 e 0.0 são iguais
+        else:
+            column_hash = pd.util.hash_pandas_object(column, index=False).to_numpy()
+        hashes = hashes * np.uint64(1000003) ^ column_hash
+
+    candidates = np.flatnonzero(pd.Series(hashes).duplicated(keep=False).to_numpy())
+    duplicated = np.zeros(len(df), dtype=bool)
+    duplicated[candidates] = df.iloc[candidates].duplicated().to_numpy()
+    return duplicated
+
+
+def inlier_mask(values, lower, upper):
+    """
+    Linhas sem nenhum valor fora dos limites da sua coluna, em uma única máscara
+    sobre a matriz (linhas x colunas). Valores ausentes não contam como outlier.
+    """
+    with np.errstate(invalid='ignore'):
+        outside = (values < lower) | (values > upper)
+    return ~outside.any(axis=1)
+
+
+def chunk_values(chunk, columns):
+    """Matriz float das colunas (valores não numéricos de um bloco viram NaN)"""
+    values = chunk.reindex(columns=columns)
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in values.dtypes):
+        values = values.apply(pd.to_numeric, errors='coerce')
+    return values.to_numpy(dtype=float)
+
+
+class StreamingStatistics:
+    """
+    Média e quartis aproximados de colunas numéricas, acumulados bloco a bloco
+    (arquivos maiores que a memória).
+
+    A média é exata (soma e contagem por coluna). Os quartis vêm de uma amostra
+    uniforme de até sample_size linhas (reservoir sampling); com 100 mil linhas,
+    o erro de posição de um quartil fica em torno de 0,15 ponto percentual.
+    """
+
+    def __init__(self, columns, sample_size=100000, seed=42):
+        self.columns = list(columns)
+        self.sample_size = sample_size
+        self.rows = 0
+        self.sums = np.zeros(len(self.columns))
+        self.counts = np.zeros(len(self.columns), dtype=np.int64)
+        self.sample = np.empty((0, len(self.columns)))
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk):
+        values = chunk_values(chunk, self.columns)
+        present = ~np.isnan(values)
+        self.sums += np.where(present, values, 0.0).sum(axis=0)
+        self.counts += present.sum(axis=0)
+
+        # Enche a amostra; depois, a linha de índice global i entra com probabilidade
+        # sample_size / (i + 1) no lugar de uma linha sorteada
+        free = max(self.sample_size - len(self.sample), 0)
+        if free:
+            self.sample = np.concatenate([self.sample, values[:free]])
+        rest = values[free:]
+        if len(rest):
+            index = self.rows + free + np.arange(len(rest))
+            accepted = self._rng.random(len(rest)) * (index + 1) < self.sample_size
+            slots = self._rng.integers(0, self.sample_size, accepted.sum())
+            self.sample[slots] = rest[accepted]
+        self.rows += len(values)
+
+    def means(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(self.sums / self.counts, index=self.columns)
+
+    def quartiles(self):
+        """(Q1, Q3) aproximados de cada coluna, como Series"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # coluna sem nenhum valor: NaN
+            q1, q3 = np.nanquantile(self.sample, [0.25, 0.75], axis=0)
+        return pd.Series(q1, index=self.columns), pd.Series(q3, index=self.columns)
+
 
 class DataProcessor:
     def __init__(self):
@@ -21,98 +129,57 @@ class DataProcessor:
         return True
     
     def clean_data(self, df):
-        """Limpa e prepara os dados"""
-        # Remover duplicatas
-        df = df.drop_duplicates()
-        
-        # Preencher valores numéricos faltantes com a média
-        numeric_columns = df.select_dtypes(include=[np.number]).columns
-        for col in numeric_columns:
-            if col not in ['latitude', 'longitude']:  # Não preencher coordenadas
-                df[col] = df[col].fillna(df[col].mean())
-        
-        # Remover outliers usando IQR
-        for col in numeric_columns:
-            if col not in ['latitude', 'longitude']:
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                df = df[(df[col] >= lower_bound) & (df[col] <= upper_bound)]
-        
+        """
+        Limpa e prepara os dados: remove duplicatas e linhas com algum valor fora de
+        [Q1 - 1,5 IQR, Q3 + 1,5 IQR] e preenche os valores ausentes com a média.
+
+        Médias e quartis de todas as colunas saem do mesmo conjunto de linhas (antes
+        de filtrar), então o resultado não depende da ordem das colunas.
+        """
+        df = df.take(np.flatnonzero(~duplicated_rows(df)))
+        columns = value_columns(df)
+        if not columns or df.empty:
+            return df
+
+        means = df[columns].mean()
+        quartiles = df[columns].quantile([0.25, 0.75])
+        lower, upper = iqr_bounds(quartiles.loc[0.25], quartiles.loc[0.75])
+        # take devolve um DataFrame novo (não uma fatia), que pode ser preenchido no lugar
+        df = df.take(np.flatnonzero(inlier_mask(df[columns].to_numpy(dtype=float), lower.to_numpy(), upper.to_numpy())))
+        df.fillna(means.to_dict(), inplace=True)  # coordenadas não estão em means
         return df
+
+    def clean_chunks(self, read_chunks, sample_size=100000, seed=42):
+        """
+        Variante de clean_data para arquivos maiores que a memória: read_chunks() deve
+        devolver um iterador novo de blocos a cada chamada (por exemplo
+        lambda: read_file_chunks(caminho, 50000)). A primeira leitura acumula médias
+        e quartis aproximados (StreamingStatistics); a segunda devolve cada bloco limpo.
+        Duplicatas só são removidas dentro de cada bloco.
+        """
+        stats = None
+        for chunk in read_chunks():
+            if stats is None:
+                stats = StreamingStatistics(value_columns(chunk), sample_size, seed)
+            stats.update(chunk)
+        if stats is None:
+            return
+
+        means = stats.means().to_dict()
+        lower, upper = iqr_bounds(*stats.quartiles())
+        for chunk in read_chunks():
+            keep = ~duplicated_rows(chunk) & inlier_mask(chunk_values(chunk, stats.columns),
+                                                         lower.to_numpy(), upper.to_numpy())
+            chunk = chunk.take(np.flatnonzero(keep))
+            chunk.fillna({col: value for col, value in means.items() if col in chunk}, inplace=True)
+            yield chunk
     
     def calculate_air_quality_index(self, row):
         """Calcula o índice de qualidade do ar baseado nos poluentes"""
-        # Implementação simplificada do AQI
-        aqi_components = []
-        
-        if 'pm25' in row and pd.notnull(row['pm25']):
-            aqi_components.append(self._pm25_to_aqi(row['pm25']))
-        
-        if 'pm10' in row and pd.notnull(row['pm10']):
-            aqi_components.append(self._pm10_to_aqi(row['pm10']))
-        
-        if 'no2' in row and pd.notnull(row['no2']):
-            aqi_components.append(self._no2_to_aqi(row['no2']))
-        
-        if 'o3' in row and pd.notnull(row['o3']):
-            aqi_components.append(self._o3_to_aqi(row['o3']))
-        
-        return max(aqi_components) if aqi_components else 0
-    
-    def _pm25_to_aqi(self, concentration):
-        """Converte concentração de PM2.5 para AQI"""
-        breakpoints = [
-            (0, 12.0, 0, 50),
-            (12.1, 35.4, 51, 100),
-            (35.5, 55.4, 101, 150),
-            (55.5, 150.4, 151, 200),
-            (150.5, 250.4, 201, 300),
-            (250.5, 500.4, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _pm10_to_aqi(self, concentration):
-        """Converte concentração de PM10 para AQI"""
-        breakpoints = [
-            (0, 54, 0, 50),
-            (55, 154, 51, 100),
-            (155, 254, 101, 150),
-            (255, 354, 151, 200),
-            (355, 424, 201, 300),
-            (425, 604, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _no2_to_aqi(self, concentration):
-        """Converte concentração de NO2 para AQI"""
-        breakpoints = [
-            (0, 0.053, 0, 50),
-            (0.054, 0.100, 51, 100),
-            (0.101, 0.360, 101, 150),
-            (0.361, 0.649, 151, 200),
-            (0.650, 1.249, 201, 300),
-            (1.250, 2.049, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _o3_to_aqi(self, concentration):
-        """Converte concentração de O3 para AQI"""
-        breakpoints = [
-            (0, 0.059, 0, 50),
-            (0.060, 0.075, 51, 100),
-            (0.076, 0.095, 101, 150),
-            (0.096, 0.115, 151, 200),
-            (0.116, 0.374, 201, 300),
-            (0.375, 0.604, 301, 500)
-        ]
-        return self._calculate_aqi_component(concentration, breakpoints)
-    
-    def _calculate_aqi_component(self, concentration, breakpoints):
-        """Calcula componente AQI baseado nos breakpoints"""
-        for bp_low, bp_high, aqi_low, aqi_high in breakpoints:
-            if bp_low <= concentration <= bp_high:
-                return ((aqi_high - aqi_low) / (bp_high - bp_low)) * (concentration - bp_low) + aqi_low
-        return 500  # Valor máximo se exceder todos os breakpoints
\ No newline at end of file
+        values = {col: row[col] for col in POLLUTANTS if col in row}
+        aqi, _ = compute_aqi(default=0, weather_fallback=False, **values)
+        return float(aqi[0])
+
+    def calculate_air_quality_index_frame(self, df):
+        """Calcula o índice de qualidade do ar e o poluente dominante de todas as linhas"""
+        return aqi_frame(df, default=0, weather_fallback=False)
@@ -0,0 +1,47 @@
+from sqlalchemy import case
+from app import db
+
+
+def dialect_insert(table):
+    """INSERT com suporte a ON CONFLICT (upsert) no SQLite e no PostgreSQL"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert não suportado para o banco {dialect}")
+    return insert(table)
+
+
+def frame_records(frame):
+    """Converte um DataFrame em lista de dicts, com NaN/NaT convertidos em None"""
+    # Coluna a coluna com tolist(): bem mais rápido que to_dict('records') em blocos grandes
+    columns = {col: frame[col].astype(object).where(frame[col].notna(), None).tolist() for col in frame.columns}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def frame_rows(frame):
+    """Converte um DataFrame em lista de tuplas (na ordem das colunas), com NaN/NaT/NA convertidos em None"""
+    columns = [frame[col].astype(object).where(frame[col].notna(), None).tolist() for col in frame.columns]
+    return list(zip(*columns))
+
+
+def null_safe_least(current, incoming):
+    """Menor valor entre duas colunas ignorando NULL (MIN escalar do SQLite propaga NULL)"""
+    return case(
+        (current.is_(None), incoming),
+        (incoming.is_(None), current),
+        (incoming < current, incoming),
+        else_=current
+    )
+
+
+def null_safe_greatest(current, incoming):
+    """Maior valor entre duas colunas ignorando NULL"""
+    return case(
+        (current.is_(None), incoming),
+        (incoming.is_(None), current),
+        (incoming > current, incoming),
+        else_=current
+    )
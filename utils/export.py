@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+from datetime import datetime
+from app import db
+from models.air_quality import AirQualityData
+
+# Colunas exportadas, na ordem do cabeçalho CSV
+EXPORT_COLUMNS = [
+    'id', 'location', 'latitude', 'longitude', 'pm25', 'pm10', 'co2', 'no2', 'o3', 'so2',
+    'temperature', 'humidity', 'pressure', 'aqi', 'timestamp', 'source', 'dataset_id'
+]
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def iter_reading_batches(query, after=0, limit=None, page_size=50000, batch_size=1000, columns=None):
+    """
+    Percorre as leituras de uma consulta (AirQualityData.filtered_query) em ordem de id,
+    gerando listas de até batch_size linhas com as colunas pedidas (id sempre primeiro;
+    padrão EXPORT_COLUMNS).
+
+    Cada página de page_size linhas é uma consulta por chave (id > último id) lida
+    com yield_per (cursor no servidor no PostgreSQL), em uma conexão própria que é
+    devolvida ao pool ao fim da página: a memória não depende do tamanho do
+    resultado e nenhuma transação fica aberta durante toda a exportação (no SQLite
+    um leitor ativo bloquearia os commits da ingestão).
+    """
+    table = AirQualityData.__table__
+    columns = ['id'] + [col for col in (columns or EXPORT_COLUMNS) if col != 'id']
+    query = query.with_entities(*[table.c[col] for col in columns])
+    last_id = after or 0
+    exported = 0
+
+    while limit is None or exported < limit:
+        size = page_size if limit is None else min(page_size, limit - exported)
+        statement = query.filter(AirQualityData.id > last_id) \
+            .order_by(AirQualityData.id).limit(size).statement
+        page_rows = 0
+
+        with db.engine.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(statement)
+            for batch in result.partitions():
+                page_rows += len(batch)
+                last_id = batch[-1][0]
+                yield batch
+
+        exported += page_rows
+        if page_rows < size:
+            break
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def ndjson_lines(batches):
+    """Uma linha JSON por leitura, um bloco de texto por lote"""
+    for batch in batches:
+        yield ''.join(
+            json.dumps({col: _json_value(value) for col, value in zip(EXPORT_COLUMNS, row)}, ensure_ascii=False) + '\n'
+            for row in batch
+        )
+
+
+def csv_lines(batches):
+    """CSV com cabeçalho, um bloco de texto por lote"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_json_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
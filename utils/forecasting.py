@@ -0,0 +1,271 @@
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from app import db
+from models.air_quality import ReadingRollup
+from utils.cache import SharedDataVersion
+from utils.model_registry import model_registry
+
+# Horizontes de previsão (horas à frente) e o modelo salvo de cada um
+FORECAST_HORIZONS = [1, 6, 24]
+AQI_LAGS = [1, 2, 3, 6, 12, 24]
+AQI_WINDOWS = [3, 6, 24]
+PM25_WINDOWS = [24]
+# Horas de histórico necessárias para montar as features da hora mais recente
+HISTORY_HOURS = max(AQI_LAGS + AQI_WINDOWS + PM25_WINDOWS)
+
+FORECAST_FEATURES = (
+    ['aqi', 'pm25']
+    + [f'aqi_lag_{lag}h' for lag in AQI_LAGS]
+    + [f'aqi_mean_{window}h' for window in AQI_WINDOWS]
+    + [f'pm25_mean_{window}h' for window in PM25_WINDOWS]
+    + ['hour_sin', 'hour_cos', 'weekday']
+)
+
+
+def forecast_model_name(horizon):
+    return f'forecast_{horizon}h'
+
+
+def load_hourly_series(since=None, location=None):
+    """
+    Série horária de AQI e PM2.5 médios por localização, a partir dos agregados por
+    hora (reading_rollup, que cobre também as leituras arquivadas), ordenada por
+    localização e horário.
+    """
+    table = ReadingRollup.__table__
+    query = db.select(table.c.location, table.c.bucket_start, table.c.aqi_sum, table.c.aqi_count,
+                      table.c.pm25_sum, table.c.pm25_count).where(table.c.granularity == 'hour')
+    if since is not None:
+        query = query.where(table.c.bucket_start >= since)
+    if location is not None:
+        query = query.where(table.c.location == location)
+    rows = db.session.execute(query.order_by(table.c.location, table.c.bucket_start)).all()
+
+    frame = pd.DataFrame(rows, columns=['location', 'timestamp', 'aqi_sum', 'aqi_count', 'pm25_sum', 'pm25_count'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aqi = frame['aqi_sum'].to_numpy(dtype=float) / frame['aqi_count'].to_numpy(dtype=float)
+        pm25 = frame['pm25_sum'].to_numpy(dtype=float) / frame['pm25_count'].to_numpy(dtype=float)
+    return pd.DataFrame({
+        'location': frame['location'],
+        'timestamp': pd.to_datetime(frame['timestamp']),
+        'aqi': aqi,
+        'pm25': pm25
+    })
+
+
+def _dense_positions(codes, hours, padding):
+    """
+    Posição de cada linha em uma grade horária contínua: as localizações ficam uma
+    após a outra, cada uma cobrindo da sua primeira à última hora, separadas por
+    padding horas vazias. Deslocar a grade em L posições é deslocar L horas, sem
+    misturar localizações (L <= padding). Retorna (posições, tamanho da grade).
+    """
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+    spans = hours[ends] - hours[starts] + 1
+    offsets = np.r_[0, np.cumsum(spans + padding)][:-1] + padding
+    group = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    positions = offsets[group] + hours - hours[starts][group]
+    return positions, int(offsets[-1] + spans[-1] + padding) if len(starts) else padding
+
+
+class _DenseSeries:
+    """
+    Uma variável na grade horária contínua, lida nas posições das linhas da série.
+    positions - padding indexa visões deslocadas da grade, então cada defasagem ou
+    horizonte é um np.take sem arrays de índices temporários.
+    """
+
+    def __init__(self, values, positions, size, padding):
+        self.grid = np.full(size, np.nan)
+        self.grid[positions] = values
+        self.base = positions - padding
+        self.padding = padding
+        self._sums = None
+
+    def at(self, offset, out):
+        """Valor offset horas depois de cada linha (offset < 0: antes)"""
+        return np.take(self.grid[self.padding + offset:], self.base, out=out)
+
+    def rolling_mean(self, window, out):
+        """Média das últimas window horas (incluindo a atual), ignorando horas sem valor"""
+        if self._sums is None:
+            present = ~np.isnan(self.grid)
+            self._sums = (np.r_[0.0, np.cumsum(np.where(present, self.grid, 0.0))],
+                          np.r_[0, np.cumsum(present)])
+        total, count = self._sums
+        start = self.padding + 1 - window
+        counts = np.take(count[self.padding + 1:], self.base) - np.take(count[start:], self.base)
+        np.take(total[self.padding + 1:], self.base, out=out)
+        out -= np.take(total[start:], self.base)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.divide(out, counts, out=out)
+        out[counts == 0] = np.nan
+        return out
+
+
+def build_features(series, horizons=None):
+    """
+    Features de previsão de cada hora de cada localização, em operações vetorizadas
+    sobre a série inteira (tempo linear no número de horas cobertas).
+
+    series: DataFrame com location, timestamp (horas cheias, sem repetição por
+    localização), aqi e pm25, ordenado por localização e horário. Defasagens e médias
+    móveis são por hora, não por linha: horas ausentes da série ficam NaN (o modelo
+    aceita NaN) e não deslocam os valores seguintes.
+    Com horizons, inclui as colunas target_<h>h (AQI h horas depois, NaN se ausente).
+    """
+    horizons = horizons or []
+    codes = pd.factorize(series['location'])[0]
+    hours = series['timestamp'].to_numpy(dtype='datetime64[h]').astype(np.int64)
+    padding = max([HISTORY_HOURS] + list(horizons))
+    positions, size = _dense_positions(codes, hours, padding)
+
+    columns = FORECAST_FEATURES + [f'target_{horizon}h' for horizon in horizons]
+    # Um bloco (colunas x linhas) preenchido coluna a coluna: o DataFrame usa a
+    # transposta sem copiar, em vez de empilhar dezenas de arrays soltos
+    block = np.empty((len(columns), len(series)))
+    features = dict(zip(columns, block))
+
+    aqi = _DenseSeries(series['aqi'].to_numpy(dtype=float), positions, size, padding)
+    pm25 = _DenseSeries(series['pm25'].to_numpy(dtype=float), positions, size, padding)
+    aqi.at(0, features['aqi'])
+    pm25.at(0, features['pm25'])
+    for lag in AQI_LAGS:
+        aqi.at(-lag, features[f'aqi_lag_{lag}h'])
+    for window in AQI_WINDOWS:
+        aqi.rolling_mean(window, features[f'aqi_mean_{window}h'])
+    for window in PM25_WINDOWS:
+        pm25.rolling_mean(window, features[f'pm25_mean_{window}h'])
+    hour_of_day = hours % 24
+    np.sin(2 * np.pi * hour_of_day / 24, out=features['hour_sin'])
+    np.cos(2 * np.pi * hour_of_day / 24, out=features['hour_cos'])
+    features['weekday'][:] = (hours // 24 + 3) % 7  # 0 = segunda (1970-01-01 foi quinta)
+    for horizon in horizons:
+        aqi.at(horizon, features[f'target_{horizon}h'])
+    return pd.DataFrame(block.T, index=series.index, columns=columns, copy=False)
+
+
+def train_forecast_models(series, horizons=None, test_fraction=0.2, progress=None, save_model=None):
+    """
+    Treina um HistGradientBoostingRegressor por horizonte sobre as features da série.
+    A divisão é temporal (as últimas test_fraction horas ficam para teste), e a métrica
+    inclui a persistência (prever o AQI atual) como referência.
+    save_model(model, name, training_rows, metrics, **metadata) grava cada modelo.
+    """
+    horizons = horizons or FORECAST_HORIZONS
+    frame = build_features(series, horizons)
+    cutoff = series['timestamp'].quantile(1 - test_fraction)
+    test = (series['timestamp'] > cutoff).to_numpy()
+    X = frame[FORECAST_FEATURES].to_numpy(dtype=np.float32)
+    results = {}
+
+    for done, horizon in enumerate(horizons, start=1):
+        y = frame[f'target_{horizon}h'].to_numpy()
+        labeled = ~np.isnan(y)
+        train_rows, test_rows = labeled & ~test, labeled & test
+        if train_rows.sum() < 10:
+            raise ValueError(f'Dados insuficientes para previsão de {horizon}h (séries horárias muito curtas)')
+
+        model = HistGradientBoostingRegressor(max_iter=200, random_state=42)
+        model.fit(X[train_rows], y[train_rows])
+        metrics = {'mse': None, 'r2': None, 'persistence_mse': None}
+        if test_rows.sum() >= 2:
+            y_test = y[test_rows]
+            y_pred = model.predict(X[test_rows])
+            persistence = frame['aqi'].to_numpy()[test_rows]
+            known = ~np.isnan(persistence)
+            metrics = {
+                'mse': float(mean_squared_error(y_test, y_pred)),
+                'r2': float(r2_score(y_test, y_pred)),
+                'persistence_mse': float(mean_squared_error(y_test[known], persistence[known])) if known.any() else None
+            }
+        if save_model:
+            save_model(model, forecast_model_name(horizon), int(train_rows.sum()), metrics,
+                       features=FORECAST_FEATURES, horizon_hours=horizon)
+        results[horizon] = {'model': model, 'rows': int(train_rows.sum()), **metrics}
+        if progress:
+            progress(stage='forecast', horizons_done=done, horizons_total=len(horizons))
+    return results
+
+
+def newest_hour():
+    table = ReadingRollup.__table__
+    return db.session.execute(
+        db.select(db.func.max(table.c.bucket_start)).where(table.c.granularity == 'hour')
+    ).scalar()
+
+
+def forecast_stamp():
+    """
+    Marca dos agregados por hora compartilhada entre processos: hora mais recente e
+    somas da janela que latest_features lê (mudam quando uma leitura é gravada nela)
+    """
+    newest = newest_hour()
+    if newest is None:
+        return None
+    table = ReadingRollup.__table__
+    since = pd.Timestamp(newest) - pd.Timedelta(hours=2 * HISTORY_HOURS)
+    totals = db.session.execute(
+        db.select(db.func.sum(table.c.count), db.func.sum(table.c.aqi_sum), db.func.sum(table.c.pm25_sum))
+        .where(table.c.granularity == 'hour', table.c.bucket_start >= since.to_pydatetime())
+    ).one()
+    return (newest,) + tuple(totals)
+
+
+class ForecastCache:
+    """
+    Features da hora mais recente de cada localização e as previsões feitas a partir
+    delas, mantidas em memória para uma versão dos dados e dos modelos. A versão dos
+    dados acompanha ingestões de qualquer processo (SharedDataVersion sobre os
+    agregados por hora). Só as últimas horas de cada série são lidas para montá-las.
+    """
+
+    def __init__(self):
+        self._entry = None
+        self._shared = SharedDataVersion(forecast_stamp)
+        self._lock = threading.Lock()
+
+    def latest_features(self):
+        """(série das últimas horas, features da última hora de cada localização)"""
+        newest = newest_hour()
+        if newest is None:
+            return pd.DataFrame(columns=['location', 'timestamp']), pd.DataFrame(columns=FORECAST_FEATURES)
+        # Localizações sem leitura nas últimas HISTORY_HOURS horas ficam sem previsão; as
+        # demais têm na janela de 2 * HISTORY_HOURS todo o histórico que as features usam
+        newest = pd.Timestamp(newest)
+        series = load_hourly_series(since=newest - pd.Timedelta(hours=2 * HISTORY_HOURS))
+        features = build_features(series)
+        last = (~series['location'].duplicated(keep='last')
+                & (series['timestamp'] >= newest - pd.Timedelta(hours=HISTORY_HOURS))).to_numpy()
+        return series[last].reset_index(drop=True), features[last].reset_index(drop=True)
+
+    def get(self):
+        """Previsões por localização: DataFrame com location, issued_at e forecast_<h>h"""
+        versions = []
+        models = {}
+        for horizon in FORECAST_HORIZONS:
+            model, version = model_registry.get(forecast_model_name(horizon))
+            models[horizon] = model
+            versions.append(version)
+        key = (self._shared.get(), tuple(versions))
+
+        entry = self._entry
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        with self._lock:
+            if self._entry is not None and self._entry[0] == key:
+                return self._entry[1]
+            latest, features = self.latest_features()
+            forecasts = pd.DataFrame({'location': latest['location'], 'issued_at': latest['timestamp']})
+            X = features[FORECAST_FEATURES].to_numpy(dtype=np.float32)
+            for horizon, model in models.items():
+                forecasts[f'forecast_{horizon}h'] = model.predict(X) if len(X) else []
+            self._entry = (key, forecasts)
+            return forecasts
+
+
+forecast_cache = ForecastCache()
@@ -0,0 +1,433 @@
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import func, select
+from app import db
+from models.air_quality import AirQualityData, LatestReading
+from utils.aqi import aqi_frame
+from utils.db_utils import dialect_insert, frame_records
+from utils.rollups import update_rollups, refresh_extremes
+
+# Localização das estações INMET conhecidas
+STATION_LOCATIONS = {
+    'A001': {'name': 'Manaus', 'lat': -3.1190, 'lng': -60.0217},
+    'A734': {'name': 'Belém', 'lat': -1.4558, 'lng': -48.4902},
+    'A930': {'name': 'Porto Velho', 'lat': -8.7612, 'lng': -63.9005},
+    'A520': {'name': 'Rio Branco', 'lat': -9.9754, 'lng': -67.8249}
+}
+
+# Colunas gravadas na tabela air_quality_data (exceto id)
+READING_COLUMNS = [
+    'location', 'latitude', 'longitude', 'pm25', 'pm10', 'co2', 'no2', 'o3', 'so2',
+    'temperature', 'humidity', 'pressure', 'aqi', 'timestamp', 'source'
+]
+
+POLLUTANT_COLUMNS = ['pm25', 'pm10', 'co2', 'no2', 'o3', 'so2']
+WEATHER_COLUMNS = ['temperature', 'humidity', 'pressure']
+
+# Parâmetros do OpenAQ mapeados para nossas colunas
+OPENAQ_PARAMETERS = {
+    'pm25': 'pm25',
+    'pm10': 'pm10',
+    'no2': 'no2',
+    'o3': 'o3',
+    'so2': 'so2',
+    'co': 'co2'
+}
+
+LATEST_COLUMNS = ['location', 'latitude', 'longitude', 'pm25', 'pm10', 'aqi', 'timestamp', 'source']
+
+# Leituras repetidas (mesma chave natural) são mescladas: valores novos prevalecem
+# e colunas ausentes na leitura nova mantêm o valor anterior
+NATURAL_KEY = AirQualityData.NATURAL_KEY
+MERGED_COLUMNS = POLLUTANT_COLUMNS + WEATHER_COLUMNS
+
+# Colunas de horário reconhecidas nos arquivos, em ordem de preferência
+TIMESTAMP_COLUMNS = ['timestamp', 'datetime', 'date']
+MISSING_TIME_MESSAGE = ('Arquivo sem coluna de horário (timestamp, datetime ou date): '
+                        'as leituras de uma localização não podem ser distinguidas')
+
+
+def has_time_column(df):
+    return any(col in df.columns for col in TIMESTAMP_COLUMNS)
+
+
+def read_file_chunks(filepath, chunk_size):
+    """
+    Lê um arquivo de upload em blocos de DataFrame sem carregá-lo inteiro na memória.
+    CSV usa o chunksize do pandas e XLSX é lido linha a linha pelo openpyxl em modo read-only.
+    """
+    extension = filepath.rsplit('.', 1)[-1].lower()
+
+    if extension == 'csv':
+        yield from pd.read_csv(filepath, chunksize=chunk_size)
+
+    elif extension == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(col) if col is not None else f'col_{i}' for i, col in enumerate(header)]
+
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+
+    else:
+        # Formato .xls antigo não tem leitor em streaming
+        df = pd.read_excel(filepath)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+
+class DataIngestor:
+    """
+    Ingestão colunar de leituras de qualidade do ar.
+
+    Converte e valida colunas inteiras de uma vez, calcula o AQI como coluna
+    e grava com inserts em lote do SQLAlchemy Core, em blocos de tamanho fixo.
+    """
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size
+
+    def _get_chunk_size(self):
+        if self.chunk_size:
+            return self.chunk_size
+        return current_app.config.get('INGEST_CHUNK_SIZE', 5000)
+
+    def _to_float(self, series):
+        """Converte uma coluna para float; retorna também a máscara de valores inválidos"""
+        converted = pd.to_numeric(series, errors='coerce').astype(float)
+        invalid = series.notna() & converted.isna()
+        return converted, invalid
+
+    def _empty_frame(self, index):
+        frame = pd.DataFrame(index=index)
+        for col in POLLUTANT_COLUMNS + WEATHER_COLUMNS:
+            frame[col] = np.nan
+        return frame
+
+    def prepare_inmet(self, df):
+        """Converte um DataFrame INMET em leituras"""
+        frame = self._empty_frame(df.index)
+        invalid = pd.Series(False, index=df.index)
+
+        for col in WEATHER_COLUMNS:
+            if col in df.columns:
+                frame[col], bad = self._to_float(df[col])
+                invalid |= bad
+
+        if 'station' in df.columns:
+            stations = df['station'].fillna('A001').astype(str)
+        else:
+            stations = pd.Series('A001', index=df.index)
+
+        # Estações desconhecidas usam as coordenadas de Manaus (A001)
+        default = STATION_LOCATIONS['A001']
+        known = pd.DataFrame.from_dict(STATION_LOCATIONS, orient='index')
+        info = known.reindex(stations.values)
+        names = info['name'].fillna(default['name']).values
+        frame['location'] = pd.Series(names, index=df.index) + ' - Estação ' + stations
+        frame['latitude'] = info['lat'].fillna(default['lat']).values
+        frame['longitude'] = info['lng'].fillna(default['lng']).values
+        frame['source'] = 'inmet'
+
+        return self._finalize(frame, invalid, 'INMET', self._required_timestamps(df))
+
+    def prepare_openaq(self, df, latest_only=True):
+        """
+        Converte um DataFrame OpenAQ (formato longo, uma linha por parâmetro) em
+        leituras no formato largo: uma linha por (localização, horário) com todos
+        os poluentes medidos, para que o AQI considere todos eles.
+        """
+        if latest_only:
+            # Pegar o registro mais recente de cada (localização, parâmetro)
+            df = df.drop_duplicates(subset=['location', 'parameter'], keep='first')
+
+        # Horário da medição (UTC): 'datetime' nos arquivos, 'date' na API
+        timestamps = self._required_timestamps(df)
+        latitude, bad_lat = self._to_float(df['latitude'])
+        longitude, bad_lng = self._to_float(df['longitude'])
+        values, bad_value = self._to_float(df['value'])
+        columns = df['parameter'].astype(str).map(OPENAQ_PARAMETERS)
+        invalid = bad_lat | bad_lng | bad_value | df['location'].isna()
+        invalid |= latitude.isna() | longitude.isna() | timestamps.isna()
+        if invalid.any():
+            print(f"⚠️  {int(invalid.sum())} linhas OpenAQ inválidas descartadas")
+
+        long = pd.DataFrame({
+            'location': df['location'],
+            'timestamp': timestamps,
+            'column': columns,
+            'value': values,
+            'latitude': latitude,
+            'longitude': longitude
+        })[~invalid & columns.notna()]
+
+        frame = self.pivot_openaq(long)
+        return self._finalize(frame, pd.Series(False, index=frame.index), 'OpenAQ')
+
+    def pivot_openaq(self, long):
+        """
+        Pivota medições longas (location, timestamp, column, value, latitude, longitude)
+        em uma linha por (localização, horário). Se um parâmetro se repete, vale o último.
+        """
+        keys = ['location', 'timestamp']
+        if long.empty:
+            return pd.DataFrame(columns=keys + POLLUTANT_COLUMNS + WEATHER_COLUMNS + ['latitude', 'longitude', 'source'])
+
+        long = long.drop_duplicates(keys + ['column'], keep='last')
+        wide = long.pivot(index=keys, columns='column', values='value')
+        coords = long.groupby(keys, sort=False)[['latitude', 'longitude']].last()
+
+        frame = wide.reindex(columns=POLLUTANT_COLUMNS + WEATHER_COLUMNS).join(coords)
+        frame.columns.name = None
+        frame = frame.reset_index()
+        # Converter CO de ppm para ppb
+        frame['co2'] = frame['co2'] * 1000
+        frame['source'] = 'openaq'
+        return frame
+
+    def prepare_openaq_measurements(self, measurements):
+        """Converte resultados da API OpenAQ (/measurements) em leituras, uma por medição"""
+        df = pd.DataFrame({
+            'location': [m.get('location', '') for m in measurements],
+            'latitude': [(m.get('coordinates') or {}).get('latitude', 0) for m in measurements],
+            'longitude': [(m.get('coordinates') or {}).get('longitude', 0) for m in measurements],
+            'parameter': [m.get('parameter') for m in measurements],
+            'value': [m.get('value') for m in measurements],
+            'date': [(m.get('date') or {}).get('utc') for m in measurements]
+        })
+        return self.prepare_openaq(df, latest_only=False)
+
+    def prepare_inmet_observations(self, observations):
+        """Converte observações da API INMET em leituras"""
+        if isinstance(observations, dict):
+            observations = [observations]
+        df = pd.DataFrame(observations)
+
+        frame = self._empty_frame(df.index)
+        invalid = pd.Series(False, index=df.index)
+        for col, key in [('temperature', 'TEM_INS'), ('humidity', 'UMD_INS'), ('pressure', 'PRE_INS')]:
+            if key in df.columns:
+                frame[col], bad = self._to_float(df[key])
+                invalid |= bad
+
+        frame['location'] = df['DC_NOME'].fillna('Estação INMET') if 'DC_NOME' in df.columns else 'Estação INMET'
+        for col, key in [('latitude', 'VL_LATITUDE'), ('longitude', 'VL_LONGITUDE')]:
+            if key in df.columns:
+                frame[col], bad = self._to_float(df[key])
+                invalid |= bad
+            else:
+                frame[col] = 0.0
+        frame['source'] = 'inmet'
+
+        # Data e hora (HHMM) da medição, em UTC; observações sem horário são descartadas
+        timestamps = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        if 'DT_MEDICAO' in df.columns and 'HR_MEDICAO' in df.columns:
+            timestamps = pd.to_datetime(
+                df['DT_MEDICAO'].astype(str) + ' ' + df['HR_MEDICAO'].astype(str).str.zfill(4),
+                format='%Y-%m-%d %H%M', errors='coerce'
+            )
+
+        return self._finalize(frame, invalid, 'INMET', timestamps)
+
+    def prepare_manual(self, df):
+        """Converte um DataFrame no formato manual em leituras"""
+        frame = self._empty_frame(df.index)
+        frame['location'] = df['location']
+        frame['latitude'], bad_lat = self._to_float(df['latitude'])
+        frame['longitude'], bad_lng = self._to_float(df['longitude'])
+        invalid = bad_lat | bad_lng | frame['location'].isna()
+        invalid |= frame['latitude'].isna() | frame['longitude'].isna()
+
+        for col in POLLUTANT_COLUMNS + WEATHER_COLUMNS:
+            if col in df.columns:
+                frame[col], bad = self._to_float(df[col])
+                invalid |= bad
+        frame['source'] = 'manual'
+
+        return self._finalize(frame, invalid, 'manual', self._required_timestamps(df))
+
+    def _to_utc(self, series):
+        """Converte horários ISO 8601 (com ou sem fuso) para datetime UTC sem fuso"""
+        return pd.to_datetime(series, utc=True, errors='coerce').dt.tz_localize(None)
+
+    def _file_timestamps(self, df):
+        """Horário das leituras a partir da primeira coluna de horário do arquivo (None se não houver)"""
+        for col in TIMESTAMP_COLUMNS:
+            if col in df.columns:
+                return self._to_utc(df[col])
+        return None
+
+    def _required_timestamps(self, df):
+        """Como _file_timestamps, mas um arquivo sem coluna de horário é recusado (ValueError)"""
+        timestamps = self._file_timestamps(df)
+        if timestamps is None:
+            raise ValueError(MISSING_TIME_MESSAGE)
+        return timestamps
+
+    def _finalize(self, frame, invalid, label, timestamps=None):
+        """
+        Descarta linhas inválidas, calcula AQI e define o horário das leituras
+        (timestamps ou coluna 'timestamp' já presente).
+
+        Linhas sem horário também são descartadas: o horário faz parte da chave natural,
+        e preenchê-lo com o horário da ingestão faria todas as linhas de uma localização
+        no bloco virarem a mesma leitura no upsert.
+        """
+        frame = frame.copy()
+        if timestamps is not None:
+            frame['timestamp'] = timestamps.reindex(frame.index)
+        invalid = invalid | frame['timestamp'].isna()
+        if invalid.any():
+            print(f"⚠️  {int(invalid.sum())} linhas {label} inválidas ou sem horário descartadas")
+            frame = frame[~invalid].copy()
+
+        frame['aqi'] = aqi_frame(frame)['aqi']
+        return frame[READING_COLUMNS]
+
+    def merge_duplicates(self, frame):
+        """Une as linhas do DataFrame com a mesma chave natural (o último valor não nulo prevalece)"""
+        if not frame.duplicated(NATURAL_KEY).any():
+            return frame
+
+        merged = frame.groupby(NATURAL_KEY, sort=False, dropna=False).last().reset_index()
+        merged['aqi'] = aqi_frame(merged)['aqi']
+        return merged[READING_COLUMNS]
+
+    def _existing_readings(self, chunk):
+        """Leituras já gravadas com a mesma chave natural das linhas do bloco"""
+        table = AirQualityData.__table__
+        query = select(*[table.c[col] for col in READING_COLUMNS]).where(
+            table.c.location.in_(chunk['location'].unique().tolist()),
+            table.c.source.in_(chunk['source'].unique().tolist()),
+            table.c.timestamp.between(chunk['timestamp'].min().to_pydatetime(),
+                                      chunk['timestamp'].max().to_pydatetime())
+        )
+        rows = db.session.execute(query).all()
+        existing = pd.DataFrame(rows, columns=READING_COLUMNS)
+        if existing.empty:
+            return existing
+        existing['timestamp'] = pd.to_datetime(existing['timestamp'])
+        return existing.merge(chunk[NATURAL_KEY], on=NATURAL_KEY)
+
+    def _upsert_statement(self):
+        table = AirQualityData.__table__
+        stmt = dialect_insert(table)
+        set_ = {col: func.coalesce(stmt.excluded[col], table.c[col]) for col in MERGED_COLUMNS}
+        set_.update({col: stmt.excluded[col] for col in ['latitude', 'longitude', 'aqi']})
+        # A leitura continua no upload que a enviou primeiro (reenviar um arquivo que se
+        # sobrepõe não esvazia o dataset anterior); leituras das APIs passam ao upload
+        set_['dataset_id'] = func.coalesce(table.c.dataset_id, stmt.excluded.dataset_id)
+        return stmt.on_conflict_do_update(index_elements=NATURAL_KEY, set_=set_)
+
+    def insert_frame(self, frame, dataset_id=None):
+        """
+        Grava as leituras com upserts em lote (INSERT ... ON CONFLICT na chave natural),
+        em blocos de tamanho fixo. Reenviar os mesmos dados não duplica leituras:
+        as repetidas são mescladas com as já gravadas. Com dataset_id, as leituras
+        ficam ligadas ao upload de origem (as que já pertenciam a outro upload continuam
+        nele). Retorna o número de leituras gravadas.
+        """
+        if frame.empty:
+            return 0
+
+        chunk_size = self._get_chunk_size()
+        frame = self.merge_duplicates(frame[READING_COLUMNS].copy())
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+        stmt = self._upsert_statement()
+        merged_total = 0
+
+        chunks = []
+        for start in range(0, len(frame), chunk_size):
+            chunk = frame.iloc[start:start + chunk_size]
+            existing = self._existing_readings(chunk)
+
+            if not existing.empty:
+                # Completar as leituras repetidas com os valores já gravados e recalcular o AQI
+                keyed = chunk.set_index(NATURAL_KEY)
+                previous = existing.set_index(NATURAL_KEY)
+                keyed.loc[previous.index, MERGED_COLUMNS] = \
+                    keyed.loc[previous.index, MERGED_COLUMNS].fillna(previous[MERGED_COLUMNS])
+                keyed.loc[previous.index, 'aqi'] = aqi_frame(keyed.loc[previous.index])['aqi'].values
+                chunk = keyed.reset_index()[READING_COLUMNS]
+                # Retirar dos agregados a contribuição antiga das leituras substituídas
+                update_rollups(existing, subtract=True)
+                merged_total += len(existing)
+
+            records = frame_records(chunk)
+            if dataset_id is not None:
+                for record in records:
+                    record['dataset_id'] = dataset_id
+            db.session.execute(stmt, records)
+            update_rollups(chunk)
+            if not existing.empty:
+                refresh_extremes(existing)
+            chunks.append(chunk)
+
+        if merged_total:
+            print(f"🔁 {merged_total} leituras já existentes foram mescladas")
+        self.update_latest_readings(pd.concat(chunks, ignore_index=True))
+        return len(frame)
+
+    def update_latest_readings(self, frame):
+        """Atualiza a tabela latest_reading com a leitura mais nova de cada localização do bloco"""
+        latest = frame.sort_values('timestamp', kind='stable').drop_duplicates('location', keep='last')
+        if latest.empty:
+            return
+
+        table = LatestReading.__table__
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['location'],
+            set_={col: stmt.excluded[col] for col in LATEST_COLUMNS if col != 'location'},
+            # Nunca substituir por uma leitura mais antiga
+            where=(table.c.timestamp.is_(None)) | (table.c.timestamp <= stmt.excluded.timestamp)
+        )
+        db.session.execute(stmt, frame_records(latest[LATEST_COLUMNS]))
+
+    def ingest_chunks(self, chunks, file_type, progress=None, dataset_id=None):
+        """
+        Grava um arquivo bloco a bloco, com commit a cada bloco para manter a memória constante.
+        Se informado, progress(rows_ingested=n) é chamado após cada bloco.
+        """
+        records_saved = 0
+        seen = set()
+
+        for df in chunks:
+            if file_type == 'openaq':
+                # Manter apenas o primeiro registro de cada (localização, parâmetro) do arquivo todo
+                df = df.drop_duplicates(subset=['location', 'parameter'], keep='first')
+                keys = list(zip(df['location'], df['parameter']))
+                df = df[[key not in seen for key in keys]]
+                seen.update(keys)
+
+            records_saved += self.ingest(df, file_type, dataset_id)
+            db.session.commit()
+            if progress:
+                progress(rows_ingested=records_saved)
+
+        return records_saved
+
+    def ingest(self, df, file_type, dataset_id=None):
+        """Prepara e grava um DataFrame de acordo com o tipo de arquivo (ligado ao dataset, se informado)"""
+        preparers = {
+            'inmet': self.prepare_inmet,
+            'openaq': self.prepare_openaq,
+            'manual': self.prepare_manual
+        }
+        frame = preparers[file_type](df)
+        return self.insert_frame(frame, dataset_id)
@@ -0,0 +1,205 @@
+import threading
+import numpy as np
+from sklearn.neighbors import KDTree
+from utils.spatial import station_index, EARTH_RADIUS_KM
+
+# Variáveis das estações que podem ser interpoladas
+INTERPOLATION_VARIABLES = ['aqi', 'pm25', 'pm10']
+
+
+def unit_vectors(lats, lngs):
+    """Coordenadas em graus como pontos (x, y, z) na esfera unitária"""
+    lats, lngs = np.radians(lats), np.radians(lngs)
+    return np.column_stack([np.cos(lats) * np.cos(lngs), np.cos(lats) * np.sin(lngs), np.sin(lats)])
+
+
+def chord_to_km(chord):
+    """Distância em linha reta na esfera unitária -> distância sobre a superfície (km)"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+def snap_bbox(south, west, north, east, resolution):
+    """Alinha o retângulo à grade da resolução (janelas próximas do mapa caem na mesma grade)"""
+    return (max(np.floor(south / resolution) * resolution, -90.0),
+            max(np.floor(west / resolution) * resolution, -180.0),
+            min(np.ceil(north / resolution) * resolution, 90.0),
+            min(np.ceil(east / resolution) * resolution, 180.0))
+
+
+class IdwGrid:
+    """
+    Interpolação por inverso da distância (IDW) dos valores das estações em uma
+    grade regular de latitude/longitude.
+
+    Cada célula usa as k estações mais próximas (KD-tree sobre os pontos na esfera
+    unitária, onde a distância em linha reta preserva a ordem da distância real).
+    Os vizinhos e as distâncias de cada célula ficam guardados, então uma mudança
+    em poucas estações recalcula só as células que elas influenciam (update).
+
+    values: float32 com uma linha por latitude, do norte para o sul (ordem de
+    imagem), e NaN nas células a mais de max_distance_km da estação mais próxima.
+    """
+
+    def __init__(self, south, west, north, east, resolution, k=8, power=2.0, max_distance_km=None):
+        self.bbox = (south, west, north, east)
+        self.resolution = resolution
+        self.k = k
+        self.power = power
+        self.max_distance_km = max_distance_km
+
+        # Centro das células: linhas do norte para o sul, colunas do oeste para o leste
+        self.rows = max(int(round((north - south) / resolution)), 1)
+        self.cols = max(int(round((east - west) / resolution)), 1)
+        lats = north - (np.arange(self.rows) + 0.5) * resolution
+        lngs = west + (np.arange(self.cols) + 0.5) * resolution
+        grid_lats, grid_lngs = np.meshgrid(lats, lngs, indexing='ij')
+        self.cell_points = unit_vectors(grid_lats.ravel(), grid_lngs.ravel())
+
+        self.keys = np.empty(0, dtype=object)
+        self.points = np.empty((0, 3))
+        self.station_values = np.empty(0)
+        self.neighbors = None
+        self.distances = None
+        self.values = None
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    def _query(self, cells):
+        """Vizinhos (índices das estações) e distâncias em km das células indicadas"""
+        k = min(self.k, len(self.points))
+        tree = KDTree(self.points)
+        chord, neighbors = tree.query(self.cell_points[cells], k=k)
+        return neighbors, chord_to_km(chord)
+
+    def _interpolate(self, cells):
+        distances = self.distances[cells]
+        values = self.station_values[self.neighbors[cells]]
+        weights = 1.0 / np.maximum(distances, 1e-6) ** self.power
+        result = (weights * values).sum(axis=1) / weights.sum(axis=1)
+        # Célula sobre uma estação: o valor da própria estação
+        exact = distances[:, 0] < 1e-6
+        result[exact] = values[exact, 0]
+        if self.max_distance_km is not None:
+            result[distances[:, 0] > self.max_distance_km] = np.nan
+        self.values.reshape(-1)[cells] = result
+
+    def _set_stations(self, keys, lats, lngs, values):
+        self.keys = np.asarray(keys, dtype=object)
+        self.points = unit_vectors(lats, lngs)
+        self.station_values = np.asarray(values, dtype=np.float64)
+
+    def fit(self, keys, lats, lngs, values):
+        """Calcula a grade inteira a partir das estações (chave, posição e valor de cada uma)"""
+        self._set_stations(keys, lats, lngs, values)
+        self.values = np.full(self.shape, np.nan, dtype=np.float32)
+        if len(self.points) == 0:
+            self.neighbors = self.distances = None
+            return self.rows * self.cols
+        cells = np.arange(self.rows * self.cols)
+        self.neighbors, self.distances = self._query(cells)
+        self._interpolate(cells)
+        return len(cells)
+
+    def update(self, keys, lats, lngs, values, max_changed_fraction=0.2):
+        """
+        Atualiza a grade para um novo conjunto de estações e retorna o número de células
+        recalculadas. Estações novas, removidas ou que mudaram de posição refazem a busca
+        de vizinhos só nas células afetadas; estações que só mudaram de valor recalculam
+        as células que as têm entre os vizinhos. Com muitas mudanças (mais que
+        max_changed_fraction das estações) ou menos de k estações, recalcula tudo.
+        """
+        keys = np.asarray(keys, dtype=object)
+        points = unit_vectors(lats, lngs)
+        values = np.asarray(values, dtype=np.float64)
+        if self.neighbors is None or len(self.keys) <= self.k or len(keys) <= self.k:
+            return self.fit(keys, lats, lngs, values)
+
+        # Posição de cada estação antiga no novo conjunto (-1 se saiu ou se mudou de lugar)
+        new_position = {key: i for i, key in enumerate(keys)}
+        remap = np.array([new_position.get(key, -1) for key in self.keys], dtype=np.int64)
+        kept = remap >= 0
+        moved = np.zeros(len(remap), dtype=bool)
+        moved[kept] = np.abs(points[remap[kept]] - self.points[kept]).max(axis=1) > 1e-9
+        remap[moved] = -1
+
+        added = np.ones(len(keys), dtype=bool)
+        added[remap[remap >= 0]] = False
+        structural = (remap < 0).sum() + added.sum()
+        if structural > max_changed_fraction * len(keys):
+            return self.fit(keys, lats, lngs, values)
+
+        changed = np.zeros(len(keys), dtype=bool)
+        still = remap >= 0
+        changed[remap[still]] = values[remap[still]] != self.station_values[still]
+
+        neighbors = remap[self.neighbors]
+        self._set_stations(keys, lats, lngs, values)
+        self.neighbors = neighbors
+
+        # Células que perderam um vizinho ou para as quais uma estação nova ficou mais perto que o k-ésimo
+        requery = (neighbors < 0).any(axis=1)
+        if added.any():
+            chord, _ = KDTree(points[added]).query(self.cell_points, k=1)
+            requery |= chord_to_km(chord[:, 0]) < self.distances[:, -1]
+
+        # Arrays novos: quem ainda lê a grade anterior (outra requisição) não vê a atualização pela metade
+        self.distances = self.distances.copy()
+        self.values = self.values.copy()
+        cells = np.flatnonzero(requery)
+        if len(cells):
+            self.neighbors[cells], self.distances[cells] = self._query(cells)
+        stale = requery | changed[self.neighbors].any(axis=1)
+        cells = np.flatnonzero(stale)
+        if len(cells):
+            self._interpolate(cells)
+        return len(cells)
+
+
+class InterpolationCache:
+    """
+    Grades interpoladas do processo, por variável e especificação da grade, válidas
+    para uma versão do índice espacial (que acompanha ingestões de qualquer processo).
+    Quando a versão muda, a grade é atualizada de forma incremental a partir das
+    estações do índice.
+    """
+
+    def __init__(self, max_grids=16):
+        self.max_grids = max_grids
+        self._grids = {}
+        self._lock = threading.Lock()
+
+    def get(self, variable, south, west, north, east, resolution, k=8, power=2.0, max_distance_km=None):
+        """Retorna (grade, versão dos dados, células recalculadas nesta chamada)"""
+        if variable not in INTERPOLATION_VARIABLES:
+            raise ValueError(f"Variável inválida: {variable} (use {', '.join(INTERPOLATION_VARIABLES)})")
+        key = (variable, south, west, north, east, resolution, k, power, max_distance_km)
+        index = station_index.get()
+        version = index.version
+
+        with self._lock:
+            entry = self._grids.get(key)
+            if entry is not None and entry[1] == version:
+                return entry[0], version, 0
+
+            stations = index.stations
+            stations = stations[stations[variable].notna()]
+            arrays = (stations['location'].to_numpy(), stations['latitude'].to_numpy(dtype=float),
+                      stations['longitude'].to_numpy(dtype=float), stations[variable].to_numpy(dtype=float))
+            if entry is None:
+                grid = IdwGrid(south, west, north, east, resolution, k, power, max_distance_km)
+                recomputed = grid.fit(*arrays)
+            else:
+                grid = entry[0]
+                recomputed = grid.update(*arrays)
+
+            self._grids.pop(key, None)
+            self._grids[key] = (grid, version)
+            # Mantém só as grades usadas mais recentemente
+            while len(self._grids) > self.max_grids:
+                self._grids.pop(next(iter(self._grids)))
+            return grid, version, recomputed
+
+
+interpolation_cache = InterpolationCache()
@@ -0,0 +1,94 @@
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app import db
+from models.job import Job
+
+
+def _to_json(value):
+    # Tipos numpy (np.float64, np.int64) viram tipos nativos
+    return json.dumps(value, default=lambda obj: obj.item() if hasattr(obj, 'item') else str(obj))
+
+
+class JobProgress:
+    """Registra o progresso de uma tarefa na tabela de jobs"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.state = {}
+
+    def update(self, **values):
+        self.state.update(values)
+        Job.query.filter_by(id=self.job_id).update({'progress': _to_json(self.state)})
+        db.session.commit()
+
+
+class JobQueue:
+    """
+    Fila de tarefas em segundo plano dentro do processo.
+
+    As tarefas rodam em um pool de threads e o estado fica na tabela job, de modo
+    que qualquer worker do gunicorn consegue responder /api/jobs/<id>.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_queue'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            workers = self.app.config.get('JOB_WORKERS', 2)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ecopredict-job')
+        return self._executor
+
+    def enqueue(self, kind, func, *args, user_id=None, **kwargs):
+        """
+        Agenda func(progress, *args, **kwargs) e retorna o id do job imediatamente.
+        O valor retornado por func é gravado como resultado do job.
+        """
+        job = Job(id=uuid.uuid4().hex, kind=kind, status='queued', user_id=user_id)
+        db.session.add(job)
+        db.session.commit()
+
+        if self.app.config.get('JOB_WORKERS', 2) == 0:
+            # Modo síncrono (útil em testes e scripts)
+            self._run(job.id, func, args, kwargs)
+        else:
+            self._get_executor().submit(self._run, job.id, func, args, kwargs)
+
+        return job.id
+
+    def _run(self, job_id, func, args, kwargs):
+        with self.app.app_context():
+            try:
+                Job.query.filter_by(id=job_id).update({'status': 'running', 'started_at': datetime.utcnow()})
+                db.session.commit()
+
+                result = func(JobProgress(job_id), *args, **kwargs)
+
+                Job.query.filter_by(id=job_id).update({
+                    'status': 'finished',
+                    'result': _to_json(result),
+                    'finished_at': datetime.utcnow()
+                })
+                db.session.commit()
+
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Erro no job {job_id}: {e}")
+                Job.query.filter_by(id=job_id).update({
+                    'status': 'failed',
+                    'error': str(e),
+                    'finished_at': datetime.utcnow()
+                })
+                db.session.commit()
+
+
+job_queue = JobQueue()
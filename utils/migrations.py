@@ -0,0 +1,201 @@
+import pandas as pd
+from sqlalchemy import inspect, text, select, func, insert, update, delete, tuple_, bindparam
+from app import db
+from models.air_quality import AirQualityData, LatestReading, ReadingRollup, Dataset
+from utils.aqi import aqi_frame
+from utils.db_utils import frame_records
+from utils.rollups import rebuild_rollups
+
+NATURAL_KEY_INDEX = 'uq_air_quality_data_reading'
+# Índices substituídos por outros e removidos na migração
+OBSOLETE_INDEXES = {
+    'air_quality_data': ['ix_air_quality_data_location_timestamp']  # coberto por uq_air_quality_data_reading
+}
+MERGED_COLUMNS = ['pm25', 'pm10', 'co2', 'no2', 'o3', 'so2', 'temperature', 'humidity', 'pressure']
+
+
+def add_missing_columns(tables):
+    """
+    Adiciona as colunas declaradas nos modelos que ainda não existem no banco
+    (ALTER TABLE ... ADD COLUMN, sempre anuláveis). Linhas antigas ficam com NULL.
+    """
+    inspector = inspect(db.engine)
+    added = []
+
+    for table in tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=db.engine.dialect)}'
+            for foreign_key in column.foreign_keys:
+                ddl += f' REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})'
+            with db.engine.begin() as conn:
+                conn.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+
+    return added
+
+
+def create_missing_indexes(tables):
+    """
+    Cria os índices declarados nos modelos que ainda não existem no banco.
+    O db.create_all() só cria tabelas novas e não altera as existentes.
+    """
+    inspector = inspect(db.engine)
+    created = []
+
+    for table in tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+
+    if created and db.engine.dialect.name == 'sqlite':
+        # Atualiza as estatísticas usadas pelo planejador de consultas
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+
+    return created
+
+
+def drop_obsolete_indexes():
+    """Remove índices que deixaram de ser declarados nos modelos"""
+    inspector = inspect(db.engine)
+    dropped = []
+    for table_name, names in OBSOLETE_INDEXES.items():
+        existing = {index['name'] for index in inspector.get_indexes(table_name)}
+        for name in names:
+            if name in existing:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'DROP INDEX {name}'))
+                dropped.append(name)
+    return dropped
+
+
+def _merge_duplicate_keys(keys):
+    """Mescla as leituras de um lote de chaves duplicadas na de menor id; retorna linhas removidas"""
+    table = AirQualityData.__table__
+    key_columns = [table.c[col] for col in AirQualityData.NATURAL_KEY]
+    rows = db.session.execute(
+        select(table.c.id, *key_columns, table.c.latitude, table.c.longitude,
+               *[table.c[col] for col in MERGED_COLUMNS])
+        .where(tuple_(*key_columns).in_(keys))
+        .order_by(table.c.id)
+    ).all()
+    df = pd.DataFrame(rows, columns=['id'] + AirQualityData.NATURAL_KEY + ['latitude', 'longitude'] + MERGED_COLUMNS)
+
+    # Valores da leitura mais nova (maior id) prevalecem; colunas vazias herdam das anteriores
+    groups = df.groupby(AirQualityData.NATURAL_KEY, sort=False)
+    merged = groups.last()
+    merged['id'] = groups['id'].min()
+    merged['aqi'] = aqi_frame(merged)['aqi'].values
+    merged = merged.reset_index(drop=True)
+
+    update_columns = ['latitude', 'longitude', 'aqi'] + MERGED_COLUMNS
+    stmt = update(table).where(table.c.id == bindparam('_id')).values(
+        {col: bindparam(col) for col in update_columns}
+    )
+    records = frame_records(merged[update_columns])
+    for record, keeper in zip(records, merged['id'].tolist()):
+        record['_id'] = keeper
+    db.session.execute(stmt, records)
+
+    removed = df.loc[~df['id'].isin(merged['id']), 'id'].tolist()
+    db.session.execute(delete(table).where(table.c.id.in_(removed)))
+    db.session.commit()
+    return len(removed)
+
+
+def compact_readings(batch_size=500, progress=None):
+    """
+    Remove leituras duplicadas (mesma localização, horário e fonte) de air_quality_data.
+
+    As chaves duplicadas são encontradas em lotes com paginação por chave
+    (sem cursor aberto entre os lotes e sem carregar a tabela na memória);
+    cada grupo é mesclado na leitura de menor id e as demais são apagadas.
+    Retorna (grupos mesclados, linhas removidas).
+    """
+    table = AirQualityData.__table__
+    key_columns = [table.c[col] for col in AirQualityData.NATURAL_KEY]
+    merged_groups = removed_rows = 0
+    last_key = None
+
+    while True:
+        query = select(*key_columns).where(table.c.timestamp.isnot(None))
+        if last_key is not None:
+            query = query.where(tuple_(*key_columns) > tuple_(*last_key))
+        query = query.group_by(*key_columns).having(func.count() > 1) \
+            .order_by(*key_columns).limit(batch_size)
+        keys = [tuple(row) for row in db.session.execute(query).all()]
+        if not keys:
+            break
+
+        removed_rows += _merge_duplicate_keys(keys)
+        merged_groups += len(keys)
+        last_key = keys[-1]
+        if progress:
+            progress(merged_groups=merged_groups, removed_rows=removed_rows)
+
+    return merged_groups, removed_rows
+
+
+def ensure_natural_key():
+    """
+    Prepara bancos antigos para o índice único da chave natural: mescla as
+    leituras duplicadas antes que create_missing_indexes crie o índice.
+    """
+    existing = {index['name'] for index in inspect(db.engine).get_indexes(AirQualityData.__tablename__)}
+    if NATURAL_KEY_INDEX in existing:
+        return 0
+
+    merged_groups, removed_rows = compact_readings()
+    if removed_rows:
+        print(f"✅ {removed_rows} leituras duplicadas removidas ({merged_groups} grupos mesclados)")
+        # Contagens e leituras mais recentes mudaram: recalcular as tabelas derivadas
+        rebuild_latest_readings()
+        rebuild_rollups()
+    return removed_rows
+
+
+def rebuild_latest_readings():
+    """Recria a tabela latest_reading a partir de air_quality_data (uma linha por localização)"""
+    readings = AirQualityData.__table__
+    columns = ['location', 'latitude', 'longitude', 'pm25', 'pm10', 'aqi', 'timestamp', 'source']
+
+    ranked = select(
+        *[readings.c[col] for col in columns],
+        func.row_number().over(
+            partition_by=readings.c.location,
+            order_by=(readings.c.timestamp.desc(), readings.c.id.desc())
+        ).label('rank')
+    ).subquery()
+
+    with db.engine.begin() as conn:
+        conn.execute(LatestReading.__table__.delete())
+        result = conn.execute(insert(LatestReading.__table__).from_select(
+            columns, select(*[ranked.c[col] for col in columns]).where(ranked.c.rank == 1)
+        ))
+    return result.rowcount
+
+
+def run_migrations():
+    """Passos de migração executados na inicialização da aplicação"""
+    for name in add_missing_columns([AirQualityData.__table__, Dataset.__table__]):
+        print(f"✅ Coluna adicionada: {name}")
+    ensure_natural_key()
+    for name in create_missing_indexes([AirQualityData.__table__]):
+        print(f"✅ Índice criado: {name}")
+    for name in drop_obsolete_indexes():
+        print(f"🗑️  Índice removido: {name}")
+
+    # Preencher latest_reading em bancos que já tinham leituras
+    if LatestReading.query.first() is None and AirQualityData.query.first() is not None:
+        count = rebuild_latest_readings()
+        print(f"✅ Tabela latest_reading preenchida: {count} localizações")
+
+    # Preencher os agregados por hora/dia usados nos relatórios
+    if ReadingRollup.query.first() is None and AirQualityData.query.first() is not None:
+        count = rebuild_rollups()
+        print(f"✅ Agregados por hora/dia calculados a partir de {count} leituras")
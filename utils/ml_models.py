@@ -1,19 +1,72 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.cluster import KMeans
-from sklearn.model_selection import train_test_split
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split, ParameterGrid
 from sklearn.metrics import mean_squared_error, r2_score
+from concurrent.futures import ThreadPoolExecutor, wait
 import joblib
 import os
+import threading
+import time
+from utils.model_registry import model_registry, dump_model
+
+# Features usadas pelos modelos de previsão de AQI (na ordem do treinamento)
+FEATURE_COLUMNS = ['pm25', 'pm10', 'no2', 'o3', 'co2', 'temperature', 'humidity', 'pressure']
+FEATURE_DEFAULTS = {'pressure': 1013.25}  # Pressão padrão ao nível do mar (hPa)
+
+# Modelos treinados pelo orquestrador (AirQualityPredictor.train_models), nessa ordem
+MODEL_TYPES = ['random_forest', 'linear_regression', 'kmeans']
+
+def build_estimator(model_type, params=None, n_jobs=None):
+    """Estimador de um tipo de modelo com os hiperparâmetros informados (usado nas buscas)"""
+    params = dict(params or {})
+    if model_type == 'random_forest':
+        return RandomForestRegressor(random_state=42, n_jobs=n_jobs, **params)
+    if model_type == 'sgd_regressor':
+        return Pipeline([('scaler', StandardScaler()), ('regressor', SGDRegressor(random_state=42, **params))])
+    raise ValueError(f"Busca de hiperparâmetros não suportada para o modelo {model_type}")
+
+def evaluate_candidate(model_type, params, X_train, X_test, y_train, y_test):
+    """
+    Treina e avalia uma combinação de hiperparâmetros (executado nos processos da busca,
+    com um núcleo por candidato). Os arrays chegam mapeados em memória, sem cópia.
+    """
+    start = time.perf_counter()
+    model = build_estimator(model_type, params, n_jobs=1)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return {
+        'params': params,
+        'mse': float(mean_squared_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        'seconds': time.perf_counter() - start
+    }
 
 class AirQualityPredictor:
     def __init__(self):
         self.models = {}
         self.model_path = 'ml/models/'
+        self.registry = model_registry
         os.makedirs(self.model_path, exist_ok=True)
     
+    def save_model(self, model, model_type, training_rows=None, metrics=None, **metadata):
+        """
+        Salva o modelo de forma atômica, com os metadados em <modelo>.json
+        (features, linhas de treino, métricas e hash; ver utils.model_registry.dump_model)
+        """
+        path = os.path.join(self.model_path, f'{model_type}.pkl')
+        metadata.setdefault('features', FEATURE_COLUMNS)
+        metadata.update(training_rows=training_rows, metrics=metrics)
+        return dump_model(model, path, model_type, compress=self.registry.compress, metadata=metadata)
+    
+    def split_data(self, X, y, test_size=0.2):
+        """Divisão treino/teste usada por todos os modelos (mesma semente)"""
+        return train_test_split(X, y, test_size=test_size, random_state=42)
+    
     def prepare_data(self, df):
         """Prepara dados para treinamento"""
         # Selecionar features relevantes
@@ -27,12 +80,27 @@ class AirQualityPredictor:
         
         return X, y
     
-    def train_random_forest(self, X, y):
-        """Treina modelo Random Forest"""
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    def train_random_forest(self, X, y, n_estimators=100, progress=None, split=None, n_jobs=None):
+        """
+        Treina modelo Random Forest (árvores em paralelo com n_jobs núcleos).
+        Se informado, progress(trees_fitted=..., trees_total=...) é chamado a cada lote de árvores.
+        split: divisão (X_train, X_test, y_train, y_test) já feita, para não repeti-la.
+        """
+        X_train, X_test, y_train, y_test = split or self.split_data(X, y)
         
-        rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        rf_model.fit(X_train, y_train)
+        rf_model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+        if progress is None:
+            rf_model.fit(X_train, y_train)
+        else:
+            # warm_start adiciona árvores sem refazer as anteriores (mesmo resultado do fit único)
+            rf_model.set_params(warm_start=True)
+            # Lotes de pelo menos uma árvore por núcleo, para não deixar núcleos parados
+            step = max(1, n_estimators // 10, joblib.effective_n_jobs(n_jobs))
+            for fitted in range(step, n_estimators + step, step):
+                rf_model.set_params(n_estimators=min(fitted, n_estimators))
+                rf_model.fit(X_train, y_train)
+                progress(stage='random_forest', trees_fitted=len(rf_model.estimators_), trees_total=n_estimators)
+            rf_model.set_params(warm_start=False)
         
         # Avaliação
         y_pred = rf_model.predict(X_test)
@@ -40,13 +108,13 @@ class AirQualityPredictor:
         r2 = r2_score(y_test, y_pred)
         
         # Salvar modelo
-        joblib.dump(rf_model, os.path.join(self.model_path, 'random_forest.pkl'))
+        self.save_model(rf_model, 'random_forest', len(X_train), {'mse': mse, 'r2': r2})
         
         return rf_model, mse, r2
     
-    def train_linear_regression(self, X, y):
+    def train_linear_regression(self, X, y, split=None):
         """Treina modelo de Regressão Linear"""
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test = split or self.split_data(X, y)
         
         lr_model = LinearRegression()
         lr_model.fit(X_train, y_train)
@@ -57,7 +125,7 @@ class AirQualityPredictor:
         r2 = r2_score(y_test, y_pred)
         
         # Salvar modelo
-        joblib.dump(lr_model, os.path.join(self.model_path, 'linear_regression.pkl'))
+        self.save_model(lr_model, 'linear_regression', len(X_train), {'mse': mse, 'r2': r2})
         
         return lr_model, mse, r2
     
@@ -67,17 +135,164 @@ class AirQualityPredictor:
         kmeans.fit(X)
         
         # Salvar modelo
-        joblib.dump(kmeans, os.path.join(self.model_path, 'kmeans.pkl'))
+        self.save_model(kmeans, 'kmeans', len(X), {'inertia': kmeans.inertia_})
         
         return kmeans
     
-    def predict_air_quality(self, features, model_type='random_forest'):
-        """Faz previsão usando modelo treinado"""
-        model_path = os.path.join(self.model_path, f'{model_type}.pkl')
-        
-        if os.path.exists(model_path):
-            model = joblib.load(model_path)
-            prediction = model.predict([features])
-            return prediction[0]
-        else:
-            raise FileNotFoundError(f"Modelo {model_type} não encontrado")
\ No newline at end of file
+    def train_models(self, X, y, models=None, n_jobs=None, n_clusters=3, progress=None):
+        """
+        Treina vários modelos ao mesmo tempo sobre uma única divisão treino/teste.
+
+        Cada modelo roda em uma thread (o sklearn libera o GIL no treino); o Random Forest
+        usa n_jobs núcleos para as árvores. O progresso das threads é repassado a
+        progress(...) pela thread que chamou (a que tem a sessão do banco).
+        Retorna {modelo: {'model', 'mse', 'r2', 'seconds'}} (K-Means sem métricas).
+        """
+        models = list(models or MODEL_TYPES)
+        split = self.split_data(X, y)
+        state = {}
+        lock = threading.Lock()
+        
+        def report(**values):
+            with lock:
+                state.update(values)
+        
+        trainers = {
+            'random_forest': lambda: self.train_random_forest(X, y, progress=report, split=split, n_jobs=n_jobs),
+            'linear_regression': lambda: self.train_linear_regression(X, y, split=split),
+            'kmeans': lambda: (self.train_kmeans(X, n_clusters=n_clusters), None, None)
+        }
+        unknown = set(models) - set(trainers)
+        if unknown:
+            raise ValueError(f"Modelos desconhecidos: {', '.join(sorted(unknown))}")
+        
+        def timed(model_type):
+            start = time.perf_counter()
+            model, mse, r2 = trainers[model_type]()
+            return {'model': model, 'mse': mse, 'r2': r2, 'seconds': time.perf_counter() - start}
+        
+        with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix='ecopredict-train') as executor:
+            futures = {executor.submit(timed, model_type): model_type for model_type in models}
+            pending = set(futures)
+            reported = None
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                with lock:
+                    snapshot = dict(state, models_done=len(futures) - len(pending), models_total=len(futures))
+                if progress and snapshot != reported:
+                    progress(**snapshot)
+                    reported = snapshot
+        
+        return {futures[future]: future.result() for future in futures}
+    
+    def sweep(self, X, y, param_grid, model_type='random_forest', n_jobs=None, progress=None, save_best=True):
+        """
+        Busca de hiperparâmetros: avalia cada combinação de param_grid em um pool de
+        processos (joblib/loky). X e y são divididos uma vez e os arrays maiores que
+        1 MB são compartilhados com os processos por memória mapeada, sem cópia por
+        candidato. Com save_best, o melhor candidato (menor MSE) é retreinado com
+        n_jobs núcleos e salvo como model_type.
+        Retorna a lista de candidatos (do melhor para o pior).
+        """
+        split = self.split_data(X, y)
+        candidates = list(ParameterGrid(param_grid))
+        build_estimator(model_type)  # valida o tipo de modelo antes de abrir o pool
+        
+        parallel = joblib.Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r', return_as='generator')
+        results = []
+        for result in parallel(joblib.delayed(evaluate_candidate)(model_type, params, *split) for params in candidates):
+            results.append(result)
+            if progress:
+                progress(stage='sweep', candidates_done=len(results), candidates_total=len(candidates))
+        results.sort(key=lambda result: result['mse'])
+        
+        if save_best and results:
+            X_train, _, y_train, _ = split
+            best = build_estimator(model_type, results[0]['params'], n_jobs=n_jobs)
+            best.fit(X_train, y_train)
+            self.save_model(best, model_type, len(X_train), {'mse': results[0]['mse'], 'r2': results[0]['r2']},
+                            params=results[0]['params'])
+        return results
+    
+    def train_sgd_regressor(self, chunks, epochs=3, test_fraction=0.2, progress=None, seed=42):
+        """
+        Treina um SGDRegressor de forma incremental (partial_fit), sem carregar os dados na memória.
+
+        chunks() deve retornar um iterável novo de blocos (X, y) a cada chamada: a primeira
+        passada ajusta o StandardScaler e as seguintes, uma por época, o regressor. Uma fração
+        fixa das linhas de cada bloco (test_fraction) fica de fora do treino e é usada para
+        calcular MSE e R² na última época. Salvo como pipeline (scaler + regressor).
+        """
+        scaler = StandardScaler()
+        for X, _ in chunks():
+            scaler.partial_fit(X)
+
+        model = SGDRegressor(random_state=seed)
+        for epoch in range(1, epochs + 1):
+            rng = np.random.default_rng(seed)  # mesmo conjunto de teste em todas as épocas
+            sse = total = total_sq = count = 0.0
+            for X, y in chunks():
+                test = rng.random(len(X)) < test_fraction
+                X = scaler.transform(X)
+                if (~test).any():
+                    model.partial_fit(X[~test], y[~test])
+                if epoch == epochs and test.any() and hasattr(model, 'coef_'):
+                    y_test = y[test].astype(np.float64)
+                    sse += float(np.sum((y_test - model.predict(X[test])) ** 2))
+                    total += float(y_test.sum())
+                    total_sq += float(np.sum(y_test ** 2))
+                    count += len(y_test)
+            if progress:
+                progress(stage='sgd_regressor', epochs_done=epoch, epochs_total=epochs)
+
+        if not hasattr(model, 'coef_'):
+            raise ValueError('Dados insuficientes para treinamento')
+        mse = sse / count if count else float('nan')
+        variance = total_sq - total ** 2 / count if count else 0.0
+        r2 = 1 - sse / variance if variance > 0 else float('nan')
+
+        pipeline = Pipeline([('scaler', scaler), ('regressor', model)])
+        self.save_model(pipeline, 'sgd_regressor', int(scaler.n_samples_seen_ - count), {'mse': mse, 'r2': r2},
+                        epochs=epochs)
+        return pipeline, mse, r2
+    
+    def train_minibatch_kmeans(self, chunks, n_clusters=4, batch_size=4096, seed=42):
+        """Treina MiniBatchKMeans de forma incremental (partial_fit em cada bloco de chunks())"""
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=3, random_state=seed)
+        pending = None
+        seen = 0
+        for X, _ in chunks():
+            seen += len(X)
+            # O primeiro partial_fit precisa de pelo menos n_clusters linhas
+            pending = X if pending is None else np.concatenate([pending, X])
+            if len(pending) >= n_clusters or hasattr(kmeans, 'cluster_centers_'):
+                kmeans.partial_fit(pending)
+                pending = None
+        if not hasattr(kmeans, 'cluster_centers_'):
+            raise ValueError('Dados insuficientes para clustering')
+        
+        self.save_model(kmeans, 'minibatch_kmeans', seen)
+        return kmeans
+    
+    def predict_batch(self, X, model_type='random_forest'):
+        """
+        Faz previsões para várias linhas em uma única chamada vetorizada de model.predict.
+        X é um DataFrame com as colunas de FEATURE_COLUMNS. Retorna (previsões, versão).
+        """
+        model, version = self.registry.get(model_type)
+        X = X[FEATURE_COLUMNS].astype(float)
+        if not hasattr(model, 'feature_names_in_'):
+            X = X.to_numpy()
+        return model.predict(X), version
+    
+    def predict_air_quality(self, features, model_type='random_forest', return_version=False):
+        """Faz previsão usando modelo treinado (mantido em memória pelo registro de modelos)"""
+        model, version = self.registry.get(model_type)
+        X = [features]
+        if len(getattr(model, 'feature_names_in_', [])) == len(features):
+            X = pd.DataFrame(X, columns=model.feature_names_in_)
+        prediction = model.predict(X)[0]
+        
+        if return_version:
+            return prediction, version
+        return prediction
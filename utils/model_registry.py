@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+import joblib
+import sklearn
+
+# Versão do formato dos artefatos (modelo .pkl + metadados .json ao lado)
+ARTIFACT_FORMAT = 1
+
+
+def file_hash(path):
+    """SHA-256 do arquivo, lido em blocos de 1 MB"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_value(value):
+    """Escalares numpy (ex.: métricas em float32) viram números do Python"""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def read_metadata(path):
+    """Metadados do artefato (None para modelos salvos antes do formato ou sem o .json)"""
+    try:
+        with open(metadata_path(path), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def dump_model(model, path, model_type, compress=0, metadata=None):
+    """
+    Grava o modelo e os metadados de forma atômica (outros workers nunca leem um arquivo pela metade).
+
+    compress: nível zlib do joblib (0 = sem compressão, o que permite carregar os arrays
+    numpy por memória mapeada; 1-9 = arquivo menor, carregado por inteiro na memória).
+    metadata: informações extras do treino (ex.: training_rows, metrics), gravadas em
+    <modelo>.json junto com features, classe do modelo, tamanho e hash do arquivo.
+    """
+    tmp_path = f'{path}.tmp.{os.getpid()}.{threading.get_ident()}'
+    joblib.dump(model, tmp_path, compress=compress)
+    digest = file_hash(tmp_path)
+    stat = os.stat(tmp_path)
+
+    info = {
+        'format': ARTIFACT_FORMAT,
+        'model_type': model_type,
+        'model_class': type(model).__name__,
+        'sklearn_version': sklearn.__version__,
+        'compress': compress,
+        'size_bytes': stat.st_size,
+        # os.replace mantém o mtime: identifica o .pkl exato descrito por este .json
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+        'version': digest[:12],
+        'saved_at': datetime.utcnow().isoformat()
+    }
+    info.update(metadata or {})
+    tmp_meta = f'{metadata_path(path)}.tmp.{os.getpid()}.{threading.get_ident()}'
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2, default=_json_value)
+
+    # Modelo primeiro: quem ler o .json antigo com o modelo novo vê o mtime diferente e calcula o hash
+    os.replace(tmp_path, path)
+    os.replace(tmp_meta, metadata_path(path))
+    return info
+
+
+class ModelRegistry:
+    """
+    Registro de modelos carregados em memória, compartilhado pelo processo.
+
+    Cada tipo de modelo é desserializado uma única vez e só é recarregado quando
+    o arquivo muda (mtime/tamanho diferentes e hash de conteúdo diferente).
+    A versão exposta é o prefixo do SHA-256 do arquivo, lido dos metadados quando
+    eles correspondem ao arquivo (sem reler o modelo inteiro para calcular o hash).
+
+    Artefatos sem compressão são carregados com mmap_mode: os arrays numpy que o
+    modelo mantém como estão (coeficientes, centróides, scaler) ficam no cache de
+    páginas do sistema, compartilhado entre os workers do gunicorn.
+    """
+
+    def __init__(self, model_path='ml/models/'):
+        self.model_path = model_path
+        self.compress = 0
+        self.mmap_mode = 'r'
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.compress = app.config.get('MODEL_COMPRESS', 0)
+        self.mmap_mode = 'r' if app.config.get('MODEL_MMAP', True) else None
+
+    def _path(self, model_type):
+        return os.path.join(self.model_path, f'{model_type}.pkl')
+
+    def _file_hash(self, path, metadata=None, stat=None):
+        """
+        Versão do arquivo: a dos metadados quando eles descrevem este .pkl (mesmo tamanho
+        e mtime; modelos com tamanho fixo, como LinearRegression e KMeans, mantêm o tamanho
+        entre treinos), senão o hash do conteúdo.
+        """
+        if metadata and metadata.get('version') and stat is not None and metadata.get('size_bytes') == stat.st_size:
+            if 'mtime_ns' in metadata:
+                matches = metadata['mtime_ns'] == stat.st_mtime_ns
+            else:
+                # .json de antes do mtime_ns: só vale se não for mais antigo que o .pkl
+                try:
+                    matches = os.stat(metadata_path(path)).st_mtime_ns >= stat.st_mtime_ns
+                except FileNotFoundError:
+                    matches = False
+            if matches:
+                return metadata['version']
+        return file_hash(path)[:12]
+
+    def _load(self, path, metadata):
+        # Arquivos comprimidos (ou sem metadados, de antes do formato) não podem ser mapeados
+        if self.mmap_mode and metadata and not metadata.get('compress'):
+            return joblib.load(path, mmap_mode=self.mmap_mode)
+        return joblib.load(path)
+
+    def get(self, model_type):
+        """Retorna (modelo, versão), carregando do disco apenas se o arquivo mudou"""
+        path = self._path(model_type)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Modelo {model_type} não encontrado")
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(model_type)
+        if entry is not None and entry['signature'] == signature:
+            return entry['model'], entry['version']
+
+        with self._lock:
+            entry = self._entries.get(model_type)
+            if entry is not None and entry['signature'] == signature:
+                return entry['model'], entry['version']
+
+            metadata = read_metadata(path)
+            version = self._file_hash(path, metadata, stat)
+            if entry is not None and entry['version'] == version:
+                # Arquivo regravado com o mesmo conteúdo: não precisa recarregar
+                entry['signature'] = signature
+                return entry['model'], entry['version']
+
+            model = self._load(path, metadata)
+            self._entries[model_type] = {
+                'model': model,
+                'version': version,
+                'signature': signature,
+                'metadata': metadata,
+                'loaded_at': datetime.utcnow()
+            }
+            print(f"🧠 Modelo {model_type} carregado (versão {version})")
+            return model, version
+
+    def metadata(self, model_type):
+        """Metadados gravados com o modelo (None se o modelo não tem .json)"""
+        path = self._path(model_type)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Modelo {model_type} não encontrado")
+        return read_metadata(path)
+
+    def versions(self):
+        """Versões atualmente em memória, por tipo de modelo"""
+        return {
+            model_type: {'version': entry['version'], 'loaded_at': entry['loaded_at'].isoformat()}
+            for model_type, entry in self._entries.items()
+        }
+
+    def clear(self, model_type=None):
+        """Descarta modelos da memória (todos ou de um tipo)"""
+        with self._lock:
+            if model_type is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(model_type, None)
+
+
+model_registry = ModelRegistry()
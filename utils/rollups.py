@@ -0,0 +1,260 @@
+import pandas as pd
+from datetime import timedelta
+from sqlalchemy import and_, or_, func, update, bindparam
+from app import db
+from models.air_quality import AirQualityData, ReadingRollup
+from utils.db_utils import dialect_insert, frame_records, null_safe_least, null_safe_greatest
+from utils.archive import scan_readings
+
+# Granularidades mantidas e a frequência do pandas usada para truncar o horário
+GRANULARITIES = {'hour': 'h', 'day': 'D'}
+
+# Limites usados pelos alertas dos relatórios
+PM25_LIMIT = 35
+AQI_LIMIT = 100
+
+ADDITIVE_COLUMNS = ['count', 'aqi_count', 'aqi_sum', 'pm25_count', 'pm25_sum',
+                    'aqi_exceedances', 'pm25_exceedances']
+EXTREME_COLUMNS = ['aqi_min', 'aqi_max', 'pm25_min', 'pm25_max']
+ROLLUP_KEY = ['granularity', 'bucket_start', 'location']
+
+# Dias consultados por instrução ao recalcular mínimos e máximos
+EXTREMES_BATCH_DAYS = 200
+
+
+def aggregate_rollups(frame, granularity):
+    """Agrega um bloco de leituras por (período, localização)"""
+    df = pd.DataFrame({
+        'bucket_start': pd.to_datetime(frame['timestamp']).dt.floor(GRANULARITIES[granularity]),
+        'location': frame['location'].values,
+        # Como nos relatórios, valores zerados ou ausentes não entram nas estatísticas
+        'aqi': frame['aqi'].where(frame['aqi'] != 0).astype(float).values,
+        'pm25': frame['pm25'].where(frame['pm25'] != 0).astype(float).values
+    })
+    df['aqi_exceedances'] = (df['aqi'] > AQI_LIMIT).astype(int)
+    df['pm25_exceedances'] = (df['pm25'] > PM25_LIMIT).astype(int)
+
+    rollups = df.groupby(['bucket_start', 'location'], sort=False).agg(
+        count=('location', 'size'),
+        aqi_count=('aqi', 'count'),
+        aqi_sum=('aqi', 'sum'),
+        aqi_min=('aqi', 'min'),
+        aqi_max=('aqi', 'max'),
+        pm25_count=('pm25', 'count'),
+        pm25_sum=('pm25', 'sum'),
+        pm25_min=('pm25', 'min'),
+        pm25_max=('pm25', 'max'),
+        aqi_exceedances=('aqi_exceedances', 'sum'),
+        pm25_exceedances=('pm25_exceedances', 'sum')
+    ).reset_index()
+    rollups.insert(0, 'granularity', granularity)
+    return rollups
+
+
+def update_rollups(frame, subtract=False):
+    """
+    Soma um bloco de leituras recém-gravadas aos agregados por hora e por dia.
+    Com subtract=True retira a contribuição de leituras que foram substituídas;
+    mínimos e máximos não podem ser subtraídos e são corrigidos depois, com as
+    leituras novas já gravadas, por refresh_extremes.
+    """
+    if frame.empty:
+        return
+
+    table = ReadingRollup.__table__
+    for granularity in GRANULARITIES:
+        rollups = aggregate_rollups(frame, granularity)
+        if subtract:
+            rollups[ADDITIVE_COLUMNS] = -rollups[ADDITIVE_COLUMNS]
+            rollups[EXTREME_COLUMNS] = None
+
+        stmt = dialect_insert(table)
+        set_ = {col: table.c[col] + stmt.excluded[col] for col in ADDITIVE_COLUMNS}
+        for prefix in ('aqi', 'pm25'):
+            set_[f'{prefix}_min'] = null_safe_least(table.c[f'{prefix}_min'], stmt.excluded[f'{prefix}_min'])
+            set_[f'{prefix}_max'] = null_safe_greatest(table.c[f'{prefix}_max'], stmt.excluded[f'{prefix}_max'])
+        stmt = stmt.on_conflict_do_update(index_elements=ROLLUP_KEY, set_=set_)
+
+        db.session.execute(stmt, frame_records(rollups))
+
+
+def _day_readings(days):
+    """Leituras (location, timestamp, aqi, pm25) de air_quality_data nos pares (localização, dia)"""
+    table = AirQualityData.__table__
+    columns = ['location', 'timestamp', 'aqi', 'pm25']
+    frames = []
+    for start in range(0, len(days), EXTREMES_BATCH_DAYS):
+        batch = days.iloc[start:start + EXTREMES_BATCH_DAYS]
+        conditions = [
+            and_(table.c.location == location, table.c.timestamp >= day.to_pydatetime(),
+                 table.c.timestamp < (day + pd.Timedelta(days=1)).to_pydatetime())
+            for location, day in zip(batch['location'], batch['bucket_start'])
+        ]
+        rows = db.session.execute(db.select(*[table.c[col] for col in columns]).where(or_(*conditions))).all()
+        frames.append(pd.DataFrame(rows, columns=columns))
+    readings = pd.concat(frames, ignore_index=True)
+    readings['timestamp'] = pd.to_datetime(readings['timestamp'])
+    return readings
+
+
+def _archived_day_readings(days):
+    """Leituras arquivadas nos pares (localização, dia) informados"""
+    frames = []
+    for location, day in zip(days['location'], days['bucket_start']):
+        end = day + pd.Timedelta(days=1)
+        for chunk in scan_readings(['location', 'timestamp', 'aqi', 'pm25'], location=location,
+                                   start=day.to_pydatetime(), end=end.to_pydatetime(), tier='archive'):
+            chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+            frames.append(chunk[chunk['timestamp'] < end])
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def refresh_extremes(frame):
+    """
+    Recalcula mínimos e máximos dos agregados (hora e dia) que contêm as leituras
+    do bloco, a partir das leituras gravadas. Usado depois de mesclar leituras
+    repetidas, cujos valores antigos não podem ser retirados de um mínimo ou máximo.
+    Os dias com leituras arquivadas (contagem do agregado maior que a do banco)
+    também leem o arquivo Parquet.
+    """
+    if frame.empty:
+        return
+
+    days = aggregate_rollups(frame, 'day')[['bucket_start', 'location']]
+    readings = _day_readings(days)
+
+    # Dias em que parte das leituras já foi arquivada
+    hot_counts = aggregate_rollups(readings, 'day').set_index(['bucket_start', 'location'])['count']
+    rollup_counts = db.session.execute(
+        db.select(ReadingRollup.bucket_start, ReadingRollup.location, ReadingRollup.count)
+        .where(ReadingRollup.granularity == 'day',
+               ReadingRollup.location.in_(days['location'].unique().tolist()),
+               ReadingRollup.bucket_start.between(days['bucket_start'].min().to_pydatetime(),
+                                                  days['bucket_start'].max().to_pydatetime()))
+    ).all()
+    rollup_counts = pd.DataFrame(rollup_counts, columns=['bucket_start', 'location', 'count'])
+    rollup_counts['bucket_start'] = pd.to_datetime(rollup_counts['bucket_start'])
+    rollup_counts = rollup_counts.set_index(['bucket_start', 'location'])['count']
+    keys = pd.MultiIndex.from_frame(days)
+    partial = rollup_counts.reindex(keys).fillna(0).to_numpy() > hot_counts.reindex(keys).fillna(0).to_numpy()
+    if partial.any():
+        archived = _archived_day_readings(days[partial])
+        if archived is not None:
+            readings = pd.concat([readings, archived], ignore_index=True)
+
+    table = ReadingRollup.__table__
+    stmt = update(table).where(
+        table.c.granularity == bindparam('key_granularity'),
+        table.c.bucket_start == bindparam('key_bucket_start'),
+        table.c.location == bindparam('key_location')
+    ).values({col: bindparam(f'new_{col}') for col in EXTREME_COLUMNS})
+
+    for granularity in GRANULARITIES:
+        affected = aggregate_rollups(frame, granularity)[ROLLUP_KEY]
+        extremes = aggregate_rollups(readings, granularity)[ROLLUP_KEY + EXTREME_COLUMNS]
+        # Agregados sem nenhuma leitura válida ficam com mínimos e máximos nulos
+        extremes = affected.merge(extremes, on=ROLLUP_KEY, how='left')
+        records = frame_records(extremes.rename(columns={
+            **{col: f'key_{col}' for col in ROLLUP_KEY},
+            **{col: f'new_{col}' for col in EXTREME_COLUMNS}
+        }))
+        db.session.execute(stmt, records)
+
+
+def rebuild_rollups(chunk_size=50000):
+    """
+    Recalcula todos os agregados a partir do arquivo Parquet e de air_quality_data,
+    lendo os dois em blocos (leituras arquivadas continuam nos relatórios)
+    """
+    db.session.execute(ReadingRollup.__table__.delete())
+    db.session.commit()
+
+    columns = ['id', 'location', 'timestamp', 'aqi', 'pm25']
+    table = AirQualityData.__table__
+
+    # Paginação por id: nenhum cursor fica aberto durante as gravações
+    # (no SQLite um leitor ativo bloqueia o commit de outra conexão)
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(*[table.c[col] for col in columns])
+            .where(table.c.id > last_id, table.c.timestamp.isnot(None))
+            .order_by(table.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        chunk = pd.DataFrame(rows, columns=columns)
+        update_rollups(chunk)
+        db.session.commit()
+        total += len(chunk)
+        last_id = int(chunk['id'].iloc[-1])
+
+    for chunk in scan_readings(['location', 'timestamp', 'aqi', 'pm25'], tier='archive', batch_size=chunk_size):
+        update_rollups(chunk)
+        db.session.commit()
+        total += len(chunk)
+    return total
+
+
+def window_filter(start, end):
+    """
+    Filtro que cobre [start, end] com agregados diários nos dias inteiros e
+    horários nas pontas (precisão de uma hora nos limites da janela).
+    """
+    hour_start = start.replace(minute=0, second=0, microsecond=0)
+    day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if day_start < hour_start:
+        day_start += timedelta(days=1)
+    day_end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    bucket = ReadingRollup.bucket_start
+    if day_start >= day_end:
+        return and_(ReadingRollup.granularity == 'hour', bucket >= hour_start, bucket <= end)
+
+    return or_(
+        and_(ReadingRollup.granularity == 'day', bucket >= day_start, bucket < day_end),
+        and_(ReadingRollup.granularity == 'hour', or_(
+            and_(bucket >= hour_start, bucket < day_start),
+            and_(bucket >= day_end, bucket <= end)
+        ))
+    )
+
+
+def summarize_window(start, end):
+    """Totais, médias, mínimos e máximos de AQI e PM2.5 na janela"""
+    row = db.session.query(
+        func.coalesce(func.sum(ReadingRollup.count), 0),
+        func.sum(ReadingRollup.aqi_count), func.sum(ReadingRollup.aqi_sum),
+        func.min(ReadingRollup.aqi_min), func.max(ReadingRollup.aqi_max),
+        func.sum(ReadingRollup.pm25_count), func.sum(ReadingRollup.pm25_sum),
+        func.min(ReadingRollup.pm25_min), func.max(ReadingRollup.pm25_max)
+    ).filter(window_filter(start, end)).one()
+
+    total, aqi_count, aqi_sum, aqi_min, aqi_max, pm25_count, pm25_sum, pm25_min, pm25_max = row
+    return {
+        'total_records': int(total),
+        'aqi': {
+            'mean': aqi_sum / aqi_count if aqi_count else 0,
+            'max': aqi_max or 0,
+            'min': aqi_min or 0
+        },
+        'pm25': {
+            'mean': pm25_sum / pm25_count if pm25_count else 0,
+            'max': pm25_max or 0,
+            'min': pm25_min or 0
+        }
+    }
+
+
+def exceedances_by_location(start, end):
+    """Quantidade de leituras acima dos limites, por localização, na janela"""
+    rows = db.session.query(
+        ReadingRollup.location,
+        func.sum(ReadingRollup.pm25_exceedances),
+        func.sum(ReadingRollup.aqi_exceedances)
+    ).filter(window_filter(start, end)).group_by(ReadingRollup.location).having(
+        (func.sum(ReadingRollup.pm25_exceedances) > 0) | (func.sum(ReadingRollup.aqi_exceedances) > 0)
+    ).all()
+
+    return {location: {'pm25': int(pm25), 'aqi': int(aqi)} for location, pm25, aqi in rows}
@@ -0,0 +1,193 @@
+import threading
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app import db
+from models.air_quality import LatestReading
+from utils.cache import SharedDataVersion
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180  # km por grau de latitude (mesma esfera do haversine)
+STATION_COLUMNS = ['location', 'latitude', 'longitude', 'aqi', 'pm25', 'pm10', 'timestamp', 'source']
+# Tamanho (em pixels de tela) das células de agrupamento do mapa
+CLUSTER_CELL_PIXELS = 64
+
+
+def aqi_status(aqi):
+    """Status exibido no mapa para cada AQI (mesmos limites de /api/air-quality-data)"""
+    aqi = np.asarray(aqi, dtype=float)
+    return np.select([aqi > 100, aqi > 50], ['Insalubre', 'Moderada'], 'Boa')
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distância em km de (lat, lng) até cada ponto dos arrays lats/lngs"""
+    lat, lng = np.radians(lat), np.radians(lng)
+    lats, lngs = np.radians(lats), np.radians(lngs)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def cluster_cell_degrees(zoom):
+    """Lado em graus de uma célula de CLUSTER_CELL_PIXELS pixels no zoom (tiles de 256 px)"""
+    return 360.0 * CLUSTER_CELL_PIXELS / (256 * 2 ** zoom)
+
+
+class StationIndex:
+    """
+    Índice espacial em grade sobre as estações (última leitura de cada localização).
+
+    Cada estação cai em uma célula de cell_degrees graus; as estações ficam
+    ordenadas pela chave da célula (linha * COLUMNS + coluna), então as células
+    de uma linha da grade dentro de um retângulo formam um intervalo contíguo,
+    encontrado com np.searchsorted. Consultas só olham as células que tocam a área.
+    """
+
+    COLUMNS = 1 << 20
+
+    def __init__(self, frame, cell_degrees=0.5):
+        self.cell_degrees = cell_degrees
+        self.version = None
+        rows = np.floor(frame['latitude'].to_numpy(dtype=float) / cell_degrees).astype(np.int64)
+        cols = np.floor(frame['longitude'].to_numpy(dtype=float) / cell_degrees).astype(np.int64)
+        keys = self._key(rows, cols)
+        order = np.argsort(keys, kind='stable')
+
+        self.keys = keys[order]
+        self.stations = frame.iloc[order].reset_index(drop=True)
+        self.stations['status'] = aqi_status(self.stations['aqi'])
+        self.lats = self.stations['latitude'].to_numpy(dtype=float)
+        self.lngs = self.stations['longitude'].to_numpy(dtype=float)
+
+    def _key(self, rows, cols):
+        return (rows + self.COLUMNS // 2) * self.COLUMNS + (cols + self.COLUMNS // 2)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _cell_range(self, south, west, north, east):
+        """Posições (em self.stations) das estações nas células que tocam o retângulo"""
+        row0, row1 = (int(np.floor(v / self.cell_degrees)) for v in (south, north))
+        col0, col1 = (int(np.floor(v / self.cell_degrees)) for v in (west, east))
+        rows = np.arange(row0, row1 + 1, dtype=np.int64)
+        starts = np.searchsorted(self.keys, self._key(rows, col0), side='left')
+        ends = np.searchsorted(self.keys, self._key(rows, col1), side='right')
+        if not len(rows):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+    def bbox(self, south, west, north, east):
+        """Posições das estações dentro do retângulo (graus; west > east não é suportado)"""
+        positions = self._cell_range(south, west, north, east)
+        lats, lngs = self.lats[positions], self.lngs[positions]
+        inside = (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+        return positions[inside]
+
+    def nearest(self, lat, lng, n=None, radius_km=None):
+        """
+        Até n estações mais próximas de (lat, lng), opcionalmente só dentro de radius_km.
+        Retorna (posições, distâncias em km) da mais próxima para a mais distante.
+
+        Sem raio, a busca começa em uma célula e dobra o raio até achar n estações
+        dentro dele: qualquer estação mais próxima estaria no retângulo já consultado.
+        """
+        if n is None and radius_km is None:
+            raise ValueError('Informe n ou radius_km')
+        search_km = radius_km if radius_km is not None else self.cell_degrees * KM_PER_DEGREE
+        while True:
+            dlat = search_km / KM_PER_DEGREE
+            dlng = search_km / (KM_PER_DEGREE * max(np.cos(np.radians(min(abs(lat) + dlat, 89.9))), 1e-6))
+            covers_all = dlat >= 180 and dlng >= 360
+            positions = self.bbox(max(lat - dlat, -90), max(lng - dlng, -180),
+                                  min(lat + dlat, 90), min(lng + dlng, 180))
+            distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+            within = distances <= search_km
+            if radius_km is not None or within.sum() >= n or covers_all:
+                break
+            search_km *= 2
+
+        if radius_km is not None or not covers_all:
+            positions, distances = positions[within], distances[within]
+        order = np.argsort(distances, kind='stable')[:n]
+        return positions[order], distances[order]
+
+    def records(self, positions, distances=None):
+        """Estações nas posições, como dicionários para a API"""
+        frame = self.stations.iloc[positions][STATION_COLUMNS + ['status']].copy()
+        frame['timestamp'] = frame['timestamp'].map(lambda value: value.isoformat() if pd.notna(value) else None)
+        if distances is not None:
+            frame['distance_km'] = np.round(distances, 3)
+        return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+    def clusters(self, positions, zoom):
+        """
+        Agrupa as estações das posições em células da grade do zoom. Células com uma
+        estação voltam como estação; as demais como grupo (contagem, centro médio, AQI).
+        Retorna (estações, grupos).
+        """
+        cell = cluster_cell_degrees(zoom)
+        stations = self.stations.iloc[positions]
+        cells = pd.DataFrame({
+            'row': np.floor(self.lats[positions] / cell).astype(np.int64),
+            'col': np.floor(self.lngs[positions] / cell).astype(np.int64),
+            'latitude': self.lats[positions],
+            'longitude': self.lngs[positions],
+            'aqi': stations['aqi'].to_numpy(dtype=float)
+        })
+        grouped = cells.groupby(['row', 'col'], sort=False)
+        sizes = grouped['latitude'].transform('size').to_numpy()
+
+        groups = grouped.agg(
+            count=('latitude', 'size'),
+            latitude=('latitude', 'mean'),
+            longitude=('longitude', 'mean'),
+            aqi_mean=('aqi', 'mean'),
+            aqi_max=('aqi', 'max')
+        ).reset_index(drop=True)
+        groups = groups[groups['count'] > 1].round({'aqi_mean': 1})
+        groups['status'] = aqi_status(groups['aqi_max'])
+        return (self.records(positions[sizes == 1]),
+                groups.astype(object).where(groups.notna(), None).to_dict('records'))
+
+
+def load_station_frame():
+    """Última leitura de cada localização com coordenadas (tabela latest_reading)"""
+    table = LatestReading.__table__
+    rows = db.session.execute(db.select(*[table.c[col] for col in STATION_COLUMNS])).all()
+    return pd.DataFrame(rows, columns=STATION_COLUMNS)
+
+
+def station_stamp():
+    """Marca de latest_reading compartilhada entre processos (muda quando uma estação é gravada)"""
+    table = LatestReading.__table__
+    return tuple(db.session.execute(
+        db.select(db.func.count(), db.func.max(table.c.timestamp), db.func.sum(table.c.aqi),
+                  db.func.sum(table.c.latitude + table.c.longitude))
+    ).one())
+
+
+class StationIndexCache:
+    """
+    Índice das estações do processo, reconstruído quando a versão dos dados muda:
+    por ingestão neste processo ou, consultando latest_reading, em qualquer outro
+    (ver SharedDataVersion). O índice guarda em version a versão de que foi montado.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._shared = SharedDataVersion(station_stamp)
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = self._shared.get()
+        if self._index is not None and self._index.version == version:
+            return self._index
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                cell_degrees = current_app.config.get('SPATIAL_CELL_DEGREES', 0.5)
+                index = StationIndex(load_station_frame(), cell_degrees)
+                index.version = version
+                self._index = index
+            return self._index
+
+
+station_index = StationIndexCache()
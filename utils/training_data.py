@@ -0,0 +1,117 @@
+import numpy as np
+from app import db
+from models.air_quality import AirQualityData
+from utils.archive import scan_readings
+from utils.ml_models import FEATURE_COLUMNS
+
+TARGET_COLUMN = 'aqi'
+
+
+def iter_training_chunks(dataset_id=None, tier='all', chunk_size=50000):
+    """
+    Gera blocos (X, y) em float32 com as features e o AQI das leituras, de um dataset
+    ou de todas, lendo do arquivo Parquet e do banco só as colunas de treino.
+    Valores ausentes viram 0.
+    """
+    columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+    for frame in scan_readings(columns, dataset_id=dataset_id, tier=tier, batch_size=chunk_size):
+        values = frame.to_numpy(dtype=np.float32, na_value=0)
+        # Linhas contíguas (o pandas devolve os blocos por coluna), como esperado pelo sklearn
+        yield np.ascontiguousarray(values[:, :-1]), np.ascontiguousarray(values[:, -1])
+
+
+def has_training_rows(dataset_id=None, minimum=1, chunk_size=50000):
+    """
+    Verifica se há pelo menos minimum leituras para treino sem contar todas: primeiro
+    no banco (consulta limitada a minimum linhas), depois no arquivo Parquet, em
+    blocos de chunk_size com uma única coluna.
+    """
+    query = db.select(AirQualityData.id)
+    if dataset_id is not None:
+        query = query.where(AirQualityData.dataset_id == dataset_id)
+    seen = db.session.execute(db.select(db.func.count()).select_from(query.limit(minimum).subquery())).scalar()
+    if seen >= minimum:
+        return True
+
+    for frame in scan_readings([TARGET_COLUMN], dataset_id=dataset_id, tier='archive', batch_size=chunk_size):
+        seen += len(frame)
+        if seen >= minimum:
+            return True
+    return False
+
+
+class ReservoirSample:
+    """
+    Amostra aleatória uniforme de tamanho fixo de um fluxo de linhas (algoritmo R,
+    vetorizado por bloco): a memória fica limitada a size linhas qualquer que seja
+    o tamanho do fluxo.
+    """
+
+    def __init__(self, size, n_features, seed=42):
+        self.size = size
+        self.X = np.empty((size, n_features), dtype=np.float32)
+        self.y = np.empty(size, dtype=np.float32)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, X, y):
+        n = len(X)
+        # Enquanto a amostra não está cheia, as linhas entram direto
+        fill = min(max(self.size - self.seen, 0), n)
+        if fill:
+            self.X[self.seen:self.seen + fill] = X[:fill]
+            self.y[self.seen:self.seen + fill] = y[:fill]
+
+        if fill < n:
+            # A linha de posição t (0-based) substitui uma posição j < size com probabilidade size/(t+1)
+            positions = np.arange(self.seen + fill, self.seen + n)
+            slots = self._rng.integers(0, positions + 1)
+            chosen = np.flatnonzero(slots < self.size) + fill
+            if len(chosen):
+                # Várias linhas do bloco no mesmo slot: vale a última, como no algoritmo sequencial
+                slots = slots[chosen - fill][::-1]
+                slots, last = np.unique(slots, return_index=True)
+                rows = chosen[::-1][last]
+                self.X[slots] = X[rows]
+                self.y[slots] = y[rows]
+
+        self.seen += n
+
+    def arrays(self):
+        count = min(self.seen, self.size)
+        return self.X[:count], self.y[:count]
+
+
+def load_training_arrays(dataset_id=None, limit=None, sample_size=None, chunk_size=50000,
+                         progress=None, seed=42):
+    """
+    Carrega (X, y) em arrays float32 contíguos.
+
+    limit: usa só as primeiras limit leituras. sample_size: amostragem por
+    reservatório quando há mais leituras que isso (memória limitada à amostra).
+    Se informado, progress(stage='loading', rows_loaded=n) é chamado a cada bloco.
+    """
+    n_features = len(FEATURE_COLUMNS)
+    sample = ReservoirSample(sample_size, n_features, seed) if sample_size else None
+    X_chunks, y_chunks = [], []
+    loaded = 0
+
+    for X, y in iter_training_chunks(dataset_id, chunk_size=chunk_size):
+        if limit is not None:
+            X, y = X[:limit - loaded], y[:limit - loaded]
+        if sample is not None:
+            sample.add(X, y)
+        else:
+            X_chunks.append(X)
+            y_chunks.append(y)
+        loaded += len(X)
+        if progress:
+            progress(stage='loading', rows_loaded=loaded)
+        if limit is not None and loaded >= limit:
+            break
+
+    if sample is not None:
+        return sample.arrays()
+    if not X_chunks:
+        return np.empty((0, n_features), dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.concatenate(X_chunks), np.concatenate(y_chunks)